@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Conversation, Message, UserFeedback, DataSource, DocumentChunk, RAGQuery
+from .models import Conversation, Message, UserFeedback, DataSource, DocumentChunk, RAGQuery, IngestBatch
 
 
 @admin.register(Conversation)
@@ -7,7 +7,7 @@ class ConversationAdmin(admin.ModelAdmin):
     list_display = ['id', 'title', 'use_company_data', 'created_at', 'updated_at', 'message_count', 'feedback_count']
     list_filter = ['use_company_data', 'created_at', 'updated_at']
     search_fields = ['title']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'summary', 'summarized_up_to', 'summary_updated_at']
     
     def message_count(self, obj):
         return obj.messages.count()
@@ -46,7 +46,7 @@ class DataSourceAdmin(admin.ModelAdmin):
     list_display = ['name', 'source_type', 'is_active', 'status', 'total_chunks', 'total_tokens', 'created_at']
     list_filter = ['source_type', 'is_active', 'status', 'created_at']
     search_fields = ['name']
-    readonly_fields = ['id', 'created_at', 'updated_at', 'processing_started_at', 'processing_completed_at', 'total_chunks', 'total_tokens']
+    readonly_fields = ['id', 'created_at', 'updated_at', 'processing_started_at', 'processing_completed_at', 'total_chunks', 'total_tokens', 'chunks_per_second', 'total_pages', 'processed_pages', 'extraction_seconds', 'ingest_checkpoint', 'processing_attempts', 'reused_chunks', 'recomputed_chunks', 'file_hash']
     
     fieldsets = (
         ('Basic Information', {
@@ -56,14 +56,20 @@ class DataSourceAdmin(admin.ModelAdmin):
             'fields': ('status', 'processing_started_at', 'processing_completed_at', 'error_message')
         }),
         ('Statistics', {
-            'fields': ('total_chunks', 'total_tokens')
+            'fields': ('total_chunks', 'total_tokens', 'chunks_per_second', 'total_pages', 'processed_pages', 'extraction_seconds', 'ingest_checkpoint', 'processing_attempts', 'version', 'reused_chunks', 'recomputed_chunks')
         }),
         ('Metadata', {
-            'fields': ('id', 'created_at', 'updated_at')
+            'fields': ('id', 'file_hash', 'created_at', 'updated_at')
         })
     )
 
 
+@admin.register(IngestBatch)
+class IngestBatchAdmin(admin.ModelAdmin):
+    list_display = ['name', 'concurrency', 'duplicate_files', 'failed_files', 'created_at']
+    readonly_fields = ['id', 'created_at', 'duplicate_files', 'failed_files', 'errors']
+
+
 @admin.register(DocumentChunk)
 class DocumentChunkAdmin(admin.ModelAdmin):
     list_display = ['id', 'data_source', 'chunk_index', 'page_number', 'token_count', 'created_at']
@@ -77,10 +83,10 @@ class DocumentChunkAdmin(admin.ModelAdmin):
 
 @admin.register(RAGQuery)
 class RAGQueryAdmin(admin.ModelAdmin):
-    list_display = ['id', 'conversation', 'query_preview', 'retrieval_time', 'generation_time', 'total_tokens_used', 'created_at']
-    list_filter = ['created_at', 'conversation']
+    list_display = ['id', 'conversation', 'query_preview', 'retrieval_time', 'generation_time', 'total_tokens_used', 'cache_hit', 'created_at']
+    list_filter = ['cache_hit', 'created_at', 'conversation']
     search_fields = ['query', 'response', 'conversation__title']
-    readonly_fields = ['id', 'created_at', 'retrieval_time', 'generation_time', 'total_tokens_used']
+    readonly_fields = ['id', 'created_at', 'retrieval_time', 'generation_time', 'time_to_first_token', 'total_tokens_used']
     
     def query_preview(self, obj):
         return obj.query[:50] + '...' if len(obj.query) > 50 else obj.query
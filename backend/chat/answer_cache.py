@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    """An answer generated for a query against a specific corpus state."""
+    query: str
+    answer: str
+    mode: str
+    corpus_fingerprint: str
+    vector: np.ndarray
+    chunk_ids: List[str] = field(default_factory=list)
+    expires_at: float = 0.0
+
+
+class SemanticAnswerCache:
+    """Cache of RAG answers looked up by query-embedding similarity.
+
+    A cached answer is only returned for the same chat mode and the same
+    active-corpus fingerprint it was generated with, and only when the new
+    query's embedding has cosine similarity >= threshold with the cached one.
+    """
+    
+    def __init__(self, max_size: int, ttl: float, threshold: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()  # (mode, fingerprint, query) -> CachedAnswer
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def lookup(self, vector: List[float], mode: str, corpus_fingerprint: str) -> Optional[CachedAnswer]:
+        """Find the most similar cached answer above the threshold."""
+        query_vector = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            candidates = []
+            for key, entry in list(self._entries.items()):
+                if entry.expires_at <= now:
+                    del self._entries[key]
+                elif entry.mode == mode and entry.corpus_fingerprint == corpus_fingerprint:
+                    candidates.append((key, entry))
+            
+            if candidates:
+                similarities = np.stack([entry.vector for _, entry in candidates]) @ query_vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+            
+            self.misses += 1
+            return None
+    
+    def store(self, query: str, vector: List[float], answer: str, mode: str,
+              corpus_fingerprint: str, chunk_ids: Optional[List[str]] = None) -> None:
+        """Cache an answer for a query."""
+        entry = CachedAnswer(
+            query=query,
+            answer=answer,
+            mode=mode,
+            corpus_fingerprint=corpus_fingerprint,
+            vector=self._normalize(vector),
+            chunk_ids=list(chunk_ids or []),
+            expires_at=time.monotonic() + self.ttl
+        )
+        key = (mode, corpus_fingerprint, query)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+    
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
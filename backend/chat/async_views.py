@@ -0,0 +1,157 @@
+import json
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .history import build_history
+from .models import Conversation, Message
+from .serializers import ConversationSerializer, ConversationListSerializer
+from .services import LLMService
+from .rag_service import get_rag_service
+from .streaming import astream_assistant_reply
+
+
+def async_api_view(methods):
+    """Limit an async view to the given methods and exempt it from CSRF, like DRF's @api_view.
+    
+    Django 4.2's own view decorators wrap views in sync functions, which
+    would hide the coroutine from the ASGI handler.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            return await view(request, *args, **kwargs)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def _request_data(request):
+    """Parse a JSON or form request body."""
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+    return request.POST
+
+
+async def _get_conversation(conversation_id):
+    try:
+        return await Conversation.objects.aget(id=conversation_id)
+    except Conversation.DoesNotExist:
+        return None
+
+
+async def _generate_reply(conversation: Conversation, content: str, llm_service: LLMService) -> str:
+    """Generate the assistant's reply based on the company data setting.
+    
+    Retrieval runs in a worker thread and the LLM call on the event loop,
+    so a waiting request holds no thread.
+    """
+    mode = conversation.use_company_data
+    try:
+        if mode in ('use', 'both'):
+            rag_service = await sync_to_async(get_rag_service, thread_sensitive=False)()
+            prepared = await sync_to_async(rag_service.prepare_response, thread_sensitive=False)(
+                content, conversation.id, mode
+            )
+            if prepared.answer is not None:
+                return prepared.answer
+            
+            generation_start = time.time()
+            response = await llm_service.agenerate_response(prepared.messages)
+            await sync_to_async(rag_service.finish_response)(
+                conversation.id, content, prepared, response, time.time() - generation_start
+            )
+            return response
+        
+        # Use regular LLM only
+        messages_for_llm = await sync_to_async(build_history)(conversation, llm_service.system_prompt)
+        return await llm_service.agenerate_response(messages_for_llm)
+    except Exception as e:
+        return f"Error generating response: {str(e)}"
+
+
+async def _serialize(serializer_class, instance, **kwargs):
+    return await sync_to_async(lambda: serializer_class(instance, **kwargs).data)()
+
+
+@async_api_view(['GET', 'POST'])
+async def conversation_list(request):
+    """List all conversations or create a new one."""
+    if request.method == 'GET':
+        conversations = [conversation async for conversation in Conversation.objects.all()]
+        return JsonResponse(await _serialize(ConversationListSerializer, conversations, many=True), safe=False)
+    
+    data = _request_data(request)
+    conversation = await Conversation.objects.acreate(use_company_data=data.get('use_company_data', False))
+    user_message = await Message.objects.acreate(
+        conversation=conversation,
+        role='user',
+        content=data.get('message', '')
+    )
+    
+    llm_service = LLMService()
+    conversation.title = await llm_service.agenerate_conversation_title(user_message.content)
+    await conversation.asave()
+    
+    await Message.objects.acreate(
+        conversation=conversation,
+        role='assistant',
+        content=await _generate_reply(conversation, user_message.content, llm_service)
+    )
+    
+    return JsonResponse(await _serialize(ConversationSerializer, conversation), status=201)
+
+
+@async_api_view(['GET', 'POST'])
+async def conversation_detail(request, conversation_id):
+    """Get conversation details or add a new message."""
+    conversation = await _get_conversation(conversation_id)
+    if conversation is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    
+    if request.method == 'GET':
+        return JsonResponse(await _serialize(ConversationSerializer, conversation))
+    
+    user_message = await Message.objects.acreate(
+        conversation=conversation,
+        role='user',
+        content=_request_data(request).get('message', '')
+    )
+    
+    await Message.objects.acreate(
+        conversation=conversation,
+        role='assistant',
+        content=await _generate_reply(conversation, user_message.content, LLMService())
+    )
+    
+    return JsonResponse(await _serialize(ConversationSerializer, conversation))
+
+
+@async_api_view(['POST'])
+async def conversation_stream(request, conversation_id):
+    """Add a message and stream the assistant's reply as server-sent events."""
+    conversation = await _get_conversation(conversation_id)
+    if conversation is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    
+    user_message = await Message.objects.acreate(
+        conversation=conversation,
+        role='user',
+        content=_request_data(request).get('message', '')
+    )
+    
+    response = StreamingHttpResponse(
+        astream_assistant_reply(conversation, user_message),
+        content_type='text/event-stream'
+    )
+    # Deliver each event as it is written, through proxies too
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
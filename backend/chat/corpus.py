@@ -0,0 +1,56 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from django.conf import settings
+
+from .models import DataSource
+
+
+@dataclass(frozen=True)
+class ActiveCorpus:
+    """Snapshot of the data sources that retrieval may currently use."""
+    source_ids: FrozenSet[str]
+    fingerprint: str
+
+
+_snapshot: Optional[ActiveCorpus] = None
+_snapshot_expires_at = 0.0
+_lock = threading.Lock()
+
+
+def get_active_corpus() -> ActiveCorpus:
+    """Get the active, servable data sources and a fingerprint of their contents.
+
+    The snapshot is cached in-process for RAG_CORPUS_CACHE_TTL seconds and
+    dropped immediately when a DataSource changes in this process (see
+    signals.py); the TTL bounds staleness for changes made by other processes.
+    """
+    global _snapshot, _snapshot_expires_at
+    with _lock:
+        if _snapshot is not None and time.monotonic() < _snapshot_expires_at:
+            return _snapshot
+    
+    rows = DataSource.objects.filter(is_active=True, status__in=DataSource.SERVED_STATUSES).order_by('id').values_list(
+        'id', 'total_chunks', 'processing_completed_at'
+    )
+    source_ids = []
+    digest = hashlib.sha256()
+    for source_id, total_chunks, completed_at in rows:
+        source_ids.append(str(source_id))
+        digest.update(f"{source_id}:{total_chunks}:{completed_at.isoformat() if completed_at else ''};".encode())
+    
+    snapshot = ActiveCorpus(source_ids=frozenset(source_ids), fingerprint=digest.hexdigest())
+    with _lock:
+        _snapshot = snapshot
+        _snapshot_expires_at = time.monotonic() + settings.RAG_CORPUS_CACHE_TTL
+    return snapshot
+
+
+def invalidate_active_corpus() -> None:
+    """Drop the cached snapshot so the next lookup reloads it."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
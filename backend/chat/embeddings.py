@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from django.conf import settings
+from langchain_community.embeddings import HuggingFaceEmbeddings
+
+from .models import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+# Keep IN (...) lookups well below SQLite's bound-parameter limit
+CACHE_LOOKUP_BATCH_SIZE = 500
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text before hashing so trivially different copies share a key."""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def content_hash(text: str) -> str:
+    """Get the SHA-256 hex digest of normalized text."""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """LRU cache of query embeddings with size and TTL bounds.
+
+    Entries live in-process; when a Redis URL is configured, misses fall
+    through to a shared Redis tier so workers can reuse each other's work.
+    """
+    
+    def __init__(self, max_size: int, ttl: float, redis_url: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, vector)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.redis_hits = 0
+        self._redis = None
+        if redis_url:
+            try:
+                import redis
+                # Short timeouts: a slow Redis must never be slower than embedding
+                self._redis = redis.Redis.from_url(redis_url, socket_connect_timeout=0.5, socket_timeout=0.5)
+            except Exception as e:
+                logger.warning(f"Query embedding cache running without Redis: {str(e)}")
+    
+    def get(self, key: str) -> Optional[List[float]]:
+        """Get a cached vector, or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        
+        vector = self._redis_get(key)
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self.redis_hits += 1
+        self._put_local(key, vector)
+        return vector
+    
+    def set(self, key: str, vector: List[float]) -> None:
+        """Cache a vector locally and in Redis."""
+        self._put_local(key, vector)
+        if self._redis is not None:
+            try:
+                self._redis.set(
+                    f"query_embedding:{key}",
+                    np.asarray(vector, dtype=np.float32).tobytes(),
+                    ex=max(int(self.ttl), 1)
+                )
+            except Exception as e:
+                logger.warning(f"Error writing query embedding to Redis: {str(e)}")
+    
+    def clear(self) -> None:
+        """Drop all in-process entries."""
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'redis_hits': self.redis_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.redis_hits) / lookups if lookups else 0.0,
+                'redis_enabled': self._redis is not None,
+            }
+    
+    def _put_local(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def _redis_get(self, key: str) -> Optional[List[float]]:
+        if self._redis is None:
+            return None
+        try:
+            value = self._redis.get(f"query_embedding:{key}")
+        except Exception as e:
+            logger.warning(f"Error reading query embedding from Redis: {str(e)}")
+            return None
+        return np.frombuffer(value, dtype=np.float32).tolist() if value else None
+
+
+class EmbeddingService:
+    """Service for embedding text with the configured sentence-transformers model.
+
+    Document embeddings are computed in large batches and cached in the
+    database by (model name, content hash), so identical chunks are only
+    ever embedded once per model.
+    """
+    
+    def __init__(self):
+        self.model_name = settings.RAG_EMBEDDING_MODEL
+        self.batch_size = settings.RAG_EMBEDDING_BATCH_SIZE
+        self.use_cache = settings.RAG_EMBEDDING_CACHE
+        self.model = HuggingFaceEmbeddings(
+            model_name=self.model_name,
+            model_kwargs={'device': 'cpu'},
+            # Normalized vectors match the embeddings ChromaDB produced for
+            # existing collections with its default MiniLM function.
+            encode_kwargs={'batch_size': self.batch_size, 'normalize_embeddings': True}
+        )
+        self.query_cache = QueryEmbeddingCache(
+            max_size=settings.RAG_QUERY_CACHE_SIZE,
+            ttl=settings.RAG_QUERY_CACHE_TTL,
+            redis_url=settings.RAG_QUERY_CACHE_REDIS_URL
+        )
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed document texts, reusing cached vectors where available."""
+        if not texts:
+            return []
+        if not self.use_cache:
+            return self.model.embed_documents(texts)
+        
+        hashes = [content_hash(text) for text in texts]
+        vectors = self._get_cached(set(hashes))
+        
+        # Embed each distinct uncached text once
+        missing = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in vectors and text_hash not in missing:
+                missing[text_hash] = text
+        
+        if missing:
+            new_vectors = self.model.embed_documents(list(missing.values()))
+            vectors.update(zip(missing.keys(), new_vectors))
+            self._store_cached(dict(zip(missing.keys(), new_vectors)))
+        
+        logger.debug(f"Embedded {len(missing)} of {len(texts)} texts ({len(texts) - len(missing)} cached)")
+        return [vectors[text_hash] for text_hash in hashes]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query, serving repeated questions from the query cache."""
+        key = f"{self.model_name}:{content_hash(text)}"
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = self.model.embed_query(normalize_text(text))
+            self.query_cache.set(key, vector)
+        return vector
+    
+    def _get_cached(self, hashes: set) -> Dict[str, List[float]]:
+        """Load cached vectors for the given content hashes."""
+        hashes = list(hashes)
+        cached = {}
+        for start in range(0, len(hashes), CACHE_LOOKUP_BATCH_SIZE):
+            rows = EmbeddingCache.objects.filter(
+                model_name=self.model_name,
+                content_hash__in=hashes[start:start + CACHE_LOOKUP_BATCH_SIZE]
+            ).values_list('content_hash', 'vector')
+            for text_hash, vector in rows:
+                cached[text_hash] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return cached
+    
+    def _store_cached(self, vectors: Dict[str, List[float]]) -> None:
+        """Persist newly computed vectors; concurrent duplicates are ignored."""
+        try:
+            EmbeddingCache.objects.bulk_create([
+                EmbeddingCache(
+                    model_name=self.model_name,
+                    content_hash=text_hash,
+                    vector=np.asarray(vector, dtype=np.float32).tobytes(),
+                    dimensions=len(vector)
+                )
+                for text_hash, vector in vectors.items()
+            ], ignore_conflicts=True)
+        except Exception as e:
+            logger.warning(f"Error caching embeddings: {str(e)}")
@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .services import LLMService
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Get a percentile of a list by nearest rank; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class UpstreamHealthMonitor:
+    """Cached health of the LLM endpoint, probed in the background.
+    
+    A daemon thread calls LLMService.get_model_info() every `interval`
+    seconds, so status requests are answered from memory and never wait on
+    (or spend quota on) the model API. Latency and success of the last
+    `window` upstream calls, probes or real requests via record_call(), give
+    the p50/p95 latency and error rate; streamed replies add their
+    time-to-first-token via record_first_token().
+    """
+    
+    def __init__(self, interval: float, window: int):
+        self.interval = interval
+        self._samples = deque(maxlen=window)  # (latency in seconds, succeeded)
+        self._first_token_samples = deque(maxlen=window)  # seconds
+        self._lock = threading.Lock()
+        self._thread = None
+        self.model_info = None
+        self.ok = None  # result of the last probe; None until the first one
+        self.checked_at = None
+        self.last_success_at = None
+        self.last_error = None
+    
+    def start(self) -> None:
+        """Start the background probe thread if it isn't running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='llm-health-probe', daemon=True)
+            self._thread.start()
+    
+    def _run(self) -> None:
+        while True:
+            try:
+                self.probe()
+            except Exception as e:
+                logger.error(f"Error probing LLM health: {str(e)}")
+            time.sleep(self.interval)
+    
+    def probe(self) -> None:
+        """Check the LLM endpoint once and record the result."""
+        llm_service = LLMService()
+        if not llm_service.github_token:
+            # Nothing to probe; don't count it as upstream latency
+            self._record_probe(llm_service.get_model_info(), False)
+            return
+        
+        # The probe's own latency is recorded by LLMService via record_upstream_call
+        model_info = llm_service.get_model_info()
+        self._record_probe(model_info, 'API working' in model_info)
+    
+    def _record_probe(self, model_info: str, ok: bool) -> None:
+        with self._lock:
+            self.model_info = model_info
+            self.ok = ok
+            self.checked_at = timezone.now()
+            if ok:
+                self.last_success_at = self.checked_at
+            else:
+                self.last_error = model_info
+    
+    def record_call(self, latency: float, ok: bool) -> None:
+        """Record the latency and outcome of one upstream call."""
+        with self._lock:
+            self._samples.append((latency, ok))
+    
+    def record_first_token(self, seconds: float) -> None:
+        """Record the time from request to first streamed token of one reply."""
+        with self._lock:
+            self._first_token_samples.append(seconds)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Get the cached probe result and recent upstream statistics."""
+        with self._lock:
+            samples = list(self._samples)
+            first_token_samples = list(self._first_token_samples)
+            ok = self.ok
+            model_info = self.model_info
+            checked_at = self.checked_at
+            last_success_at = self.last_success_at
+            last_error = self.last_error
+        
+        latencies = [latency for latency, _ in samples]
+        p50 = percentile(latencies, 0.5)
+        p95 = percentile(latencies, 0.95)
+        ttft_p50 = percentile(first_token_samples, 0.5)
+        ttft_p95 = percentile(first_token_samples, 0.95)
+        return {
+            'status': 'unknown' if ok is None else ('ok' if ok else 'error'),
+            'model_info': model_info,
+            'checked_at': checked_at,
+            'last_success_at': last_success_at,
+            'last_error': last_error,
+            'probe_interval': self.interval,
+            'samples': len(samples),
+            'latency_p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'latency_p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'error_rate': round(sum(1 for _, succeeded in samples if not succeeded) / len(samples), 3) if samples else None,
+            'ttft_samples': len(first_token_samples),
+            'ttft_p50_ms': round(ttft_p50 * 1000, 1) if ttft_p50 is not None else None,
+            'ttft_p95_ms': round(ttft_p95 * 1000, 1) if ttft_p95 is not None else None,
+        }
+
+
+_health_monitor: Optional[UpstreamHealthMonitor] = None
+_health_monitor_lock = threading.Lock()
+
+
+def record_upstream_call(latency: float, ok: bool) -> None:
+    """Add a real model API call to the health stats, if this process monitors health."""
+    if _health_monitor is not None:
+        _health_monitor.record_call(latency, ok)
+
+
+def get_health_monitor() -> UpstreamHealthMonitor:
+    """Return this process's health monitor, starting its probe thread on first use."""
+    global _health_monitor
+    if _health_monitor is None:
+        with _health_monitor_lock:
+            if _health_monitor is None:
+                _health_monitor = UpstreamHealthMonitor(
+                    interval=settings.LLM_HEALTH_PROBE_INTERVAL,
+                    window=settings.LLM_HEALTH_WINDOW
+                )
+    _health_monitor.start()
+    return _health_monitor
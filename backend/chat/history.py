@@ -0,0 +1,157 @@
+import logging
+import re
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Conversation, Message
+from .tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Per-message overhead of the chat format (role and separators), in tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+# Most tokens of older messages folded into the summary per model call
+SUMMARY_BATCH_TOKENS = 3000
+
+# Words that refer back to earlier turns
+FOLLOW_UP_WORDS = frozenset({
+    'it', 'its', 'they', 'them', 'their', 'theirs', 'this', 'these', 'those',
+    'he', 'him', 'his', 'she', 'her', 'also', 'else', 'same', 'former',
+    'latter', 'above', 'previous', 'earlier', 'instead',
+})
+# Openings that leave out what the question is about ("what about contractors?")
+FOLLOW_UP_OPENINGS = ('what about', 'how about', 'and', 'what if', 'why not', 'but', 'or')
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Update the summary with the new messages. Keep names, facts, numbers, decisions and open "
+    "questions; drop small talk. Reply with the updated summary only, in at most 150 words."
+)
+
+
+def _message_tokens(message: Message) -> int:
+    return count_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def is_follow_up(query: str) -> bool:
+    """Guess whether a query only makes sense with the conversation before it.
+    
+    Queries with a word referring back to earlier turns, or opening with an
+    ellipsis such as "what about ...", count as follow-ups.
+    """
+    words = re.findall(r"[a-z']+", query.lower())
+    opening = ' '.join(words[:2])
+    return any(word in FOLLOW_UP_WORDS for word in words) or any(
+        opening == marker or opening.startswith(f"{marker} ") for marker in FOLLOW_UP_OPENINGS
+    )
+
+
+def get_history_window(conversation: Conversation) -> List[Message]:
+    """Get the most recent messages that are sent verbatim, oldest first.
+    
+    At most CHAT_HISTORY_MAX_MESSAGES messages within CHAT_HISTORY_TOKEN_BUDGET
+    tokens; the newest message is always included.
+    """
+    recent = list(conversation.messages.order_by('-id')[:settings.CHAT_HISTORY_MAX_MESSAGES])
+    window = []
+    used = 0
+    for message in recent:
+        tokens = _message_tokens(message)
+        if window and used + tokens > settings.CHAT_HISTORY_TOKEN_BUDGET:
+            break
+        window.append(message)
+        used += tokens
+    window.reverse()
+    return window
+
+
+def build_history(conversation: Conversation, system_prompt: Optional[str] = None,
+                  include_latest: bool = True) -> List[Dict[str, str]]:
+    """Get a conversation as bounded prompt messages: rolling summary, then recent messages.
+    
+    The summary (if any) goes in a leading system message, after
+    system_prompt. include_latest=False leaves out the newest message, for
+    callers that send it themselves. Messages that fell out of the window
+    but aren't summarized yet are queued for summarize_conversation_task.
+    """
+    window = get_history_window(conversation)
+    if window and conversation.messages.filter(
+        id__gt=conversation.summarized_up_to, id__lt=window[0].id
+    ).exists():
+        schedule_summary(conversation)
+    
+    messages = []
+    system_parts = [part for part in [
+        system_prompt,
+        f"Summary of the earlier conversation: {conversation.summary}" if conversation.summary else None
+    ] if part]
+    if system_parts:
+        messages.append({'role': 'system', 'content': '\n\n'.join(system_parts)})
+    
+    if not include_latest:
+        window = window[:-1]
+    messages.extend({'role': message.role, 'content': message.content} for message in window)
+    return messages
+
+
+def schedule_summary(conversation: Conversation) -> None:
+    """Queue a background update of a conversation's rolling summary."""
+    from .tasks import summarize_conversation_task
+    
+    try:
+        summarize_conversation_task.delay(conversation.id)
+    except Exception as e:
+        # Chat must work without a broker; the next turn tries again
+        logger.warning(f"Could not queue summary of conversation {conversation.id}: {str(e)}")
+
+
+def update_summary(conversation: Conversation, llm_service) -> bool:
+    """Fold messages that fell out of the history window into the rolling summary.
+    
+    Only messages newer than the last summarized one are sent, together with
+    the current summary, so each update costs one small model call per
+    batch. Safe to run concurrently: a summary is only saved if nobody else
+    advanced it first. Returns whether the summary changed.
+    """
+    window = get_history_window(conversation)
+    if not window:
+        return False
+    pending = list(conversation.messages.filter(
+        id__gt=conversation.summarized_up_to, id__lt=window[0].id
+    ).order_by('id'))
+    
+    changed = False
+    while pending:
+        batch = []
+        used = 0
+        for message in pending:
+            if batch and used + _message_tokens(message) > SUMMARY_BATCH_TOKENS:
+                break
+            batch.append(message)
+            used += _message_tokens(message)
+        pending = pending[len(batch):]
+        
+        transcript = '\n'.join(f"{message.role}: {message.content}" for message in batch)
+        summary = llm_service.generate_response([
+            {'role': 'system', 'content': SUMMARY_PROMPT},
+            {'role': 'user', 'content': f"Current summary:\n{conversation.summary or '(none)'}\n\nNew messages:\n{transcript}"}
+        ])
+        if summary.startswith('Error'):
+            logger.warning(f"Could not summarize conversation {conversation.id}: {summary}")
+            return changed
+        
+        # Conditional update: concurrent summarizers must not overwrite newer work
+        updated = Conversation.objects.filter(
+            id=conversation.id, summarized_up_to=conversation.summarized_up_to
+        ).update(summary=summary, summarized_up_to=batch[-1].id, summary_updated_at=timezone.now())
+        if not updated:
+            logger.info(f"Summary of conversation {conversation.id} was updated concurrently")
+            return changed
+        conversation.summary = summary
+        conversation.summarized_up_to = batch[-1].id
+        changed = True
+    
+    logger.info(f"Updated summary of conversation {conversation.id} through message {conversation.summarized_up_to}")
+    return changed
@@ -0,0 +1,225 @@
+import hashlib
+import logging
+import os
+import uuid
+import zipfile
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import DataSource, IngestBatch
+
+logger = logging.getLogger(__name__)
+
+
+def hash_upload(file) -> str:
+    """Get the SHA-256 hex digest of a Django File, reading it in chunks."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def store_upload(file, file_name: str) -> str:
+    """Store an uploaded file under documents/ and return its storage path."""
+    return default_storage.save(f"documents/{uuid.uuid4()}_{file_name}", file)
+
+
+def live_source_with_hash(file_hash: str):
+    """Get the data source, other than a failed one, already holding a file with this hash."""
+    return DataSource.objects.filter(file_hash=file_hash).exclude(status='failed').first()
+
+
+def discard_upload(saved_path: str) -> None:
+    """Delete a stored upload that is no longer needed, e.g. one that lost an insert race."""
+    try:
+        default_storage.delete(saved_path)
+    except Exception as e:
+        logger.warning(f"Could not delete upload {saved_path}: {str(e)}")
+
+
+def register_files(batch: IngestBatch, files: Iterable[Tuple[str, Callable[[], BinaryIO]]]) -> List[DataSource]:
+    """Store a batch of files and create their DataSource rows in one bulk insert.
+    
+    files yields (file name, opener) pairs; each opener returns a fresh
+    binary stream of the file. Non-PDFs, files that fail to store and
+    byte-identical copies of existing documents are recorded on the batch
+    instead of aborting it. Returns the new data sources.
+    """
+    data_sources = []
+    seen_hashes = set()
+    for file_name, opener in files:
+        try:
+            if not file_name.lower().endswith('.pdf'):
+                raise ValueError('Only PDF files are supported')
+            
+            # Hash first: duplicates are never written to storage
+            with opener() as stream:
+                file = File(stream, name=file_name)
+                file_hash = hash_upload(file)
+                if file_hash in seen_hashes or live_source_with_hash(file_hash):
+                    batch.duplicate_files += 1
+                    continue
+                
+                saved_path = store_upload(file, file_name)
+            
+            seen_hashes.add(file_hash)
+            data_sources.append(DataSource(
+                name=file_name,
+                source_type='pdf',
+                file_path=saved_path,
+                file_hash=file_hash,
+                ingest_batch=batch
+            ))
+        except Exception as e:
+            logger.warning(f"Skipping {file_name} in ingest batch {batch.id}: {str(e)}")
+            batch.failed_files += 1
+            batch.errors.append({'file': file_name, 'error': str(e)})
+    
+    try:
+        with transaction.atomic():
+            DataSource.objects.bulk_create(data_sources)
+    except IntegrityError:
+        # A concurrent upload stored one of the files first; insert one by one
+        created = []
+        for data_source in data_sources:
+            try:
+                with transaction.atomic():
+                    data_source.save(force_insert=True)
+                created.append(data_source)
+            except IntegrityError:
+                discard_upload(data_source.file_path.name)
+                batch.duplicate_files += 1
+        data_sources = created
+    batch.registered_at = timezone.now()
+    batch.save()
+    logger.info(
+        f"Ingest batch {batch.id}: {len(data_sources)} new documents, "
+        f"{batch.duplicate_files} duplicates, {batch.failed_files} rejected"
+    )
+    return data_sources
+
+
+def archive_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """Get the files of a zip archive, leaving out directories and macOS metadata."""
+    return [
+        member for member in archive.infolist()
+        if not member.is_dir()
+        and not member.filename.startswith('__MACOSX/')
+        and not os.path.basename(member.filename).startswith('.')
+    ]
+
+
+def register_archive(batch: IngestBatch) -> List[DataSource]:
+    """Register the files of a batch's uploaded zip archive, then delete the archive.
+
+    Runs in a Celery task, so a large archive is extracted outside the upload
+    request. Returns the new data sources.
+    """
+    def open_member(member):
+        # Reject oversized members before decompressing them
+        if member.file_size > settings.RAG_BULK_MAX_FILE_SIZE:
+            raise ValueError(f'File is larger than {settings.RAG_BULK_MAX_FILE_SIZE} bytes')
+        return archive.open(member)
+    
+    archive_path = batch.archive.name
+    with default_storage.open(archive_path) as archive_file, zipfile.ZipFile(archive_file) as archive:
+        data_sources = register_files(
+            batch,
+            (
+                (os.path.basename(member.filename), lambda member=member: open_member(member))
+                for member in archive_members(archive)
+            )
+        )
+    
+    batch.archive = None
+    batch.save(update_fields=['archive'])
+    discard_upload(archive_path)
+    return data_sources
+
+
+def dispatch_batch(batch_id) -> int:
+    """Queue a batch's next pending documents, keeping at most its concurrency in flight.
+    
+    A document is in flight from being queued until it is completed or
+    failed; a fanned-out document stays in flight until its last chunk range
+    is done. Every queued document's final task runs this again, whether it
+    succeeds or fails, so each finished document frees its slot for the
+    next one. cleanup_failed_documents_task re-queues documents whose task
+    was lost. Returns the number of documents queued.
+    """
+    from .tasks import process_document_task
+    
+    with transaction.atomic():
+        # Lock the batch row so concurrent dispatchers can't both fill the same slots
+        batch = IngestBatch.objects.select_for_update().get(id=batch_id)
+        documents = DataSource.objects.filter(ingest_batch=batch)
+        in_flight = documents.filter(status__in=['pending', 'processing'], dispatched_at__isnull=False).count()
+        queued = list(documents.filter(status='pending', dispatched_at__isnull=True).order_by(
+            'created_at', 'id'
+        ).values_list('id', flat=True)[:max(0, batch.concurrency - in_flight)])
+        documents.filter(id__in=queued).update(dispatched_at=timezone.now())
+    
+    for data_source_id in queued:
+        link_batch_dispatch(process_document_task.si(str(data_source_id)), batch.id).apply_async()
+    if queued:
+        logger.info(f"Ingest batch {batch.id}: queued {len(queued)} documents ({in_flight} already in flight)")
+    return len(queued)
+
+
+def link_batch_dispatch(signature, batch_id):
+    """Make a task dispatch its batch's next documents when it finishes, successfully or not."""
+    from .tasks import dispatch_batch_task
+    
+    if batch_id:
+        follow_up = dispatch_batch_task.si(str(batch_id))
+        signature.link(follow_up)
+        signature.link_error(follow_up)
+    return signature
+
+
+def get_batch_progress(batch: IngestBatch) -> Dict[str, Any]:
+    """Aggregate processing progress and throughput over a batch's documents."""
+    data_sources = batch.data_sources.all()
+    counts = dict(data_sources.order_by().values_list('status').annotate(count=Count('id')))
+    totals = data_sources.aggregate(
+        chunks=Sum('total_chunks'),
+        tokens=Sum('total_tokens'),
+        pages=Sum('total_pages'),
+        processed_pages=Sum('processed_pages'),
+        last_completed_at=Max('processing_completed_at')
+    )
+    
+    documents = sum(counts.values())
+    finished = counts.get('completed', 0) + counts.get('failed', 0)
+    registering = batch.registered_at is None  # the archive is still being extracted
+    done = not registering and finished == documents
+    end_time = totals['last_completed_at'] if done and totals['last_completed_at'] else timezone.now()
+    elapsed = max((end_time - batch.created_at).total_seconds(), 0.0)
+    chunks = totals['chunks'] or 0
+    
+    return {
+        'registering': registering,
+        'documents': documents,
+        'pending': counts.get('pending', 0),
+        'processing': counts.get('processing', 0),
+        'completed': counts.get('completed', 0),
+        'failed': counts.get('failed', 0),
+        'duplicates': batch.duplicate_files,
+        'rejected': batch.failed_files,
+        'done': done,
+        'total_chunks': chunks,
+        'total_tokens': totals['tokens'] or 0,
+        'total_pages': totals['pages'] or 0,
+        'processed_pages': totals['processed_pages'] or 0,
+        'elapsed_seconds': round(elapsed, 1),
+        'chunks_per_second': round(chunks / elapsed, 1) if elapsed > 0 else None,
+        'documents_per_minute': round(finished * 60 / elapsed, 2) if elapsed > 0 else None,
+    }
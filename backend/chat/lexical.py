@@ -0,0 +1,168 @@
+import logging
+import re
+from typing import List, Iterable, Optional
+
+from django.db import connection
+
+from .models import DocumentChunk
+from .retrieval import RetrievedChunk
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'chat_documentchunk_fts'
+KEYS_TABLE = 'chat_documentchunk_fts_keys'
+# Chunk ids per DELETE, well under SQLite's bound-parameter limit
+DELETE_BATCH_SIZE = 500
+# Query terms beyond this are ignored; long pasted text gains little from them
+MAX_QUERY_TERMS = 32
+
+
+def build_match_query(query: str) -> str:
+    """Turn free text into an FTS5 query that ORs every distinct term.
+
+    Terms are quoted so punctuation in pasted codes and error strings can't
+    be parsed as FTS5 syntax; BM25 then favours chunks matching rare terms.
+    """
+    terms = []
+    for term in re.findall(r'\w+', query.lower()):
+        if term not in terms:
+            terms.append(term)
+    return ' OR '.join(f'"{term}"' for term in terms[:MAX_QUERY_TERMS])
+
+
+class LexicalIndex:
+    """BM25 full-text index over DocumentChunk content, backed by SQLite FTS5.
+
+    The index lives in the chat_documentchunk_fts virtual table (created by
+    migration 0008) and is written on the same connection as DocumentChunk
+    rows, so it shares their transactions. FTS5 can only look rows up by
+    rowid, so the chat_documentchunk_fts_keys table (migration 0018) maps
+    chunk and data source ids to FTS rowids; updates and deletes go through
+    it instead of scanning the index. It also holds each chunk's token
+    count, returned with search results. On databases other than SQLite the
+    index is disabled and searches return no results.
+    """
+    
+    @property
+    def available(self) -> bool:
+        return connection.vendor == 'sqlite'
+    
+    def add_chunks(self, chunks: Iterable[DocumentChunk], source_name: str,
+                   data_source_id: Optional[str] = None) -> None:
+        """Index chunks of a single data source, under data_source_id if given."""
+        if not self.available:
+            return
+        chunks = list(chunks)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {KEYS_TABLE} (chunk_id, data_source_id, chunk_index, token_count) VALUES (%s, %s, %s, %s)",
+                [
+                    (str(chunk.id), str(data_source_id or chunk.data_source_id), chunk.chunk_index, chunk.token_count)
+                    for chunk in chunks
+                ]
+            )
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, content, chunk_id, embedding_id, data_source_id, source, chunk_index, page_number) "
+                f"VALUES ((SELECT rowid FROM {KEYS_TABLE} WHERE chunk_id = %s), %s, %s, %s, %s, %s, %s, %s)",
+                [
+                    (str(chunk.id), chunk.content, str(chunk.id), chunk.embedding_id,
+                     str(data_source_id or chunk.data_source_id), source_name, chunk.chunk_index, chunk.page_number)
+                    for chunk in chunks
+                ]
+            )
+    
+    def update_positions(self, chunks: Iterable[DocumentChunk]) -> None:
+        """Refresh the chunk index and page number of already indexed chunks."""
+        if not self.available:
+            return
+        rows = [(chunk.chunk_index, chunk.page_number, str(chunk.id)) for chunk in chunks]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {FTS_TABLE} SET chunk_index = %s, page_number = %s "
+                f"WHERE rowid = (SELECT rowid FROM {KEYS_TABLE} WHERE chunk_id = %s)",
+                rows
+            )
+            cursor.executemany(
+                f"UPDATE {KEYS_TABLE} SET chunk_index = %s WHERE chunk_id = %s",
+                [(chunk_index, chunk_id) for chunk_index, _, chunk_id in rows]
+            )
+    
+    def move_source(self, from_source_id: str, to_source_id: str) -> None:
+        """Re-file every indexed chunk of one data source id under another."""
+        if not self.available:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {FTS_TABLE} SET data_source_id = %s "
+                f"WHERE rowid IN (SELECT rowid FROM {KEYS_TABLE} WHERE data_source_id = %s)",
+                [str(to_source_id), str(from_source_id)]
+            )
+            cursor.execute(
+                f"UPDATE {KEYS_TABLE} SET data_source_id = %s WHERE data_source_id = %s",
+                [str(to_source_id), str(from_source_id)]
+            )
+    
+    def delete_chunks(self, chunk_ids: Iterable[str]) -> None:
+        """Remove chunks from the index by id."""
+        if not self.available:
+            return
+        chunk_ids = [str(chunk_id) for chunk_id in chunk_ids]
+        for start in range(0, len(chunk_ids), DELETE_BATCH_SIZE):
+            batch = chunk_ids[start:start + DELETE_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            self._delete_where(f"chunk_id IN ({placeholders})", batch)
+    
+    def delete_source(self, data_source_id: str) -> None:
+        """Remove every indexed chunk of a data source."""
+        if not self.available:
+            return
+        self._delete_where("data_source_id = %s", [str(data_source_id)])
+    
+    def delete_chunks_from(self, data_source_id: str, chunk_index: int) -> None:
+        """Remove a data source's indexed chunks from chunk_index onwards."""
+        if not self.available:
+            return
+        self._delete_where("data_source_id = %s AND chunk_index >= %s", [str(data_source_id), chunk_index])
+    
+    def _delete_where(self, condition: str, params: List) -> None:
+        """Delete the indexed chunks whose key rows match condition, by rowid."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT rowid FROM {KEYS_TABLE} WHERE {condition})",
+                params
+            )
+            cursor.execute(f"DELETE FROM {KEYS_TABLE} WHERE {condition}", params)
+    
+    def search(self, query: str, k: int, source_ids: List[str]) -> List[RetrievedChunk]:
+        """Get the top-k chunks by BM25 among the given data sources."""
+        match_query = build_match_query(query)
+        if not self.available or not match_query or not source_ids:
+            return []
+        
+        placeholders = ', '.join(['%s'] * len(source_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {FTS_TABLE}.chunk_id, embedding_id, content, {FTS_TABLE}.data_source_id, source, "
+                f"{FTS_TABLE}.chunk_index, page_number, {KEYS_TABLE}.token_count, bm25({FTS_TABLE}) AS rank "
+                f"FROM {FTS_TABLE} LEFT JOIN {KEYS_TABLE} ON {KEYS_TABLE}.rowid = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.data_source_id IN ({placeholders}) "
+                f"ORDER BY rank LIMIT %s",
+                [match_query, *source_ids, k]
+            )
+            rows = cursor.fetchall()
+        
+        return [
+            RetrievedChunk(
+                id=chunk_id,
+                embedding_id=embedding_id,
+                content=content,
+                score=-rank,  # FTS5 bm25() is lower-is-better
+                distance=None,
+                data_source_id=data_source_id,
+                source=source,
+                chunk_index=chunk_index,
+                page_number=page_number,
+                token_count=token_count
+            )
+            for chunk_id, embedding_id, content, data_source_id, source, chunk_index, page_number, token_count, rank in rows
+        ]
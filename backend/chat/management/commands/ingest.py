@@ -0,0 +1,62 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.ingestion import dispatch_batch, get_batch_progress, register_files
+from chat.models import IngestBatch
+
+
+class Command(BaseCommand):
+    help = "Ingest every PDF in a directory as a bulk batch processed by the Celery workers."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory containing PDF files')
+        parser.add_argument('--concurrency', type=int, default=settings.RAG_BULK_INGEST_CONCURRENCY,
+                            help='Documents processed at once')
+        parser.add_argument('--recursive', action='store_true', help='Include PDFs in subdirectories')
+        parser.add_argument('--wait', action='store_true', help='Report progress until every document is done')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds between progress reports')
+    
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f"{directory} is not a directory")
+        
+        paths = []
+        for root, dirs, files in os.walk(directory):
+            paths.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith('.pdf'))
+            if not options['recursive']:
+                break
+        if not paths:
+            raise CommandError(f"No PDF files found in {directory}")
+        
+        concurrency = max(1, options['concurrency'])
+        batch = IngestBatch.objects.create(name=os.path.basename(os.path.abspath(directory)), concurrency=concurrency)
+        data_sources = register_files(
+            batch,
+            ((os.path.basename(path), lambda path=path: open(path, 'rb')) for path in paths)
+        )
+        dispatch_batch(batch.id)
+        
+        self.stdout.write(
+            f"Batch {batch.id}: queued {len(data_sources)} of {len(paths)} files "
+            f"({batch.duplicate_files} duplicates, {batch.failed_files} rejected), concurrency {concurrency}"
+        )
+        for error in batch.errors:
+            self.stderr.write(f"  {error['file']}: {error['error']}")
+        
+        if not options['wait'] or not data_sources:
+            return
+        
+        while True:
+            progress = get_batch_progress(batch)
+            self.stdout.write(
+                f"{progress['completed']}/{progress['documents']} completed, {progress['failed']} failed, "
+                f"{progress['processing']} processing | {progress['total_chunks']} chunks, "
+                f"{progress['chunks_per_second'] or 0} chunks/s, {progress['documents_per_minute'] or 0} docs/min"
+            )
+            if progress['done']:
+                break
+            time.sleep(options['poll_interval'])
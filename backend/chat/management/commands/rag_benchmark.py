@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.quantization import QUANTIZERS, top_k
+from chat.vector_store import create_vector_store
+
+
+class Command(BaseCommand):
+    help = "Benchmark memory use and recall@k of quantized vector search against exact float32 search."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200, help='Number of sample queries')
+        parser.add_argument('-k', type=int, default=5, help='Results per query')
+        parser.add_argument('--rescore-factor', type=int, default=settings.RAG_QUANTIZED_RESCORE_FACTOR,
+                            help='Candidates re-scored with float32 vectors, as a multiple of k')
+        parser.add_argument('--noise', type=float, default=0.05,
+                            help='Gaussian noise added to stored vectors to form queries')
+        parser.add_argument('--seed', type=int, default=0)
+    
+    def handle(self, *args, **options):
+        matrix = create_vector_store().export_vectors()
+        if not len(matrix):
+            raise CommandError("The vector index is empty; ingest some documents first.")
+        rows, dim = matrix.shape
+        k = min(options['k'], rows)
+        
+        # Queries are stored vectors nudged off their exact position
+        rng = np.random.default_rng(options['seed'])
+        sample = rng.choice(rows, size=min(options['queries'], rows), replace=False)
+        queries = matrix[sample] + rng.normal(0, options['noise'], (len(sample), dim)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        
+        start = time.perf_counter()
+        exact = [set(top_k(matrix @ query, k).tolist()) for query in queries]
+        exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        
+        self.stdout.write(f"{rows} vectors x {dim} dims, {len(queries)} queries, k={k}")
+        self.stdout.write(f"{'mode':<8} {'index MB':>10} {'ratio':>7} {'recall@k':>9} {'ms/query':>9}")
+        self.stdout.write(f"{'float32':<8} {matrix.nbytes / 2**20:>10.2f} {1.0:>7.1f} {1.0:>9.3f} {exact_ms:>9.2f}")
+        
+        for name, quantizer_class in QUANTIZERS.items():
+            quantizer = quantizer_class()
+            codes = quantizer.encode(matrix)
+            
+            hits = 0
+            start = time.perf_counter()
+            for query, truth in zip(queries, exact):
+                shortlist = np.sort(top_k(quantizer.score(codes, query), k * options['rescore_factor']))
+                rescored = matrix[shortlist] @ query
+                found = shortlist[top_k(rescored, k)]
+                hits += len(truth.intersection(found.tolist()))
+            elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            
+            self.stdout.write(
+                f"{name:<8} {codes.nbytes / 2**20:>10.2f} {matrix.nbytes / codes.nbytes:>7.1f} "
+                f"{hits / (len(queries) * k):>9.3f} {elapsed_ms:>9.2f}"
+            )
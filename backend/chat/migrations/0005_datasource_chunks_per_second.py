@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_alter_conversation_use_company_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasource',
+            name='chunks_per_second',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_embeddingcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ragquery',
+            name='cache_hit',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'chat_documentchunk_fts'
+
+
+def create_fts_index(apps, schema_editor):
+    """Create the FTS5 index over chunk content and backfill existing chunks (SQLite only)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "content, chunk_id UNINDEXED, embedding_id UNINDEXED, data_source_id UNINDEXED, "
+        "source UNINDEXED, chunk_index UNINDEXED, page_number UNINDEXED, "
+        "tokenize = 'porter unicode61')"
+    )
+    
+    DocumentChunk = apps.get_model('chat', 'DocumentChunk')
+    rows = [
+        (chunk.content, str(chunk.id), chunk.embedding_id, str(chunk.data_source_id),
+         chunk.data_source.name, chunk.chunk_index, chunk.page_number)
+        for chunk in DocumentChunk.objects.select_related('data_source').iterator()
+    ]
+    if rows:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (content, chunk_id, embedding_id, data_source_id, source, chunk_index, page_number) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                rows
+            )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_ragquery_cache_hit'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_documentchunk_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasource',
+            name='processed_pages',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='datasource',
+            name='total_pages',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_datasource_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasource',
+            name='extraction_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
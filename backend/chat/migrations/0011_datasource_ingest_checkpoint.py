@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_datasource_extraction_seconds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasource',
+            name='ingest_checkpoint',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='datasource',
+            name='processing_attempts',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:28
+
+import hashlib
+import unicodedata
+
+from django.db import migrations, models
+
+
+def backfill_content_hashes(apps, schema_editor):
+    """Hash existing chunks the same way chat.embeddings.content_hash does."""
+    DocumentChunk = apps.get_model('chat', 'DocumentChunk')
+    batch = []
+    for chunk in DocumentChunk.objects.only('id', 'content').iterator():
+        normalized = ' '.join(unicodedata.normalize('NFC', chunk.content).split())
+        chunk.content_hash = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        batch.append(chunk)
+        if len(batch) >= 500:
+            DocumentChunk.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        DocumentChunk.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0011_datasource_ingest_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasource',
+            name='recomputed_chunks',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='datasource',
+            name='reused_chunks',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='datasource',
+            name='version',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='documentchunk',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.RunPython(backfill_content_hashes, migrations.RunPython.noop),
+    ]
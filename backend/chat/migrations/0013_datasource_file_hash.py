@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:31
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_file_hashes(apps, schema_editor):
+    """Hash the stored files of existing data sources; missing files are left unhashed."""
+    DataSource = apps.get_model('chat', 'DataSource')
+    for data_source in DataSource.objects.exclude(file_path='').exclude(file_path__isnull=True).iterator():
+        digest = hashlib.sha256()
+        try:
+            with data_source.file_path.open('rb') as f:
+                for chunk in f.chunks():
+                    digest.update(chunk)
+        except (FileNotFoundError, OSError):
+            continue
+        DataSource.objects.filter(id=data_source.id).update(file_hash=digest.hexdigest())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0012_document_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasource',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.RunPython(backfill_file_hashes, migrations.RunPython.noop),
+    ]
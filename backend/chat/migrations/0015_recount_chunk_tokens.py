@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:39
+
+import logging
+
+from django.db import migrations
+from django.db.models import Sum
+
+logger = logging.getLogger(__name__)
+
+# Frozen copy of the token counting in chat.tokens as of this migration, so
+# later changes to that module don't change what this migration computes
+ENCODING_NAME = 'cl100k_base'
+CHARS_PER_TOKEN = 4
+
+
+def make_token_counter():
+    """Return a function that counts tokens with tiktoken, or estimates them."""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(ENCODING_NAME)
+    except Exception as e:
+        logger.warning(f"Tokenizer {ENCODING_NAME} unavailable, estimating chunk token counts: {str(e)}")
+        return lambda text: max(1, round(len(text) / CHARS_PER_TOKEN)) if text else 0
+    return lambda text: len(encoding.encode(text, disallowed_special=())) if text else 0
+
+
+def recount_chunk_tokens(apps, schema_editor):
+    """Replace whitespace word counts with tokenizer counts for existing chunks."""
+    count_tokens = make_token_counter()
+
+    DocumentChunk = apps.get_model('chat', 'DocumentChunk')
+    DataSource = apps.get_model('chat', 'DataSource')
+    batch = []
+    for chunk in DocumentChunk.objects.only('id', 'content').iterator():
+        chunk.token_count = count_tokens(chunk.content)
+        batch.append(chunk)
+        if len(batch) >= 500:
+            DocumentChunk.objects.bulk_update(batch, ['token_count'])
+            batch = []
+    if batch:
+        DocumentChunk.objects.bulk_update(batch, ['token_count'])
+
+    for data_source in DataSource.objects.all():
+        total = DocumentChunk.objects.filter(data_source=data_source).aggregate(total=Sum('token_count'))['total']
+        DataSource.objects.filter(id=data_source.id).update(total_tokens=total or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0014_ingestbatch'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_chunk_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0015_recount_chunk_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ragquery',
+            name='time_to_first_token',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
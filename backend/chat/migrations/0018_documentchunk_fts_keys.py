@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'chat_documentchunk_fts'
+KEYS_TABLE = 'chat_documentchunk_fts_keys'
+
+
+def create_fts_keys(apps, schema_editor):
+    """Map chunk and data source ids to FTS rowids, so index writes don't scan the FTS table (SQLite only)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE TABLE IF NOT EXISTS {KEYS_TABLE} ("
+        "rowid INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, "
+        "data_source_id TEXT NOT NULL, chunk_index INTEGER NOT NULL)"
+    )
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {KEYS_TABLE}_source_idx ON {KEYS_TABLE} (data_source_id, chunk_index)"
+    )
+    # Existing index rows keep their rowids
+    schema_editor.execute(
+        f"INSERT INTO {KEYS_TABLE} (rowid, chunk_id, data_source_id, chunk_index) "
+        f"SELECT rowid, chunk_id, data_source_id, chunk_index FROM {FTS_TABLE}"
+    )
+
+
+def drop_fts_keys(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {KEYS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0017_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_keys, drop_fts_keys),
+    ]
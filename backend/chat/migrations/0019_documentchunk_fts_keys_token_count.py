@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+KEYS_TABLE = 'chat_documentchunk_fts_keys'
+
+
+def add_token_count(apps, schema_editor):
+    """Store chunk token counts with the lexical index keys, so search results carry them (SQLite only)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"ALTER TABLE {KEYS_TABLE} ADD COLUMN token_count INTEGER")
+    
+    DocumentChunk = apps.get_model('chat', 'DocumentChunk')
+    rows = [
+        (token_count, str(chunk_id))
+        for chunk_id, token_count in DocumentChunk.objects.values_list('id', 'token_count').iterator()
+    ]
+    if rows:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(f"UPDATE {KEYS_TABLE} SET token_count = %s WHERE chunk_id = %s", rows)
+
+
+def drop_token_count(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"ALTER TABLE {KEYS_TABLE} DROP COLUMN token_count")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0018_documentchunk_fts_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_token_count, drop_token_count),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0019_documentchunk_fts_keys_token_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasource',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0020_datasource_dispatched_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasource',
+            name='pending_file',
+            field=models.FileField(blank=True, null=True, upload_to='documents/'),
+        ),
+        migrations.AddField(
+            model_name='datasource',
+            name='pending_file_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='datasource',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('updating', 'Updating'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
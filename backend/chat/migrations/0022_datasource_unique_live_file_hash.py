@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:21
+
+from django.db import migrations, models
+
+
+def clear_duplicate_hashes(apps, schema_editor):
+    """Keep the hash on the oldest live copy of each file, so the constraint can be added."""
+    DataSource = apps.get_model('chat', 'DataSource')
+    seen = set()
+    duplicates = []
+    for data_source_id, file_hash in DataSource.objects.exclude(status='failed').exclude(
+        file_hash=''
+    ).order_by('created_at').values_list('id', 'file_hash'):
+        if file_hash in seen:
+            duplicates.append(data_source_id)
+        seen.add(file_hash)
+    DataSource.objects.filter(id__in=duplicates).update(file_hash='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0021_datasource_pending_file'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_hashes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='datasource',
+            constraint=models.UniqueConstraint(condition=models.Q(models.Q(('status', 'failed'), _negated=True), models.Q(('file_hash', ''), _negated=True)), fields=('file_hash',), name='unique_live_file_hash'),
+        ),
+    ]
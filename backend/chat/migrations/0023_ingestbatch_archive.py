@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:34
+
+from django.db import migrations, models
+
+
+def mark_existing_batches_registered(apps, schema_editor):
+    """Batches created before archives were extracted in a task registered their files on upload."""
+    IngestBatch = apps.get_model('chat', 'IngestBatch')
+    IngestBatch.objects.update(registered_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0022_datasource_unique_live_file_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestbatch',
+            name='archive',
+            field=models.FileField(blank=True, null=True, upload_to='archives/'),
+        ),
+        migrations.AddField(
+            model_name='ingestbatch',
+            name='registered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_batches_registered, migrations.RunPython.noop),
+    ]
@@ -18,6 +18,10 @@ class Conversation(models.Model):
         choices=USE_COMPANY_DATA_CHOICES, 
         default='not_use'
     )
+    # Rolling summary of the messages older than the prompt's history window
+    summary = models.TextField(blank=True)
+    summarized_up_to = models.BigIntegerField(default=0)  # id of the last message folded into summary
+    summary_updated_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.title or f"Conversation {self.id}"
@@ -74,6 +78,27 @@ class UserFeedback(models.Model):
         verbose_name_plural = "User feedback"
 
 
+class IngestBatch(models.Model):
+    """Model for a bulk ingestion of many documents at once."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=255, blank=True)  # archive or directory name
+    created_at = models.DateTimeField(default=timezone.now)
+    concurrency = models.IntegerField(default=1)  # documents processed at once
+    archive = models.FileField(upload_to='archives/', null=True, blank=True)  # uploaded zip awaiting extraction
+    registered_at = models.DateTimeField(null=True, blank=True)  # every file has been stored and registered
+    
+    # Files that did not become a new DataSource
+    duplicate_files = models.IntegerField(default=0)
+    failed_files = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)  # [{'file': ..., 'error': ...}]
+
+    def __str__(self):
+        return f"Ingest batch {self.name or self.id}"
+
+    class Meta:
+        ordering = ['-created_at']
+
+
 class DataSource(models.Model):
     """Model for storing data source information."""
     SOURCE_TYPE_CHOICES = [
@@ -86,9 +111,12 @@ class DataSource(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('processing', 'Processing'),
+        ('updating', 'Updating'),  # a new version is being ingested; the current one is still served
         ('completed', 'Completed'),
         ('failed', 'Failed'),
     ]
+    # Statuses whose chunks retrieval may use
+    SERVED_STATUSES = ('completed', 'updating')
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
@@ -102,16 +130,40 @@ class DataSource(models.Model):
     processing_started_at = models.DateTimeField(null=True, blank=True)
     processing_completed_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
+    file_hash = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256 of the uploaded file
+    pending_file = models.FileField(upload_to='documents/', null=True, blank=True)  # new version being ingested
+    pending_file_hash = models.CharField(max_length=64, blank=True)
+    ingest_batch = models.ForeignKey(
+        IngestBatch, on_delete=models.SET_NULL, null=True, blank=True, related_name='data_sources'
+    )
+    dispatched_at = models.DateTimeField(null=True, blank=True)  # queued by its batch's dispatcher
     
     # Metadata
     total_chunks = models.IntegerField(default=0)
     total_tokens = models.IntegerField(default=0)
+    chunks_per_second = models.FloatField(null=True, blank=True)  # ingestion throughput
+    total_pages = models.IntegerField(default=0)
+    processed_pages = models.IntegerField(default=0)  # ingestion progress
+    extraction_seconds = models.FloatField(null=True, blank=True)  # text extraction wall time
+    ingest_checkpoint = models.IntegerField(default=0)  # chunks committed; a resumed run starts here
+    processing_attempts = models.IntegerField(default=0)
+    version = models.IntegerField(default=1)  # bumped by each uploaded revision
+    reused_chunks = models.IntegerField(default=0)  # chunks kept from the previous run
+    recomputed_chunks = models.IntegerField(default=0)  # chunks embedded by the last run
 
     def __str__(self):
         return f"{self.name} ({self.source_type})"
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # One live data source per file; a failed one may be uploaded again
+            models.UniqueConstraint(
+                fields=['file_hash'],
+                condition=~models.Q(status='failed') & ~models.Q(file_hash=''),
+                name='unique_live_file_hash'
+            ),
+        ]
 
 
 class DocumentChunk(models.Model):
@@ -122,6 +174,7 @@ class DocumentChunk(models.Model):
     chunk_index = models.IntegerField()
     page_number = models.IntegerField(null=True, blank=True)
     embedding_id = models.CharField(max_length=255, unique=True)  # ChromaDB ID
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256 of normalized content
     created_at = models.DateTimeField(default=timezone.now)
     
     # Metadata
@@ -147,10 +200,27 @@ class RAGQuery(models.Model):
     # Performance metrics
     retrieval_time = models.FloatField(null=True, blank=True)  # seconds
     generation_time = models.FloatField(null=True, blank=True)  # seconds
+    time_to_first_token = models.FloatField(null=True, blank=True)  # seconds, streamed answers only
     total_tokens_used = models.IntegerField(default=0)
+    cache_hit = models.BooleanField(default=False)  # served from the semantic answer cache
 
     def __str__(self):
         return f"RAG Query: {self.query[:50]}..."
 
     class Meta:
         ordering = ['-created_at']
+
+
+class EmbeddingCache(models.Model):
+    """Model for caching chunk embeddings by model and content hash."""
+    model_name = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64)  # SHA-256 of normalized text
+    vector = models.BinaryField()  # float32 bytes
+    dimensions = models.IntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.model_name}:{self.content_hash[:12]}"
+
+    class Meta:
+        unique_together = ['model_name', 'content_hash']
@@ -0,0 +1,125 @@
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Iterator, Tuple
+
+import pypdf
+
+logger = logging.getLogger(__name__)
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end); runs in a pool worker.
+    
+    A page that fails to extract yields empty text instead of failing the
+    whole range.
+    """
+    reader = pypdf.PdfReader(file_path)
+    texts = []
+    for page_number in range(start, end):
+        try:
+            texts.append(reader.pages[page_number].extract_text())
+        except Exception as e:
+            logger.warning(f"Error extracting page {page_number} of {file_path}: {str(e)}")
+            texts.append('')
+    return texts
+
+
+class PDFPageExtractor:
+    """Extract PDF page text in page order, in parallel for large documents.
+    
+    Documents with at least min_parallel_pages pages are split into ranges
+    of pages_per_task pages and extracted across a process pool; results are
+    yielded strictly in page order, with at most two ranges per worker in
+    flight. A range that doesn't finish within range_timeout seconds is
+    skipped (its pages yield empty text) so one corrupt page cannot stall
+    the document. Smaller documents are extracted in this process, where a
+    page that fails to extract is skipped the same way. skipped_pages lists
+    the skipped pages; elapsed accumulates the time spent extracting or
+    waiting for extraction.
+    """
+    
+    def __init__(self, file_path: str, workers: int, pages_per_task: int,
+                 range_timeout: float, min_parallel_pages: int):
+        self.file_path = file_path
+        self.workers = workers
+        self.pages_per_task = max(pages_per_task, 1)
+        self.range_timeout = range_timeout
+        self.min_parallel_pages = min_parallel_pages
+        self._reader = pypdf.PdfReader(file_path)
+        self.page_count = len(self._reader.pages)
+        self.skipped_pages = []
+        self.elapsed = 0.0
+    
+    @property
+    def parallel(self) -> bool:
+        # Daemonic processes (e.g. some worker pools) cannot start children
+        return (
+            self.workers > 1
+            and self.page_count >= self.min_parallel_pages
+            and not multiprocessing.current_process().daemon
+        )
+    
+    def iter_pages(self) -> Iterator[Tuple[int, str]]:
+        """Yield (page number, text) for every page in order."""
+        if self.parallel:
+            yield from self._iter_parallel()
+        else:
+            yield from self._iter_serial()
+    
+    def _iter_serial(self) -> Iterator[Tuple[int, str]]:
+        for page_number, page in enumerate(self._reader.pages):
+            start_time = time.monotonic()
+            try:
+                text = page.extract_text()
+            except Exception as e:
+                # As in the pool workers: one bad page yields empty text, not a failed document
+                logger.warning(f"Error extracting page {page_number} of {self.file_path}: {str(e)}; skipping it")
+                text = self._skip(page_number, page_number + 1)[0]
+            self.elapsed += time.monotonic() - start_time
+            yield page_number, text
+    
+    def _iter_parallel(self) -> Iterator[Tuple[int, str]]:
+        ranges = [
+            (start, min(start + self.pages_per_task, self.page_count))
+            for start in range(0, self.page_count, self.pages_per_task)
+        ]
+        # Spawned workers only import this module, not Django or the models
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        pending = deque()
+        next_range = 0
+        timed_out = False
+        try:
+            while next_range < len(ranges) or pending:
+                while next_range < len(ranges) and len(pending) < self.workers * 2:
+                    start, end = ranges[next_range]
+                    pending.append((start, end, executor.submit(extract_page_range, self.file_path, start, end)))
+                    next_range += 1
+                
+                start, end, future = pending.popleft()
+                wait_start = time.monotonic()
+                try:
+                    texts = future.result(timeout=self.range_timeout)
+                except FutureTimeoutError:
+                    logger.warning(f"Timed out extracting pages {start}-{end - 1} of {self.file_path}; skipping them")
+                    timed_out = True
+                    texts = self._skip(start, end)
+                except Exception as e:
+                    logger.warning(f"Error extracting pages {start}-{end - 1} of {self.file_path}: {str(e)}")
+                    texts = self._skip(start, end)
+                self.elapsed += time.monotonic() - wait_start
+                
+                for offset, text in enumerate(texts):
+                    yield start + offset, text
+        finally:
+            if timed_out:
+                # Don't wait on stuck workers
+                for process in list((executor._processes or {}).values()):
+                    process.terminate()
+            executor.shutdown(wait=not timed_out, cancel_futures=True)
+    
+    def _skip(self, start: int, end: int) -> List[str]:
+        self.skipped_pages.extend(range(start, end))
+        return [''] * (end - start)
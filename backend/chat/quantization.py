@@ -0,0 +1,105 @@
+from typing import Dict, Type
+
+import numpy as np
+
+# Rows scored per step; small blocks keep the int8 -> float32 copies in cache
+SCORE_BLOCK_ROWS = 2048
+
+# Number of set bits in every byte value, for Hamming distance
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+class Quantizer:
+    """Compact codes for unit-length float32 vectors.
+    
+    Codes are only used to shortlist candidates; final scores always come
+    from the full-precision vectors.
+    """
+    name = 'none'
+    
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode a (rows, dim) float32 matrix."""
+        raise NotImplementedError
+    
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate similarity of a float32 query with every code; higher is better."""
+        raise NotImplementedError
+    
+    def bytes_per_vector(self, dim: int) -> float:
+        raise NotImplementedError
+
+
+class Int8Quantizer(Quantizer):
+    """Scalar quantization of each component to int8 (4x smaller than float32).
+    
+    Unit vectors have components in [-1, 1], so one fixed scale fits every
+    vector. Scoring is asymmetric: int8 codes against the float query.
+    """
+    name = 'int8'
+    scale = 127.0
+    
+    def encode(self, vectors):
+        return np.clip(np.rint(vectors * self.scale), -127, 127).astype(np.int8)
+    
+    def score(self, codes, query):
+        scores = np.empty(len(codes), dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32) / self.scale
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        return scores
+    
+    def bytes_per_vector(self, dim):
+        return dim
+
+
+class BinaryQuantizer(Quantizer):
+    """Sign-bit quantization (32x smaller than float32), scored by Hamming distance."""
+    name = 'binary'
+    
+    def encode(self, vectors):
+        return np.packbits(vectors > 0, axis=1)
+    
+    def score(self, codes, query):
+        query_bits = np.packbits(np.asarray(query) > 0)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            distances = _popcount(np.bitwise_xor(block, query_bits)).sum(axis=1, dtype=np.int32)
+            scores[start:start + len(block)] = -distances
+        return scores
+    
+    def bytes_per_vector(self, dim):
+        return (dim + 7) // 8
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    """Count set bits per byte (NumPy >= 2.0 has a native ufunc)."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return POPCOUNT[values]
+
+
+QUANTIZERS: Dict[str, Type[Quantizer]] = {
+    Int8Quantizer.name: Int8Quantizer,
+    BinaryQuantizer.name: BinaryQuantizer,
+}
+
+
+def get_quantizer(name: str):
+    """Get a quantizer by name, or None for full-precision search."""
+    if not name or name == 'none':
+        return None
+    if name not in QUANTIZERS:
+        raise ValueError(f"Unsupported vector quantization: {name}")
+    return QUANTIZERS[name]()
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Get the indices of the k highest finite scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return top[np.isfinite(scores[top])]
@@ -1,56 +1,94 @@
 import os
+import copy
 import time
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator
 from pathlib import Path
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
 from django.utils import timezone
 
-import chromadb
-from chromadb.config import Settings
+import pypdf
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.schema import Document
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 
-from .models import DataSource, DocumentChunk
+from .answer_cache import CachedAnswer, SemanticAnswerCache
+from .corpus import get_active_corpus
+from .embeddings import EmbeddingService, content_hash
+from .history import build_history, is_follow_up
+from .lexical import LexicalIndex
+from .models import Conversation, DataSource, DocumentChunk, EmbeddingCache, RAGQuery
+from .pdf_extraction import PDFPageExtractor
+from .retrieval import RetrievedChunk, reciprocal_rank_fusion
 from .services import LLMService
+from .singleflight import SingleFlight, payload_key
+from .tokens import count_tokens, pack_to_budget, truncate_to_tokens
+from .vector_store import create_vector_store
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class PreparedResponse:
+    """The retrieval and prompt for one RAG-mode query, ready for the LLM."""
+    mode: str  # 'use' or 'both'
+    answer: Optional[str] = None  # cached or fixed answer; no LLM call needed
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    chunks: List[RetrievedChunk] = field(default_factory=list)  # chunks in the prompt
+    chunk_ids: List[str] = field(default_factory=list)
+    corpus_fingerprint: Optional[str] = None
+    retrieval_time: float = 0.0
+    cache_hit: bool = False
+    cache_query: Optional[str] = None  # query the answer is cached under; None if it depends on the conversation
+
+
+def staged_source_id(data_source_id) -> str:
+    """Source id under which a new document version is indexed until it goes live."""
+    return f"{data_source_id}:next"
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """Yield lists of up to size items from an iterable."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
 class RAGService:
     """Service for RAG (Retrieval-Augmented Generation) operations."""
     
     def __init__(self):
         self.llm_service = LLMService()
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
+        self.embedding_service = EmbeddingService()
         
-        # Initialize ChromaDB
-        self.chroma_client = chromadb.PersistentClient(
-            path="./chroma_db",
-            settings=Settings(anonymized_telemetry=False)
-        )
+        # Vector index (ChromaDB or the built-in NumPy engine)
+        self.vector_store = create_vector_store()
         
-        # Create or get collection
-        self.collection_name = "company_documents"
-        try:
-            self.collection = self.chroma_client.get_collection(self.collection_name)
-        except:
-            self.collection = self.chroma_client.create_collection(self.collection_name)
+        # BM25 index over chunk text for exact tokens (codes, error strings)
+        self.lexical_index = LexicalIndex()
         
-        # Initialize vector store
-        self.vector_store = Chroma(
-            client=self.chroma_client,
-            collection_name=self.collection_name,
-            embedding_function=self.embeddings
+        # Answers for repeated questions, keyed by query similarity and corpus state
+        self.answer_cache = SemanticAnswerCache(
+            max_size=settings.RAG_ANSWER_CACHE_SIZE,
+            ttl=settings.RAG_ANSWER_CACHE_TTL,
+            threshold=settings.RAG_ANSWER_CACHE_THRESHOLD
         )
         
+        # Concurrent identical queries share one retrieval (results stay in-process)
+        self.retrieval_singleflight = SingleFlight(
+            'retrieval',
+            wait_timeout=settings.LLM_SINGLEFLIGHT_TIMEOUT
+        ) if settings.LLM_SINGLEFLIGHT_ENABLED else None
+        
         # Text splitter for chunking
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
@@ -70,66 +108,68 @@ Question: {question}
 Answer based on the context. If context lacks info, say so briefly."""
         )
     
-    def process_document(self, data_source: DataSource) -> bool:
-        """Process a document and add it to the vector database."""
+    def process_document(self, data_source: DataSource, resume: bool = False) -> bool:
+        """Process a document and add it to the vector database.
+
+        With resume=True, chunks before the DataSource's ingest checkpoint
+        are kept and ingestion continues from there; otherwise the document
+        is ingested from scratch.
+        """
         try:
-            logger.info(f"Processing document: {data_source.name}")
+            logger.info(f"{'Resuming' if resume else 'Processing'} document: {data_source.name}")
+            start_time = time.time()
+            start_index = data_source.ingest_checkpoint if resume else 0
             
             # Update status to processing
             data_source.status = 'processing'
             data_source.processing_started_at = timezone.now()
+            data_source.processing_attempts = data_source.processing_attempts + 1 if resume else 1
+            data_source.ingest_checkpoint = start_index
+            data_source.total_pages = 0
+            data_source.processed_pages = 0
+            data_source.error_message = ''
             data_source.save()
             
-            # Load document based on type
-            if data_source.source_type == 'pdf':
-                documents = self._load_pdf(data_source.file_path.path)
-            else:
-                raise ValueError(f"Unsupported source type: {data_source.source_type}")
+            # Drop anything written past the checkpoint so every batch write
+            # below starts from a clean slate
+            self._discard_chunks_from(data_source, start_index)
+            total_chunks = start_index
+            total_tokens = DocumentChunk.objects.filter(data_source=data_source).aggregate(
+                total=Sum('token_count')
+            )['total'] or 0
+            if start_index:
+                logger.info(f"Skipping {start_index} already ingested chunks of {data_source.name}")
             
-            if not documents:
-                raise ValueError("No content found in document")
+            # Stream pages -> chunks -> embedding batches -> store, so memory
+            # stays bounded by the batch size whatever the document length.
+            # Chunking is deterministic, so chunk indexes match the earlier run.
+            pages = self._iter_pages(data_source)
+            chunks = islice(self._iter_chunks(pages), start_index, None)
+            batch_size = settings.RAG_INGEST_BATCH_SIZE
+            for batch in batched(chunks, batch_size):
+                total_tokens += self._store_chunk_batch(data_source, batch, total_chunks)
+                total_chunks += len(batch)
+                self._record_progress(data_source, total_chunks, total_tokens, batch[-1].metadata.get('page'))
             
-            # Split documents into chunks
-            chunks = self.text_splitter.split_documents(documents)
-            
-            # Process chunks and add to database
-            chunk_objects = []
-            for i, chunk in enumerate(chunks):
-                # Create embedding ID
-                embedding_id = f"{data_source.id}_{i}"
-                
-                # Add to ChromaDB
-                self.collection.add(
-                    documents=[chunk.page_content],
-                    metadatas=[{
-                        'source': data_source.name,
-                        'chunk_index': i,
-                        'page_number': chunk.metadata.get('page', None),
-                        'data_source_id': str(data_source.id)
-                    }],
-                    ids=[embedding_id]
-                )
-                
-                # Create DocumentChunk object
-                chunk_obj = DocumentChunk.objects.create(
-                    data_source=data_source,
-                    content=chunk.page_content,
-                    chunk_index=i,
-                    page_number=chunk.metadata.get('page', None),
-                    embedding_id=embedding_id,
-                    token_count=len(chunk.page_content.split()),
-                    metadata=chunk.metadata
-                )
-                chunk_objects.append(chunk_obj)
+            if not data_source.total_pages:
+                raise ValueError("No content found in document")
+            processing_time = time.time() - start_time
             
             # Update data source
             data_source.status = 'completed'
             data_source.processing_completed_at = timezone.now()
-            data_source.total_chunks = len(chunk_objects)
-            data_source.total_tokens = sum(chunk.token_count for chunk in chunk_objects)
+            data_source.processed_pages = data_source.total_pages
+            data_source.total_chunks = total_chunks
+            data_source.total_tokens = total_tokens
+            data_source.chunks_per_second = (total_chunks - start_index) / processing_time if processing_time > 0 else None
+            data_source.reused_chunks = start_index
+            data_source.recomputed_chunks = total_chunks - start_index
             data_source.save()
             
-            logger.info(f"Successfully processed {len(chunk_objects)} chunks for {data_source.name}")
+            logger.info(
+                f"Successfully processed {total_chunks} chunks for {data_source.name} "
+                f"({data_source.chunks_per_second or 0:.1f} chunks/sec)"
+            )
             return True
             
         except Exception as e:
@@ -139,86 +179,559 @@ Answer based on the context. If context lacks info, say so briefly."""
             data_source.save()
             return False
     
-    def _load_pdf(self, file_path: str) -> List[Document]:
-        """Load PDF document using PyPDFLoader."""
-        try:
-            loader = PyPDFLoader(file_path)
-            documents = loader.load()
-            return documents
-        except Exception as e:
-            logger.error(f"Error loading PDF {file_path}: {str(e)}")
-            raise
-    
-    def retrieve_relevant_chunks(self, query: str, k: int = 5) -> List[DocumentChunk]:
-        """Retrieve relevant document chunks for a query."""
+    def update_document(self, data_source: DataSource) -> bool:
+        """Ingest a new version of a document, embedding only chunks that changed.
+
+        The new file (pending_file) is re-chunked and each chunk is matched
+        by content hash against the current chunks. Unmatched new chunks are
+        embedded and indexed under a staging id that retrieval never
+        searches, while the current version keeps being served (status
+        'updating'). Then one transaction swaps the versions: matched chunks
+        keep their row, id and vector and move to their new position, staged
+        chunks join the document, current chunks left unmatched are deleted
+        and the new file replaces the old one. If the update fails, the
+        staged chunks and the new file are dropped and the current version
+        stays as it was.
+        """
+        next_version = data_source.version + 1
         try:
-            # Search in ChromaDB
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=k
-            )
+            logger.info(f"Updating document: {data_source.name} (version {next_version})")
+            start_time = time.time()
+            if not data_source.pending_file:
+                raise ValueError("No new version to ingest")
             
-            # Get DocumentChunk objects
-            chunk_ids = results['ids'][0]
-            chunks = []
-            for chunk_id in chunk_ids:
+            # Update status to updating; a retried update starts over
+            data_source.processing_attempts = data_source.processing_attempts + 1 if data_source.status == 'updating' else 1
+            data_source.status = 'updating'
+            data_source.processing_started_at = timezone.now()
+            data_source.error_message = ''
+            data_source.save()
+            self._discard_staged_chunks(data_source)
+            
+            existing = {}  # content hash -> ids of current chunks with that content
+            for chunk_id, chunk_hash in DocumentChunk.objects.filter(
+                data_source=data_source, chunk_index__gte=0
+            ).order_by('chunk_index').values_list('id', 'content_hash'):
+                existing.setdefault(chunk_hash, deque()).append(chunk_id)
+            
+            # Read the new file; the DataSource row keeps describing the current version
+            new_version = copy.copy(data_source)
+            new_version.file_path = data_source.pending_file
+            pages = self._iter_pages(new_version)
+            moved = {}  # current chunk id -> (chunk index, page number, metadata) in the new version
+            staged_ids = []
+            total_chunks = 0
+            total_tokens = 0
+            for batch in batched(self._iter_chunks(pages), settings.RAG_INGEST_BATCH_SIZE):
+                added = []
+                for offset, chunk in enumerate(batch):
+                    new_chunk = self._build_chunk(data_source, chunk, total_chunks + offset)
+                    total_tokens += new_chunk.token_count
+                    matches = existing.get(new_chunk.content_hash)
+                    if matches:
+                        moved[matches.popleft()] = (new_chunk.chunk_index, new_chunk.page_number, new_chunk.metadata)
+                    else:
+                        # Position-based ids could clash with current chunks
+                        new_chunk.embedding_id = f"{data_source.id}_{new_chunk.id}"
+                        added.append(new_chunk)
+                self._stage_chunks(data_source, added)
+                staged_ids.extend(chunk.id for chunk in added)
+                total_chunks += len(batch)
+                last_page = batch[-1].metadata.get('page')
+                if last_page is not None:
+                    DataSource.objects.filter(id=data_source.id).update(
+                        processed_pages=last_page + 1,
+                        updated_at=timezone.now()
+                    )
+            
+            if not new_version.total_pages:
+                raise ValueError("No content found in document")
+            removed = [chunk_id for chunk_ids in existing.values() for chunk_id in chunk_ids]
+            processing_time = time.time() - start_time
+            
+            # Swap versions
+            old_file = data_source.file_path.name if data_source.file_path else None
+            data_source.file_path = data_source.pending_file.name
+            data_source.file_hash = data_source.pending_file_hash
+            data_source.pending_file = None
+            data_source.pending_file_hash = ''
+            data_source.version = next_version
+            data_source.status = 'completed'
+            data_source.processing_completed_at = timezone.now()
+            data_source.total_pages = new_version.total_pages
+            data_source.processed_pages = new_version.total_pages
+            data_source.extraction_seconds = new_version.extraction_seconds
+            data_source.error_message = new_version.error_message
+            data_source.total_chunks = total_chunks
+            data_source.total_tokens = total_tokens
+            data_source.chunks_per_second = total_chunks / processing_time if processing_time > 0 else None
+            data_source.reused_chunks = len(moved)
+            data_source.recomputed_chunks = total_chunks - len(moved)
+            removed_embedding_ids = self._swap_versions(data_source, moved, staged_ids, removed)
+            
+            # Only now that the new version is live is the old one unrecoverable
+            self.vector_store.delete(removed_embedding_ids)
+            if old_file:
                 try:
-                    chunk = DocumentChunk.objects.get(embedding_id=chunk_id)
-                    chunks.append(chunk)
-                except DocumentChunk.DoesNotExist:
-                    logger.warning(f"Chunk {chunk_id} not found in database")
+                    default_storage.delete(old_file)
+                except Exception as e:
+                    logger.warning(f"Could not delete previous file of {data_source.name}: {str(e)}")
             
-            return chunks
+            logger.info(
+                f"Updated {data_source.name} to version {data_source.version}: reused {len(moved)} chunks, "
+                f"embedded {total_chunks - len(moved)}, deleted {len(removed)}"
+            )
+            return True
             
         except Exception as e:
-            logger.error(f"Error retrieving chunks: {str(e)}")
-            return []
+            logger.error(f"Error updating document {data_source.name}: {str(e)}")
+            self.abandon_update(data_source, f"Update to version {next_version} failed: {str(e)}")
+            return False
     
-    def generate_rag_response(self, query: str, conversation_id: int) -> str:
-        """Generate a response using RAG."""
+    def abandon_update(self, data_source: DataSource, reason: str) -> None:
+        """Drop a failed update's staged chunks and new file, leaving the current version as it was."""
         try:
-            start_time = time.time()
+            self._discard_staged_chunks(data_source)
+        except Exception as e:
+            logger.error(f"Error discarding staged chunks of {data_source.name}: {str(e)}")
+        
+        # Reload the current version's fields, which the update may have changed in memory
+        data_source.refresh_from_db()
+        if data_source.pending_file:
+            try:
+                default_storage.delete(data_source.pending_file.name)
+            except Exception as e:
+                logger.warning(f"Could not delete new file of {data_source.name}: {str(e)}")
+        data_source.status = 'completed' if data_source.status in DataSource.SERVED_STATUSES else 'failed'
+        data_source.processed_pages = data_source.total_pages
+        data_source.pending_file = None
+        data_source.pending_file_hash = ''
+        data_source.error_message = reason
+        data_source.save()
+    
+    def count_pages(self, data_source: DataSource) -> int:
+        """Get a document's page count without extracting its text; 0 if it can't be read.
+
+        Unreadable documents are left for process_document to mark failed.
+        """
+        try:
+            if data_source.source_type == 'pdf':
+                return len(pypdf.PdfReader(data_source.file_path.path).pages)
+            return 0
+        except Exception as e:
+            logger.warning(f"Could not count pages of {data_source.name}: {str(e)}")
+            return 0
+    
+    def prepare_fanout(self, data_source: DataSource) -> Optional[int]:
+        """Chunk a document and save its chunk rows without embedding them.
+
+        First step of fanned-out ingestion: embed_chunk_range then embeds and
+        indexes ranges of the saved rows in parallel, and finish_fanout
+        completes the document. The rows stay out of retrieval until then,
+        as only completed sources are searched. An interrupted fan-out leaves
+        no checkpoint, so a resume re-ingests the document from scratch.
+        Returns the number of chunks, or None if the document failed.
+        """
+        try:
+            logger.info(f"Chunking document for fan-out: {data_source.name}")
             
-            # Retrieve relevant chunks
-            chunks = self.retrieve_relevant_chunks(query)
-            retrieval_time = time.time() - start_time
+            # Update status to processing
+            data_source.status = 'processing'
+            data_source.processing_started_at = timezone.now()
+            data_source.processing_attempts = 1
+            data_source.ingest_checkpoint = 0
+            data_source.total_chunks = 0
+            data_source.total_pages = 0
+            data_source.processed_pages = 0
+            data_source.error_message = ''
+            data_source.save()
+            self._discard_chunks_from(data_source, 0)
             
-            if not chunks:
-                return "I don't have access to relevant company documents for this query. Please ask about topics covered in the uploaded documents."
+            pages = self._iter_pages(data_source)
+            chunk_count = 0
+            for batch in batched(self._iter_chunks(pages), settings.RAG_INGEST_BATCH_SIZE):
+                DocumentChunk.objects.bulk_create([
+                    self._build_chunk(data_source, chunk, chunk_count + offset)
+                    for offset, chunk in enumerate(batch)
+                ])
+                chunk_count += len(batch)
             
-            # Prepare context from chunks
-            context = "\n\n".join([chunk.content for chunk in chunks])
+            if not data_source.total_pages:
+                raise ValueError("No content found in document")
             
-            # Generate response using LLM
-            generation_start = time.time()
+            DataSource.objects.filter(id=data_source.id).update(
+                extraction_seconds=data_source.extraction_seconds,
+                error_message=data_source.error_message
+            )
+            logger.info(f"Split {data_source.name} into {chunk_count} chunks for fan-out")
+            return chunk_count
             
-            messages = [
-                {'role': 'system', 'content': self.rag_prompt_template.format(
-                    context=context,
-                    question=query
-                )},
-                {'role': 'user', 'content': query}
-            ]
+        except Exception as e:
+            logger.error(f"Error processing document {data_source.name}: {str(e)}")
+            data_source.status = 'failed'
+            data_source.error_message = str(e)
+            data_source.save()
+            return None
+    
+    def embed_chunk_range(self, data_source: DataSource, start_index: int, end_index: int) -> int:
+        """Embed and index the saved chunks in [start_index, end_index); returns their token count.
+
+        Safe to re-run: vector adds are upserts and the range's lexical
+        entries are replaced.
+        """
+        chunks = DocumentChunk.objects.filter(
+            data_source=data_source, chunk_index__gte=start_index, chunk_index__lt=end_index
+        ).order_by('chunk_index')
+        total_tokens = 0
+        for batch in batched(chunks.iterator(), settings.RAG_INGEST_BATCH_SIZE):
+            embeddings = self.embedding_service.embed_documents([chunk.content for chunk in batch])
+            with transaction.atomic():
+                self.lexical_index.delete_chunks([chunk.id for chunk in batch])
+                self._index_chunks(data_source, batch, embeddings)
+                # Ranges finish out of order, so progress is a running count
+                DataSource.objects.filter(id=data_source.id).update(
+                    total_chunks=F('total_chunks') + len(batch),
+                    updated_at=timezone.now()
+                )
+            total_tokens += sum(chunk.token_count for chunk in batch)
+        return total_tokens
+    
+    def finish_fanout(self, data_source: DataSource, failed_ranges: int = 0) -> bool:
+        """Complete a fanned-out document once every chunk range has run."""
+        if failed_ranges:
+            data_source.status = 'failed'
+            data_source.error_message = f"{failed_ranges} chunk range(s) failed to embed"
+            data_source.save()
+            logger.error(f"Error processing document {data_source.name}: {data_source.error_message}")
+            return False
+        
+        totals = DocumentChunk.objects.filter(data_source=data_source).aggregate(
+            chunks=Count('id'), tokens=Sum('token_count')
+        )
+        processing_time = (timezone.now() - data_source.processing_started_at).total_seconds()
+        
+        # Update data source
+        data_source.status = 'completed'
+        data_source.processing_completed_at = timezone.now()
+        data_source.processed_pages = data_source.total_pages
+        data_source.total_chunks = totals['chunks']
+        data_source.total_tokens = totals['tokens'] or 0
+        data_source.chunks_per_second = totals['chunks'] / processing_time if processing_time > 0 else None
+        data_source.reused_chunks = 0
+        data_source.recomputed_chunks = totals['chunks']
+        data_source.save()
+        
+        logger.info(
+            f"Successfully processed {data_source.total_chunks} chunks for {data_source.name} "
+            f"({data_source.chunks_per_second or 0:.1f} chunks/sec)"
+        )
+        return True
+    
+    def _stage_chunks(self, data_source: DataSource, chunk_objects: List[DocumentChunk]) -> None:
+        """Write a new version's chunks without exposing them to retrieval.
+
+        Both indexes get the chunks at their final positions under the
+        staged source id; the rows take negative chunk indexes (-1 - index)
+        so they can't clash with the current version's rows.
+        """
+        if not chunk_objects:
+            return
+        embeddings = self.embedding_service.embed_documents([chunk.content for chunk in chunk_objects])
+        with transaction.atomic():
+            self._index_chunks(data_source, chunk_objects, embeddings, source_id=staged_source_id(data_source.id))
+            for chunk in chunk_objects:
+                chunk.chunk_index = -1 - chunk.chunk_index
+            DocumentChunk.objects.bulk_create(chunk_objects)
+    
+    def _discard_staged_chunks(self, data_source: DataSource) -> None:
+        """Delete the staged chunks of an unfinished update, including index entries without a row."""
+        staged = list(DocumentChunk.objects.filter(data_source=data_source, chunk_index__lt=0).values_list('id', flat=True))
+        self._delete_chunks(staged)
+        self.vector_store.delete_by_source(staged_source_id(data_source.id))
+        self.lexical_index.delete_source(staged_source_id(data_source.id))
+    
+    def _swap_versions(self, data_source: DataSource, moved: Dict[Any, Tuple[int, Optional[int], Dict[str, Any]]],
+                       staged_ids: List[Any], removed: List[Any]) -> List[str]:
+        """Make a staged version live in one transaction, with data_source's fields already set.
+
+        Returns the embedding ids of the removed chunks, whose vectors the
+        caller deletes once the swap has committed.
+        """
+        chunks = DocumentChunk.objects.filter(data_source=data_source)
+        staged_id = staged_source_id(data_source.id)
+        with transaction.atomic():
+            removed_embedding_ids = []
+            for batch in batched(removed, 500):
+                removed_embedding_ids.extend(chunks.filter(id__in=batch).values_list('embedding_id', flat=True))
+                chunks.filter(id__in=batch).delete()
+                self.lexical_index.delete_chunks(batch)
             
-            response = self.llm_service.generate_response(messages)
-            generation_time = time.time() - generation_start
+            # Park the kept chunks below the staged ones, then move them into place
+            high = chunks.filter(chunk_index__gte=0).aggregate(high=Max('chunk_index'))['high']
+            if high is not None:
+                chunks.filter(chunk_index__gte=0).update(
+                    chunk_index=F('chunk_index') - (high + 1) - data_source.total_chunks
+                )
+            kept_metadata = []
+            for batch in batched(moved.items(), 500):
+                # The vector metadata update needs each kept chunk's vector id and token count
+                stored = {
+                    chunk_id: (embedding_id, token_count)
+                    for chunk_id, embedding_id, token_count in chunks.filter(
+                        id__in=[chunk_id for chunk_id, _ in batch]
+                    ).values_list('id', 'embedding_id', 'token_count')
+                }
+                kept = [
+                    DocumentChunk(id=chunk_id, data_source=data_source, chunk_index=chunk_index,
+                                  page_number=page_number, metadata=metadata,
+                                  embedding_id=stored[chunk_id][0], token_count=stored[chunk_id][1])
+                    for chunk_id, (chunk_index, page_number, metadata) in batch
+                ]
+                DocumentChunk.objects.bulk_update(kept, ['chunk_index', 'page_number', 'metadata'])
+                self.lexical_index.update_positions(kept)
+                kept_metadata.extend(kept)
             
-            # Store RAG query for analytics
-            from .models import RAGQuery, Conversation
-            conversation = Conversation.objects.get(id=conversation_id)
+            # Staged rows take their final positions and join the document in both indexes
+            chunks.filter(chunk_index__lt=0).update(chunk_index=-1 - F('chunk_index'))
+            self.lexical_index.move_source(staged_id, data_source.id)
+            data_source.save()
             
-            rag_query = RAGQuery.objects.create(
-                conversation=conversation,
-                query=query,
-                response=response,
-                retrieval_time=retrieval_time,
-                generation_time=generation_time,
-                total_tokens_used=len(response.split())  # Approximate
+            # Vector writes last: if one fails, the database rolls back and the update is retried or abandoned
+            for batch in batched(kept_metadata, 500):
+                self.vector_store.update_metadata(
+                    [chunk.embedding_id for chunk in batch],
+                    [self._vector_metadata(data_source, chunk) for chunk in batch]
+                )
+            for batch_ids in batched(staged_ids, 500):
+                batch = chunks.filter(id__in=batch_ids).only(
+                    'id', 'embedding_id', 'chunk_index', 'page_number', 'token_count'
+                )
+                self.vector_store.update_metadata(
+                    [chunk.embedding_id for chunk in batch],
+                    [self._vector_metadata(data_source, chunk) for chunk in batch]
+                )
+        return removed_embedding_ids
+    
+    def _delete_chunks(self, chunk_ids: List[Any]) -> None:
+        """Delete chunks by id from the database and both indexes."""
+        for batch in batched(chunk_ids, 500):
+            with transaction.atomic():
+                embedding_ids = list(DocumentChunk.objects.filter(id__in=batch).values_list('embedding_id', flat=True))
+                DocumentChunk.objects.filter(id__in=batch).delete()
+                self.lexical_index.delete_chunks(batch)
+                self.vector_store.delete(embedding_ids)
+    
+    def _store_chunk_batch(self, data_source: DataSource, chunks: List[Document], start_index: int) -> int:
+        """Write a batch of chunks with one vector-store add and one bulk insert.
+
+        Both writes and the DataSource's ingest checkpoint update happen
+        inside a single transaction, so a failed vector add rolls back the
+        batch's DocumentChunk rows and the checkpoint only ever covers
+        committed chunks. Vector ids are deterministic and the add is an
+        upsert, so replaying a batch is safe. Returns the batch's token count.
+        """
+        embeddings = self.embedding_service.embed_documents([chunk.page_content for chunk in chunks])
+        chunk_objects = [
+            self._build_chunk(data_source, chunk, start_index + offset)
+            for offset, chunk in enumerate(chunks)
+        ]
+        
+        with transaction.atomic():
+            self._write_chunks(data_source, chunk_objects, embeddings)
+            data_source.ingest_checkpoint = start_index + len(chunks)
+            DataSource.objects.filter(id=data_source.id).update(ingest_checkpoint=data_source.ingest_checkpoint)
+        
+        return sum(chunk.token_count for chunk in chunk_objects)
+    
+    def _build_chunk(self, data_source: DataSource, chunk: Document, chunk_index: int) -> DocumentChunk:
+        """Build an unsaved DocumentChunk for a split chunk at the given position."""
+        return DocumentChunk(
+            id=uuid.uuid4(),
+            data_source=data_source,
+            content=chunk.page_content,
+            chunk_index=chunk_index,
+            page_number=chunk.metadata.get('page', None),
+            embedding_id=f"{data_source.id}_{chunk_index}",
+            content_hash=content_hash(chunk.page_content),
+            token_count=count_tokens(chunk.page_content),
+            metadata=chunk.metadata
+        )
+    
+    def _vector_metadata(self, data_source: DataSource, chunk: DocumentChunk,
+                         source_id: Optional[str] = None) -> Dict[str, Any]:
+        """Get the vector-store metadata for a chunk, optionally filed under another source id."""
+        return {
+            'source': data_source.name,
+            'chunk_index': chunk.chunk_index,
+            'page_number': chunk.page_number,
+            'data_source_id': source_id or str(data_source.id),
+            'chunk_id': str(chunk.id),
+            'token_count': chunk.token_count
+        }
+    
+    def _write_chunks(self, data_source: DataSource, chunk_objects: List[DocumentChunk],
+                      embeddings: List[List[float]]) -> None:
+        """Insert chunk rows, index them and add their vectors; run inside a transaction."""
+        DocumentChunk.objects.bulk_create(chunk_objects)
+        self._index_chunks(data_source, chunk_objects, embeddings)
+    
+    def _index_chunks(self, data_source: DataSource, chunk_objects: List[DocumentChunk],
+                      embeddings: List[List[float]], source_id: Optional[str] = None) -> None:
+        """Add saved chunks to the lexical index and the vector store."""
+        self.lexical_index.add_chunks(chunk_objects, data_source.name, data_source_id=source_id)
+        self.vector_store.add(
+            ids=[chunk.embedding_id for chunk in chunk_objects],
+            embeddings=embeddings,
+            documents=[chunk.content for chunk in chunk_objects],
+            metadatas=[self._vector_metadata(data_source, chunk, source_id) for chunk in chunk_objects]
+        )
+    
+    def _discard_chunks_from(self, data_source: DataSource, start_index: int) -> None:
+        """Delete a data source's chunks from start_index onwards.
+
+        Clears rows left by a batch that was interrupted after the last
+        checkpoint; vectors for those ids are overwritten by the replayed
+        batch. A fresh run (start_index 0) clears everything of the source,
+        including chunks staged by an unfinished update, and its vectors.
+        """
+        if start_index == 0:
+            with transaction.atomic():
+                DocumentChunk.objects.filter(data_source=data_source).delete()
+                self.lexical_index.delete_source(data_source.id)
+            self.purge_data_source(data_source.id)
+            return
+        with transaction.atomic():
+            DocumentChunk.objects.filter(data_source=data_source, chunk_index__gte=start_index).delete()
+            self.lexical_index.delete_chunks_from(data_source.id, start_index)
+    
+    def _record_progress(self, data_source: DataSource, total_chunks: int, total_tokens: int,
+                         last_page: Optional[int]) -> None:
+        """Publish ingestion progress on the DataSource after each committed batch."""
+        data_source.total_chunks = total_chunks
+        data_source.total_tokens = total_tokens
+        if last_page is not None:
+            data_source.processed_pages = last_page + 1
+        # update() rather than save(): no signals, and no clobbering other fields
+        DataSource.objects.filter(id=data_source.id).update(
+            total_chunks=total_chunks,
+            total_tokens=total_tokens,
+            processed_pages=data_source.processed_pages,
+            updated_at=timezone.now()
+        )
+    
+    def _iter_pages(self, data_source: DataSource) -> Iterator[Document]:
+        """Yield a document's pages one at a time."""
+        if data_source.source_type == 'pdf':
+            return self._iter_pdf_pages(data_source)
+        raise ValueError(f"Unsupported source type: {data_source.source_type}")
+    
+    def _iter_pdf_pages(self, data_source: DataSource) -> Iterator[Document]:
+        """Yield PDF pages in order, extracting large documents across a process pool.
+
+        Records the page count, extraction wall time and any pages skipped
+        after an extraction timeout on the DataSource.
+        """
+        file_path = data_source.file_path.path
+        try:
+            extractor = PDFPageExtractor(
+                file_path,
+                workers=settings.RAG_PDF_WORKERS,
+                pages_per_task=settings.RAG_PDF_PAGES_PER_TASK,
+                range_timeout=settings.RAG_PDF_RANGE_TIMEOUT,
+                min_parallel_pages=settings.RAG_PDF_PARALLEL_MIN_PAGES
             )
-            rag_query.retrieved_chunks.set(chunks)
+        except Exception as e:
+            logger.error(f"Error loading PDF {file_path}: {str(e)}")
+            raise
+        
+        data_source.total_pages = extractor.page_count
+        DataSource.objects.filter(id=data_source.id).update(total_pages=data_source.total_pages)
+        
+        try:
+            for page_number, text in extractor.iter_pages():
+                yield Document(
+                    page_content=text,
+                    metadata={'source': file_path, 'page': page_number}
+                )
+        finally:
+            data_source.extraction_seconds = extractor.elapsed
+            if extractor.skipped_pages:
+                data_source.error_message = (
+                    f"Skipped {len(extractor.skipped_pages)} page(s) after extraction errors or timeouts: "
+                    f"{', '.join(str(page) for page in extractor.skipped_pages[:20])}"
+                )
+    
+    def _iter_chunks(self, pages: Iterable[Document]) -> Iterator[Document]:
+        """Split pages into chunks as they arrive."""
+        for page in pages:
+            yield from self.text_splitter.split_documents([page])
+    
+    def retrieve_relevant_chunks(self, query: str, k: int = 5) -> List[RetrievedChunk]:
+        """Retrieve relevant document chunks for a query, in rank order.
+
+        RAG_RETRIEVAL_MODE selects vector search, BM25 lexical search, or
+        both fused with reciprocal rank fusion ('hybrid'). If the query
+        can't be embedded, retrieval falls back to lexical search. Only
+        chunks from active, completed (or updating) data sources are searched. Identical
+        queries already being retrieved are joined rather than repeated.
+        """
+        if self.retrieval_singleflight is None:
+            return self._retrieve(query, k)
+        return list(self.retrieval_singleflight.do(
+            payload_key([settings.RAG_RETRIEVAL_MODE, k, query]),
+            lambda: self._retrieve(query, k),
+            shared=False
+        ))
+    
+    def _retrieve(self, query: str, k: int) -> List[RetrievedChunk]:
+        try:
+            active_source_ids = sorted(get_active_corpus().source_ids)
+            if not active_source_ids:
+                return []
             
-            return response
+            mode = settings.RAG_RETRIEVAL_MODE
+            if mode == 'lexical':
+                return self.lexical_index.search(query, k, active_source_ids)
+            
+            candidates = k if mode == 'vector' else max(k, settings.RAG_HYBRID_CANDIDATES)
+            try:
+                vector_hits = self._vector_search(query, candidates, active_source_ids)
+            except Exception as e:
+                logger.warning(f"Vector search unavailable, using lexical search: {str(e)}")
+                return self.lexical_index.search(query, k, active_source_ids)
+            
+            if mode == 'vector':
+                return vector_hits
+            
+            lexical_hits = self.lexical_index.search(query, candidates, active_source_ids)
+            return reciprocal_rank_fusion([vector_hits, lexical_hits], k)
             
+        except Exception as e:
+            logger.error(f"Error retrieving chunks: {str(e)}")
+            return []
+    
+    def _vector_search(self, query: str, k: int, source_ids: List[str]) -> List[RetrievedChunk]:
+        """Get the top-k chunks by embedding similarity among the given data sources.
+
+        Results are built from the vector store's documents and metadata, so
+        this does not query the database.
+        """
+        chunks = self.vector_store.query(self.embedding_service.embed_query(query), k, source_ids)
+        
+        # Vectors written before chunk ids were stored in metadata need one lookup
+        legacy = {chunk.embedding_id: chunk for chunk in chunks if chunk.id is None}
+        if legacy:
+            for embedding_id, chunk_id in DocumentChunk.objects.filter(
+                embedding_id__in=list(legacy)
+            ).values_list('embedding_id', 'id'):
+                legacy[embedding_id].id = str(chunk_id)
+        
+        return chunks
+    
+    def generate_rag_response(self, query: str, conversation_id: int) -> str:
+        """Generate a response using RAG."""
+        try:
+            return self._generate_response(query, conversation_id, 'use', self.llm_service)
         except Exception as e:
             logger.error(f"Error generating RAG response: {str(e)}")
             return f"Error generating response: {str(e)}"
@@ -226,73 +739,226 @@ Answer based on the context. If context lacks info, say so briefly."""
     def generate_intelligent_response(self, query: str, conversation_id: int, llm_service: LLMService) -> str:
         """Generate an intelligent response using RAG priority with LLM fallback."""
         try:
-            start_time = time.time()
-            
-            # First, try to get RAG information
-            chunks = self.retrieve_relevant_chunks(query)
-            
-            if not chunks:
+            return self._generate_response(query, conversation_id, 'both', llm_service)
+        except Exception as e:
+            logger.error(f"Error generating intelligent response: {str(e)}")
+            return f"Error generating response: {str(e)}"
+    
+    def _generate_response(self, query: str, conversation_id: int, mode: str, llm_service: LLMService) -> str:
+        prepared = self.prepare_response(query, conversation_id, mode)
+        if prepared.answer is not None:
+            return prepared.answer
+        
+        generation_start = time.time()
+        response = llm_service.generate_response(prepared.messages)
+        self.finish_response(conversation_id, query, prepared, response, time.time() - generation_start)
+        return response
+    
+    def prepare_response(self, query: str, conversation_id: int, mode: str) -> PreparedResponse:
+        """Do the work before the LLM call for a RAG mode ('use' or 'both').
+        
+        query is the conversation's newest message. Earlier turns (the
+        bounded history) go into the prompt. A standalone query is served
+        from the answer cache when possible (recording it). A follow-up that
+        refers back to the conversation is never looked up as is: it is
+        rewritten as a standalone question, which is used for the cache
+        lookup and retrieval. Otherwise retrieves chunks and builds the
+        prompt messages. Answers that need no LLM call come back in
+        PreparedResponse.answer.
+        """
+        start_time = time.time()
+        
+        history = build_history(Conversation.objects.get(id=conversation_id), include_latest=False)
+        if history and is_follow_up(query):
+            search_query = self._standalone_query(query, history)
+            # Unless it was rewritten, the answer depends on this conversation: no cache
+            cache_query = search_query if search_query != query else None
+        else:
+            search_query = cache_query = query
+        
+        # Serve repeated questions from the semantic answer cache
+        cached, corpus_fingerprint = (
+            self._lookup_cached_answer(cache_query, mode) if cache_query is not None else (None, None)
+        )
+        if cached:
+            retrieval_time = time.time() - start_time
+            self._record_rag_query(conversation_id, query, cached.answer, cached.chunk_ids,
+                                   retrieval_time=retrieval_time, generation_time=0, cache_hit=True)
+            return PreparedResponse(mode=mode, answer=cached.answer, chunk_ids=cached.chunk_ids,
+                                    retrieval_time=retrieval_time, cache_hit=True)
+        
+        # Retrieve relevant chunks
+        chunks = self.retrieve_relevant_chunks(search_query)
+        prepared = PreparedResponse(mode=mode, corpus_fingerprint=corpus_fingerprint, cache_query=cache_query)
+        
+        if not chunks:
+            prepared.retrieval_time = time.time() - start_time
+            if mode == 'use':
+                prepared.answer = "I don't have access to relevant company documents for this query. Please ask about topics covered in the uploaded documents."
+            else:
                 # No RAG data found, use LLM knowledge only
-                messages = [
+                prepared.messages = [
                     {'role': 'system', 'content': 'You are a helpful AI assistant. Be very concise.'},
+                    *history,
                     {'role': 'user', 'content': query}
                 ]
-                return llm_service.generate_response(messages)
-            
-            # RAG data found, use it with LLM fallback
-            context = "\n\n".join([chunk.content for chunk in chunks])
-            
-            # Generate response using RAG context with LLM fallback
+            return prepared
+        
+        # Prepare context from the best chunks that fit the token budget
+        context, prepared.chunks = self._build_context(chunks)
+        prepared.chunk_ids = [chunk.id for chunk in prepared.chunks if chunk.id]
+        prepared.retrieval_time = time.time() - start_time
+        
+        if mode == 'use':
+            prepared.messages = [
+                {'role': 'system', 'content': self.rag_prompt_template.format(
+                    context=context,
+                    question=search_query
+                )},
+                *history,
+                {'role': 'user', 'content': query}
+            ]
+        else:
+            # Answer from company context first, general knowledge as fallback
             final_prompt = f"""You are a helpful AI assistant combining company knowledge with general knowledge. Be very concise.
 
 Company Context: {context}
-Question: {query}
+Question: {search_query}
 
 Answer using company info first, add general knowledge if needed. Keep it brief."""
             
-            final_messages = [
+            prepared.messages = [
                 {'role': 'system', 'content': 'You are a helpful AI assistant combining company knowledge with general knowledge. Be very concise.'},
+                *history,
                 {'role': 'user', 'content': final_prompt}
             ]
-            
-            final_response = llm_service.generate_response(final_messages)
-            
-            # Store RAG query for analytics
-            from .models import RAGQuery, Conversation
-            conversation = Conversation.objects.get(id=conversation_id)
-            
-            rag_query = RAGQuery.objects.create(
-                conversation=conversation,
-                query=query,
-                response=final_response,
-                retrieval_time=time.time() - start_time,
-                generation_time=0,
-                total_tokens_used=len(final_response.split())  # Approximate
+        return prepared
+    
+    def _standalone_query(self, query: str, history: List[Dict[str, str]]) -> str:
+        """Rewrite a follow-up question so it can be understood without the conversation.
+        
+        "What about contractors?" after a question on vacation days becomes
+        a question about contractors' vacation days. Costs a model call, so
+        prepare_response only asks on a cache miss for queries that look
+        like follow-ups. Returns the query unchanged when
+        RAG_CONDENSE_FOLLOWUPS is off or if the model call fails.
+        """
+        if not settings.RAG_CONDENSE_FOLLOWUPS:
+            return query
+        
+        transcript = '\n'.join(f"{message['role']}: {message['content']}" for message in history)
+        standalone = self.llm_service.generate_response([
+            {'role': 'system', 'content': 'Rewrite the follow-up question as a standalone question, using the conversation for context. If it is already standalone, repeat it unchanged. Reply with the question only.'},
+            {'role': 'user', 'content': f"Conversation:\n{transcript}\n\nFollow-up question: {query}"}
+        ])
+        if not standalone or standalone.startswith('Error'):
+            return query
+        logger.info(f"Follow-up '{query}' rewritten as '{standalone}'")
+        return standalone
+    
+    def finish_response(self, conversation_id: int, query: str, prepared: PreparedResponse, response: str,
+                        generation_time: float, time_to_first_token: Optional[float] = None) -> None:
+        """Record a generated answer for analytics and cache it."""
+        if prepared.chunks:
+            prompt_tokens = sum(count_tokens(message['content']) for message in prepared.messages)
+            self._record_rag_query(conversation_id, query, response, prepared.chunks,
+                                   retrieval_time=prepared.retrieval_time, generation_time=generation_time,
+                                   tokens_used=prompt_tokens + count_tokens(response),
+                                   time_to_first_token=time_to_first_token)
+        if prepared.cache_query is not None:
+            self._cache_answer(prepared.cache_query, response, prepared.mode,
+                               prepared.corpus_fingerprint, prepared.chunks)
+    
+    def _build_context(self, chunks: List[RetrievedChunk]) -> Tuple[str, List[RetrievedChunk]]:
+        """Pack the highest-ranked chunks into RAG_CONTEXT_TOKEN_BUDGET prompt tokens.
+
+        Uses the token counts stored with the chunks in both indexes at
+        ingestion, counting the retrieved text for chunks indexed without
+        one, so no database query is needed. Returns the context text and
+        the chunks it includes.
+        """
+        budget = settings.RAG_CONTEXT_TOKEN_BUDGET
+        separator = "\n\n"
+        token_counts = [chunk.token_count or count_tokens(chunk.content) for chunk in chunks]
+        
+        picked = [chunks[index] for index in pack_to_budget(token_counts, budget, count_tokens(separator))]
+        if not picked:
+            # Even the best chunk is over budget; send as much of it as fits
+            return truncate_to_tokens(chunks[0].content, budget), chunks[:1]
+        if len(picked) < len(chunks):
+            logger.info(f"Packed {len(picked)} of {len(chunks)} chunks into the {budget}-token context budget")
+        return separator.join(chunk.content for chunk in picked), picked
+    
+    def _lookup_cached_answer(self, query: str, mode: str) -> Tuple[Optional[CachedAnswer], Optional[str]]:
+        """Look up a semantically similar cached answer for the current corpus.
+
+        Returns the cached answer (or None) and the corpus fingerprint that a
+        newly generated answer should be cached under.
+        """
+        if not settings.RAG_ANSWER_CACHE_ENABLED:
+            return None, None
+        try:
+            corpus_fingerprint = get_active_corpus().fingerprint
+            vector = self.embedding_service.embed_query(query)
+            return self.answer_cache.lookup(vector, mode, corpus_fingerprint), corpus_fingerprint
+        except Exception as e:
+            logger.warning(f"Error checking answer cache: {str(e)}")
+            return None, None
+    
+    def _cache_answer(self, query: str, answer: str, mode: str,
+                      corpus_fingerprint: Optional[str], chunks: List[RetrievedChunk]) -> None:
+        """Cache a generated answer unless it is an error message."""
+        if corpus_fingerprint is None or answer.startswith('Error'):
+            return
+        try:
+            self.answer_cache.store(
+                query,
+                self.embedding_service.embed_query(query),
+                answer,
+                mode,
+                corpus_fingerprint,
+                [chunk.id for chunk in chunks if chunk.id]
             )
-            rag_query.retrieved_chunks.set(chunks)
-            
-            return final_response
-            
         except Exception as e:
-            logger.error(f"Error generating intelligent response: {str(e)}")
-            return f"Error generating response: {str(e)}"
+            logger.warning(f"Error caching answer: {str(e)}")
+    
+    def _record_rag_query(self, conversation_id: int, query: str, response: str, chunks: list,
+                          retrieval_time: float, generation_time: float, cache_hit: bool = False,
+                          tokens_used: int = 0, time_to_first_token: Optional[float] = None) -> None:
+        """Store a RAG query and the chunks it used for analytics.
+
+        tokens_used counts prompt and response tokens sent to and from the
+        LLM, so answers served from the cache use none. time_to_first_token
+        is only known for streamed answers.
+        """
+        conversation = Conversation.objects.get(id=conversation_id)
+        
+        rag_query = RAGQuery.objects.create(
+            conversation=conversation,
+            query=query,
+            response=response,
+            retrieval_time=retrieval_time,
+            generation_time=generation_time,
+            total_tokens_used=tokens_used,
+            time_to_first_token=time_to_first_token,
+            cache_hit=cache_hit
+        )
+        # Chunks may be retrieval results or primary keys (cached answers)
+        chunk_ids = [chunk if isinstance(chunk, str) else chunk.id for chunk in chunks]
+        rag_query.retrieved_chunks.set(
+            DocumentChunk.objects.filter(id__in=[chunk_id for chunk_id in chunk_ids if chunk_id]).values_list('id', flat=True)
+        )
     
     def get_active_sources(self) -> List[DataSource]:
         """Get all active data sources."""
-        return DataSource.objects.filter(is_active=True, status='completed')
+        return DataSource.objects.filter(is_active=True, status__in=DataSource.SERVED_STATUSES)
     
     def delete_document_chunks(self, data_source: DataSource) -> bool:
         """Delete all chunks for a data source."""
         try:
-            # Delete from ChromaDB
-            chunks = DocumentChunk.objects.filter(data_source=data_source)
-            embedding_ids = [chunk.embedding_id for chunk in chunks]
-            
-            if embedding_ids:
-                self.collection.delete(ids=embedding_ids)
-            
-            # Delete from database
-            chunks.delete()
+            # Delete from the vector store, the lexical index and the database
+            self.purge_data_source(data_source.id)
+            DocumentChunk.objects.filter(data_source=data_source).delete()
             
             # Reset data source stats
             data_source.total_chunks = 0
@@ -305,6 +971,17 @@ Answer using company info first, add general knowledge if needed. Keep it brief.
             logger.error(f"Error deleting chunks for {data_source.name}: {str(e)}")
             return False
     
+    def purge_data_source(self, data_source_id) -> None:
+        """Remove a data source's vectors and lexical index entries.
+
+        Works from the id alone, so it also cleans up after a DataSource row
+        (and its DocumentChunks) has already been deleted. Entries staged by
+        an unfinished update go too.
+        """
+        for source_id in (str(data_source_id), staged_source_id(data_source_id)):
+            self.vector_store.delete_by_source(source_id)
+            self.lexical_index.delete_source(source_id)
+    
     def get_database_stats(self) -> Dict[str, Any]:
         """Get statistics about the RAG database."""
         try:
@@ -318,8 +995,76 @@ Answer using company info first, add general knowledge if needed. Keep it brief.
                 'active_sources': active_sources,
                 'total_chunks': total_chunks,
                 'total_tokens': total_tokens,
-                'collection_size': self.collection.count()
+                'collection_size': self.vector_store.count(),
+                'vector_backend': settings.RAG_VECTOR_BACKEND,
+                'vector_index': self.vector_store.get_stats(),
+                'cached_embeddings': EmbeddingCache.objects.filter(
+                    model_name=self.embedding_service.model_name
+                ).count(),
+                'query_cache': self.embedding_service.query_cache.get_stats(),
+                'answer_cache': self.answer_cache.get_stats(),
+                'retrieval_coalescing': (
+                    self.retrieval_singleflight.get_stats() if self.retrieval_singleflight else None
+                )
             }
         except Exception as e:
             logger.error(f"Error getting database stats: {str(e)}")
             return {}
+
+
+
+# Process-wide RAGService registry. Building a RAGService loads the embedding
+# model and opens the Chroma client, so each worker process keeps one shared
+# instance instead of constructing a new one per request.
+_rag_service: Optional[RAGService] = None
+_rag_service_lock = threading.Lock()
+_rag_service_state: Dict[str, Any] = {
+    'status': 'cold',
+    'load_time': None,
+    'error': None,
+}
+
+
+def get_rag_service() -> RAGService:
+    """Return the shared RAGService, loading it on first use."""
+    global _rag_service
+    if _rag_service is None:
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service_state['status'] = 'loading'
+                start_time = time.time()
+                try:
+                    _rag_service = RAGService()
+                except Exception as e:
+                    _rag_service_state['status'] = 'failed'
+                    _rag_service_state['error'] = str(e)
+                    raise
+                _rag_service_state['status'] = 'ready'
+                _rag_service_state['load_time'] = time.time() - start_time
+                _rag_service_state['error'] = None
+                logger.info(f"RAG service loaded in {_rag_service_state['load_time']:.2f}s (pid {os.getpid()})")
+    return _rag_service
+
+
+def is_rag_service_ready() -> bool:
+    """Check whether the shared RAGService has finished loading."""
+    return _rag_service is not None
+
+
+def get_rag_service_state() -> Dict[str, Any]:
+    """Get the load state of the shared RAGService for readiness probes."""
+    return {**_rag_service_state, 'ready': is_rag_service_ready(), 'pid': os.getpid()}
+
+
+def warm_up_rag_service(background: bool = True) -> None:
+    """Load the shared RAGService ahead of the first request."""
+    def _load():
+        try:
+            get_rag_service()
+        except Exception as e:
+            logger.error(f"Error warming up RAG service: {str(e)}")
+
+    if background:
+        threading.Thread(target=_load, name='rag-warm-up', daemon=True).start()
+    else:
+        _load()
@@ -0,0 +1,57 @@
+from dataclasses import dataclass, replace
+from typing import List, Dict, Any, Optional
+
+# Rank constant from the original reciprocal rank fusion paper
+RRF_K = 60
+
+
+@dataclass
+class RetrievedChunk:
+    """A retrieval hit with its content, score and source metadata."""
+    id: Optional[str]  # DocumentChunk primary key
+    embedding_id: str
+    content: str
+    score: float  # higher is better; cosine similarity, -BM25 or fused RRF score
+    distance: Optional[float]  # vector distance, None for lexical-only hits
+    data_source_id: Optional[str]
+    source: str
+    chunk_index: Optional[int]
+    page_number: Optional[int]
+    token_count: Optional[int] = None  # stored at ingestion; None for chunks indexed before it was
+    
+    @classmethod
+    def from_vector_metadata(cls, embedding_id: str, content: str, metadata: Optional[Dict[str, Any]],
+                             distance: float) -> 'RetrievedChunk':
+        """Build a result from a vector-store hit."""
+        metadata = metadata or {}
+        return cls(
+            id=metadata.get('chunk_id'),
+            embedding_id=embedding_id,
+            content=content,
+            # Squared L2 distance between unit vectors is 2 - 2 * cosine
+            score=1 - distance / 2,
+            distance=distance,
+            data_source_id=metadata.get('data_source_id'),
+            source=metadata.get('source', ''),
+            chunk_index=metadata.get('chunk_index'),
+            page_number=metadata.get('page_number'),
+            token_count=metadata.get('token_count')
+        )
+
+
+def reciprocal_rank_fusion(rankings: List[List[RetrievedChunk]], k: int) -> List[RetrievedChunk]:
+    """Fuse ranked result lists with reciprocal rank fusion and return the top k.
+
+    Each hit scores sum(1 / (RRF_K + rank)) over the lists it appears in;
+    the returned chunks carry that fused score.
+    """
+    fused_scores = {}
+    hits = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            fused_scores[chunk.embedding_id] = fused_scores.get(chunk.embedding_id, 0.0) + 1.0 / (RRF_K + rank)
+            # Prefer the first list's copy, which carries the vector distance
+            hits.setdefault(chunk.embedding_id, chunk)
+    
+    ranked = sorted(fused_scores, key=fused_scores.get, reverse=True)[:k]
+    return [replace(hits[embedding_id], score=fused_scores[embedding_id]) for embedding_id in ranked]
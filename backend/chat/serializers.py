@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Conversation, Message, UserFeedback, DataSource, DocumentChunk, RAGQuery
+from .models import Conversation, Message, UserFeedback, DataSource, DocumentChunk, RAGQuery, IngestBatch
+from .ingestion import get_batch_progress
 
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -74,11 +75,16 @@ class DataSourceSerializer(serializers.ModelSerializer):
             'id', 'name', 'source_type', 'file_path', 'url', 'is_active', 
             'status', 'created_at', 'updated_at', 'processing_started_at', 
             'processing_completed_at', 'error_message', 'total_chunks', 
-            'total_tokens', 'chunks', 'chunk_count'
+            'total_tokens', 'chunks_per_second', 'total_pages', 'processed_pages',
+            'extraction_seconds', 'ingest_checkpoint', 'processing_attempts', 'version',
+            'reused_chunks', 'recomputed_chunks', 'file_hash', 'pending_file', 'chunks', 'chunk_count'
         ]
         read_only_fields = [
             'id', 'status', 'created_at', 'updated_at', 'processing_started_at',
-            'processing_completed_at', 'error_message', 'total_chunks', 'total_tokens'
+            'processing_completed_at', 'error_message', 'total_chunks', 'total_tokens',
+            'chunks_per_second', 'total_pages', 'processed_pages', 'extraction_seconds',
+            'ingest_checkpoint', 'processing_attempts', 'version', 'reused_chunks', 'recomputed_chunks',
+            'file_hash', 'pending_file'
         ]
 
     def get_chunk_count(self, obj):
@@ -92,13 +98,25 @@ class DataSourceListSerializer(serializers.ModelSerializer):
         model = DataSource
         fields = [
             'id', 'name', 'source_type', 'is_active', 'status', 
-            'created_at', 'total_chunks', 'total_tokens', 'chunk_count'
+            'created_at', 'total_chunks', 'total_tokens', 'chunk_count',
+            'total_pages', 'processed_pages', 'version'
         ]
 
     def get_chunk_count(self, obj):
         return obj.chunks.count()
 
 
+class IngestBatchSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = IngestBatch
+        fields = ['id', 'name', 'created_at', 'concurrency', 'registered_at', 'duplicate_files', 'failed_files', 'errors', 'progress']
+
+    def get_progress(self, obj):
+        return get_batch_progress(obj)
+
+
 class RAGQuerySerializer(serializers.ModelSerializer):
     retrieved_chunks = DocumentChunkSerializer(many=True, read_only=True)
 
@@ -106,9 +124,9 @@ class RAGQuerySerializer(serializers.ModelSerializer):
         model = RAGQuery
         fields = [
             'id', 'query', 'response', 'retrieved_chunks', 'created_at',
-            'retrieval_time', 'generation_time', 'total_tokens_used'
+            'retrieval_time', 'generation_time', 'time_to_first_token', 'total_tokens_used', 'cache_hit'
         ]
         read_only_fields = [
             'id', 'response', 'retrieved_chunks', 'created_at',
-            'retrieval_time', 'generation_time', 'total_tokens_used'
+            'retrieval_time', 'generation_time', 'time_to_first_token', 'total_tokens_used', 'cache_hit'
         ]
@@ -1,11 +1,145 @@
 import os
+import asyncio
+import random
+import threading
+import time
+import logging
+import weakref
+import httpx
 import requests
 import json
-from typing import List, Dict, Any
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Union
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .singleflight import SingleFlight, payload_key
+
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+# One async client per event loop: an httpx client can't be shared across loops
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = weakref.WeakKeyDictionary()
+
+_llm_singleflight: Optional[SingleFlight] = None
+_llm_singleflight_lock = threading.Lock()
+
+# Timing of the most recent model API call in this thread or asyncio task
+_last_call: ContextVar[Optional[Dict[str, Any]]] = ContextVar('llm_last_call', default=None)
+
+
+def get_http_session() -> requests.Session:
+    """Return this process's pooled keep-alive session for the model API.
+
+    Connections are reused across calls and threads (up to LLM_HTTP_POOL_SIZE
+    per host); a forked child builds its own pool rather than sharing sockets.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.LLM_HTTP_POOL_SIZE,
+                    pool_maxsize=settings.LLM_HTTP_POOL_SIZE
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session, _session_pid = session, os.getpid()
+    return _session
+
+
+class ModelAPIError(Exception):
+    """The model API answered with a non-200 status."""
+    
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"API returned status {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+def get_llm_singleflight() -> Optional[SingleFlight]:
+    """Return this process's coalescer of identical model API requests, or None if disabled."""
+    global _llm_singleflight
+    if not settings.LLM_SINGLEFLIGHT_ENABLED:
+        return None
+    if _llm_singleflight is None:
+        with _llm_singleflight_lock:
+            if _llm_singleflight is None:
+                _llm_singleflight = SingleFlight(
+                    'llm',
+                    wait_timeout=settings.LLM_SINGLEFLIGHT_TIMEOUT,
+                    redis_url=settings.LLM_SINGLEFLIGHT_REDIS_URL
+                )
+    return _llm_singleflight
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the pooled async HTTP client for the running event loop.
+
+    An ASGI server runs one loop per process, so all its requests share one
+    pool of up to LLM_ASYNC_POOL_SIZE keep-alive connections.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_ASYNC_POOL_SIZE,
+                max_keepalive_connections=settings.LLM_ASYNC_POOL_SIZE
+            ),
+            timeout=httpx.Timeout(settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT)
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def stream_delta(line: Union[str, bytes]) -> Optional[str]:
+    """Get the text delta carried by one line of a streamed completion, if any."""
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    if not line.startswith('data:'):
+        return None
+    data = line[len('data:'):].strip()
+    if data == '[DONE]':
+        return None
+    choices = json.loads(data).get('choices') or []
+    return choices[0].get('delta', {}).get('content') if choices else None
+
+
+def retry_delay(attempt: int, response: Optional[Union[requests.Response, httpx.Response]]) -> float:
+    """Get the wait before retry number attempt + 1.
+
+    Honors a Retry-After header (seconds or HTTP date); otherwise full-jitter
+    exponential backoff, capped at LLM_RETRY_MAX_DELAY.
+    """
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, (parsedate_to_datetime(retry_after) - timezone.now()).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BACKOFF * 2 ** attempt))
 
 
 class LLMService:
-    """Service for interacting with GitHub AI models."""
+    """Service for interacting with GitHub AI models.
+    
+    Blocking methods use the pooled requests session; the a-prefixed
+    coroutines (agenerate_response, astream_response, ...) do the same over
+    the async client for ASGI views.
+    """
     
     def __init__(self):
         self.github_token = os.getenv('GITHUB_TOKEN')
@@ -27,43 +161,258 @@ class LLMService:
         
         self.system_prompt = "You are a helpful AI assistant. Be very concise in your responses."
     
+    @property
+    def last_call(self) -> Optional[Dict[str, Any]]:
+        """Timing of the most recent model API call in this thread or asyncio task.
+        
+        Keys: status (HTTP status or None on a network error), attempts,
+        upstream_seconds (time spent in requests) and total_seconds
+        (including retry waits).
+        """
+        return _last_call.get()
+    
+    def _post_chat(self, payload: Dict[str, Any], retries: Optional[int] = None,
+                   stream: bool = False) -> requests.Response:
+        """POST a chat completion over the pooled session, retrying transient failures.
+        
+        429/5xx responses and connection errors are retried up to
+        LLM_MAX_RETRIES times with jittered exponential backoff, waiting as
+        long as Retry-After asks unless that exceeds LLM_RETRY_MAX_DELAY.
+        Returns the last response, or raises the last network error. With
+        stream=True this returns once the headers arrive; the caller must
+        close the response to release its pooled connection.
+        """
+        retries = settings.LLM_MAX_RETRIES if retries is None else retries
+        session = get_http_session()
+        start_time = time.monotonic()
+        upstream_seconds = 0.0
+        
+        for attempt in range(retries + 1):
+            call_start = time.monotonic()
+            try:
+                response = session.post(
+                    f"{self.endpoint}/v1/chat/completions",
+                    headers=self.headers,
+                    json=payload,
+                    timeout=(settings.LLM_CONNECT_TIMEOUT, settings.LLM_READ_TIMEOUT),
+                    stream=stream
+                )
+                error = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                response, error = None, e
+            upstream_seconds += time.monotonic() - call_start
+            
+            delay = self._retry_wait(attempt, retries, response, error)
+            if delay is None:
+                break
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+        
+        self._record_call(response, error, attempt + 1, upstream_seconds, start_time)
+        if error is not None:
+            raise error
+        return response
+    
+    async def _apost_chat(self, payload: Dict[str, Any], retries: Optional[int] = None,
+                          stream: bool = False) -> httpx.Response:
+        """Async _post_chat over the pooled httpx client, with the same retries."""
+        retries = settings.LLM_MAX_RETRIES if retries is None else retries
+        client = get_async_http_client()
+        start_time = time.monotonic()
+        upstream_seconds = 0.0
+        
+        for attempt in range(retries + 1):
+            call_start = time.monotonic()
+            try:
+                request = client.build_request(
+                    'POST',
+                    f"{self.endpoint}/v1/chat/completions",
+                    headers=self.headers,
+                    json=payload
+                )
+                response = await client.send(request, stream=stream)
+                error = None
+            except httpx.TransportError as e:
+                response, error = None, e
+            upstream_seconds += time.monotonic() - call_start
+            
+            delay = self._retry_wait(attempt, retries, response, error)
+            if delay is None:
+                break
+            if response is not None:
+                await response.aclose()
+            await asyncio.sleep(delay)
+        
+        self._record_call(response, error, attempt + 1, upstream_seconds, start_time)
+        if error is not None:
+            raise error
+        return response
+    
+    def _retry_wait(self, attempt: int, retries: int, response, error: Optional[Exception]) -> Optional[float]:
+        """Get the wait before retrying a model API call, or None to stop."""
+        if error is None and response.status_code not in RETRYABLE_STATUSES:
+            return None
+        if attempt == retries:
+            return None
+        delay = retry_delay(attempt, response)
+        if delay > settings.LLM_RETRY_MAX_DELAY:
+            return None
+        logger.warning(
+            f"Model API {'error: ' + str(error) if error else 'returned ' + str(response.status_code)}; "
+            f"retry {attempt + 1}/{retries} in {delay:.2f}s"
+        )
+        return delay
+    
+    def _record_call(self, response, error: Optional[Exception], attempts: int,
+                     upstream_seconds: float, start_time: float) -> None:
+        """Store a model API call's timing and add it to the health stats."""
+        call = {
+            'status': response.status_code if error is None else None,
+            'attempts': attempts,
+            'upstream_seconds': round(upstream_seconds, 3),
+            'total_seconds': round(time.monotonic() - start_time, 3),
+        }
+        _last_call.set(call)
+        logger.info(f"Model API call: {call}")
+        
+        from .health import record_upstream_call
+        record_upstream_call(upstream_seconds / attempts, error is None and response.status_code == 200)
+    
+    def _response_payload(self, messages: List[Dict[str, str]], stream: bool = False) -> Dict[str, Any]:
+        """Build the completion payload for a chat reply."""
+        # Add system message at the beginning if not present
+        if not messages or messages[0].get('role') != 'system':
+            messages.insert(0, {'role': 'system', 'content': self.system_prompt})
+        
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 1,
+            "top_p": 1,
+            "max_tokens": 200
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+    
+    def _title_payload(self, first_message: str) -> Dict[str, Any]:
+        """Build the completion payload for a conversation title."""
+        return {
+            "model": self.model,
+            "messages": [
+                {'role': 'system', 'content': 'Generate a very short title (max 5 words) for this conversation.'},
+                {'role': 'user', 'content': first_message}
+            ],
+            "temperature": 1,
+            "top_p": 1,
+            "max_tokens": 20
+        }
+    
+    def _complete(self, payload: Dict[str, Any]) -> str:
+        """Get the completion text for a payload.
+        
+        Identical requests (same model and messages) already in flight are
+        joined instead of sent again. Raises ModelAPIError on a non-200.
+        """
+        def call() -> str:
+            response = self._post_chat(payload)
+            if response.status_code != 200:
+                raise ModelAPIError(response.status_code, response.text)
+            return response.json()['choices'][0]['message']['content'].strip()
+        
+        singleflight = get_llm_singleflight()
+        return singleflight.do(payload_key(payload), call) if singleflight else call()
+    
+    async def _acomplete(self, payload: Dict[str, Any]) -> str:
+        """Async _complete."""
+        async def call() -> str:
+            response = await self._apost_chat(payload)
+            if response.status_code != 200:
+                raise ModelAPIError(response.status_code, response.text)
+            return response.json()['choices'][0]['message']['content'].strip()
+        
+        singleflight = get_llm_singleflight()
+        return await singleflight.ado(payload_key(payload), call) if singleflight else await call()
+    
     def generate_response(self, messages: List[Dict[str, str]]) -> str:
         """Generate a response using GitHub AI models."""
         try:
             if not self.github_token:
                 return "Error: GitHub token not configured. Please set GITHUB_TOKEN in your environment."
             
-            # Add system message at the beginning if not present
-            if not messages or messages[0].get('role') != 'system':
-                messages.insert(0, {'role': 'system', 'content': self.system_prompt})
+            return self._complete(self._response_payload(messages))
             
-            # No GitHub context needed - removed for simplicity
-            
-            # Prepare the request payload
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 1,
-                "top_p": 1,
-                "max_tokens": 200
-            }
-            
-            response = requests.post(
-                f"{self.endpoint}/v1/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+        except ModelAPIError as e:
+            return f"Error: {str(e)}"
+        except Exception as e:
+            return f"Error generating response: {str(e)}"
+    
+    async def agenerate_response(self, messages: List[Dict[str, str]]) -> str:
+        """Async generate_response."""
+        try:
+            if not self.github_token:
+                return "Error: GitHub token not configured. Please set GITHUB_TOKEN in your environment."
             
-            if response.status_code == 200:
-                data = response.json()
-                return data['choices'][0]['message']['content'].strip()
-            else:
-                return f"Error: API returned status {response.status_code}: {response.text}"
+            return await self._acomplete(self._response_payload(messages))
             
+        except ModelAPIError as e:
+            return f"Error: {str(e)}"
         except Exception as e:
             return f"Error generating response: {str(e)}"
     
+    def stream_response(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Generate a response as it is produced, yielding text deltas.
+        
+        Requests a streamed completion (server-sent events) from the model.
+        Failures before the stream starts yield a single error message, as
+        generate_response returns one; a connection lost mid-stream raises.
+        """
+        if not self.github_token:
+            yield "Error: GitHub token not configured. Please set GITHUB_TOKEN in your environment."
+            return
+        
+        try:
+            response = self._post_chat(self._response_payload(messages, stream=True), stream=True)
+        except Exception as e:
+            yield f"Error generating response: {str(e)}"
+            return
+        
+        with response:
+            if response.status_code != 200:
+                yield f"Error: API returned status {response.status_code}: {response.text}"
+                return
+            
+            for line in response.iter_lines():
+                delta = stream_delta(line)
+                if delta:
+                    yield delta
+    
+    async def astream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Async stream_response."""
+        if not self.github_token:
+            yield "Error: GitHub token not configured. Please set GITHUB_TOKEN in your environment."
+            return
+        
+        try:
+            response = await self._apost_chat(self._response_payload(messages, stream=True), stream=True)
+        except Exception as e:
+            yield f"Error generating response: {str(e)}"
+            return
+        
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                yield f"Error: API returned status {response.status_code}: {response.text}"
+                return
+            
+            async for line in response.aiter_lines():
+                delta = stream_delta(line)
+                if delta:
+                    yield delta
+        finally:
+            await response.aclose()
+    
     def _get_github_context(self, message: str) -> str:
         """Get relevant context from GitHub API."""
         try:
@@ -71,10 +420,11 @@ class LLMService:
             
             # Search for repositories related to the message
             if any(keyword in message.lower() for keyword in ['code', 'repository', 'project', 'github', 'repo']):
-                response = requests.get(
+                response = get_http_session().get(
                     'https://api.github.com/search/repositories',
                     headers=self.github_api_headers,
-                    params={'q': 'stars:>1000', 'sort': 'stars', 'per_page': 3}
+                    params={'q': 'stars:>1000', 'sort': 'stars', 'per_page': 3},
+                    timeout=(settings.LLM_CONNECT_TIMEOUT, settings.LLM_READ_TIMEOUT)
                 )
                 if response.status_code == 200:
                     data = response.json()
@@ -87,10 +437,11 @@ class LLMService:
             
             # Search for issues if the message mentions problems
             if any(keyword in message.lower() for keyword in ['issue', 'problem', 'bug', 'error', 'fix']):
-                response = requests.get(
+                response = get_http_session().get(
                     'https://api.github.com/search/issues',
                     headers=self.github_api_headers,
-                    params={'q': 'state:open', 'sort': 'created', 'per_page': 3}
+                    params={'q': 'state:open', 'sort': 'created', 'per_page': 3},
+                    timeout=(settings.LLM_CONNECT_TIMEOUT, settings.LLM_READ_TIMEOUT)
                 )
                 if response.status_code == 200:
                     data = response.json()
@@ -112,30 +463,19 @@ class LLMService:
             if not self.github_token:
                 return self._generate_simple_title(first_message)
             
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {'role': 'system', 'content': 'Generate a very short title (max 5 words) for this conversation.'},
-                    {'role': 'user', 'content': first_message}
-                ],
-                "temperature": 1,
-                "top_p": 1,
-                "max_tokens": 20
-            }
-            
-            response = requests.post(
-                f"{self.endpoint}/v1/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            return self._complete(self._title_payload(first_message))
             
-            if response.status_code == 200:
-                data = response.json()
-                return data['choices'][0]['message']['content'].strip()
-            else:
+        except Exception as e:
+            return self._generate_simple_title(first_message)
+    
+    async def agenerate_conversation_title(self, first_message: str) -> str:
+        """Async generate_conversation_title."""
+        try:
+            if not self.github_token:
                 return self._generate_simple_title(first_message)
             
+            return await self._acomplete(self._title_payload(first_message))
+            
         except Exception as e:
             return self._generate_simple_title(first_message)
     
@@ -175,12 +515,8 @@ class LLMService:
                 "max_tokens": 10
             }
             
-            response = requests.post(
-                f"{self.endpoint}/v1/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            # A health check reports what it sees; no retries
+            response = self._post_chat(payload, retries=0)
             
             if response.status_code == 200:
                 return f"GitHub AI {self.model} (API working)"
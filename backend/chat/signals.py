@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .corpus import invalidate_active_corpus
+from .models import DataSource
+
+
+@receiver(post_save, sender=DataSource)
+@receiver(post_delete, sender=DataSource)
+def data_source_changed(sender, instance, **kwargs):
+    """Invalidate corpus-dependent caches when a data source is added, toggled or deleted."""
+    invalidate_active_corpus()
+    
+    # Only touch the RAG service if this process has already loaded it
+    from .rag_service import get_rag_service, is_rag_service_ready
+    if is_rag_service_ready():
+        get_rag_service().answer_cache.clear()
@@ -0,0 +1,274 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+
+logger = logging.getLogger(__name__)
+
+# How often a process waiting on another process's call checks Redis (seconds)
+REDIS_POLL_INTERVAL = 0.05
+# A published result only has to outlive the waiting processes' next poll
+REDIS_RESULT_TTL = 2.0
+
+
+def payload_key(payload: Any) -> str:
+    """Get a stable key for a JSON-serializable request payload."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class _Call:
+    """One in-flight call and the callers waiting on it."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False  # leader was cancelled; waiters run the call themselves
+        self.futures = []  # (event loop, future) of async waiters
+
+
+class SingleFlight:
+    """Coalesce identical in-flight calls so only one of them runs.
+    
+    Callers that pass the same key while a call for it is running wait for
+    that call and get its result, or its exception, instead of making
+    their own. Sync (do) and async (ado) callers share one table. With a
+    Redis URL, shared calls also coordinate across processes: the first
+    process takes a Redis lock and publishes its result, and the others
+    poll for it. Only JSON-serializable results can be shared that way. A
+    waiter that gives up after wait_timeout runs the call itself.
+    """
+    
+    def __init__(self, name: str, wait_timeout: float, redis_url: Optional[str] = None):
+        self.name = name
+        self.wait_timeout = wait_timeout
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.upstream_calls = 0  # calls actually made by this process
+        self.coalesced = 0  # callers served by another caller in this process
+        self.redis_hits = 0  # callers served by another process
+        self.timeouts = 0
+        self._redis = None
+        if redis_url:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(redis_url, socket_connect_timeout=0.5, socket_timeout=0.5)
+            except Exception as e:
+                logger.warning(f"{name} singleflight running without Redis: {str(e)}")
+    
+    def do(self, key: str, fn: Callable[[], Any], shared: bool = True) -> Any:
+        """Call fn(), or wait for an identical call already in flight.
+        
+        shared=False keeps coalescing within this process (for results
+        that can't be serialized to Redis).
+        """
+        call, _, leader = self._join(key)
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                self._count_timeout()
+                return self._call(fn)
+            if call.abandoned:
+                return self._call(fn)
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            result = self._run_shared(key, fn) if shared and self._redis is not None else self._call(fn)
+        except Exception as e:
+            self._finish(key, call, error=e)
+            raise
+        except BaseException:
+            self._finish(key, call, abandoned=True)
+            raise
+        self._finish(key, call, result=result)
+        return result
+    
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]], shared: bool = True) -> Any:
+        """Async do(): await fn(), or wait for an identical call already in flight."""
+        call, future, leader = self._join(key, asynchronous=True)
+        if not leader:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.wait_timeout)
+            except asyncio.TimeoutError:
+                self._count_timeout()
+                return await self._acall(fn)
+            if call.abandoned:
+                return await self._acall(fn)
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            if shared and self._redis is not None:
+                result = await self._arun_shared(key, fn)
+            else:
+                result = await self._acall(fn)
+        except Exception as e:
+            self._finish(key, call, error=e)
+            raise
+        except BaseException:
+            # Cancelled (e.g. the client went away); let a waiter take over
+            self._finish(key, call, abandoned=True)
+            raise
+        self._finish(key, call, result=result)
+        return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing counters for monitoring."""
+        with self._lock:
+            served = self.upstream_calls + self.coalesced + self.redis_hits
+            return {
+                'in_flight': len(self._calls),
+                'upstream_calls': self.upstream_calls,
+                'coalesced': self.coalesced,
+                'redis_hits': self.redis_hits,
+                'timeouts': self.timeouts,
+                'coalesce_rate': (self.coalesced + self.redis_hits) / served if served else 0.0,
+                'redis_enabled': self._redis is not None,
+            }
+    
+    def _join(self, key: str, asynchronous: bool = False) -> Tuple[_Call, Optional[asyncio.Future], bool]:
+        """Register a caller; returns its call, its future (async waiters) and whether it leads."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                return call, None, True
+            self.coalesced += 1
+            future = None
+            if asynchronous:
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                call.futures.append((loop, future))
+            return call, future, False
+    
+    def _finish(self, key: str, call: _Call, result: Any = None, error: Optional[Exception] = None,
+                abandoned: bool = False) -> None:
+        """Hand the leader's outcome to every waiter."""
+        with self._lock:
+            self._calls.pop(key, None)
+            call.result, call.error, call.abandoned = result, error, abandoned
+            futures = call.futures
+        call.done.set()
+        for loop, future in futures:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                pass  # the waiter's loop is closed
+    
+    def _call(self, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.upstream_calls += 1
+        return fn()
+    
+    async def _acall(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        with self._lock:
+            self.upstream_calls += 1
+        return await fn()
+    
+    def _count_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+    
+    def _run_shared(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn() once across processes, or wait for another process's result."""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            state, value = self._redis_claim(key)
+            if state == 'result':
+                with self._lock:
+                    self.redis_hits += 1
+                return value
+            if state in ('leader', 'unavailable'):
+                break
+            if time.monotonic() >= deadline:
+                self._count_timeout()
+                break
+            time.sleep(REDIS_POLL_INTERVAL)
+        
+        try:
+            result = self._call(fn)
+        except BaseException:
+            if state == 'leader':
+                self._redis_release(key)
+            raise
+        if state == 'leader':
+            self._redis_publish(key, result)
+        return result
+    
+    async def _arun_shared(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async _run_shared; Redis round trips run in worker threads."""
+        claim = sync_to_async(self._redis_claim, thread_sensitive=False)
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            state, value = await claim(key)
+            if state == 'result':
+                with self._lock:
+                    self.redis_hits += 1
+                return value
+            if state in ('leader', 'unavailable'):
+                break
+            if time.monotonic() >= deadline:
+                self._count_timeout()
+                break
+            await asyncio.sleep(REDIS_POLL_INTERVAL)
+        
+        try:
+            result = await self._acall(fn)
+        except BaseException:
+            if state == 'leader':
+                await sync_to_async(self._redis_release, thread_sensitive=False)(key)
+            raise
+        if state == 'leader':
+            await sync_to_async(self._redis_publish, thread_sensitive=False)(key, result)
+        return result
+    
+    def _redis_keys(self, key: str) -> Tuple[str, str]:
+        return f"singleflight:{self.name}:lock:{key}", f"singleflight:{self.name}:result:{key}"
+    
+    def _redis_claim(self, key: str) -> Tuple[str, Any]:
+        """Check for a published result, else try to take the lock.
+        
+        Returns ('result', value), ('leader', None), ('wait', None) or
+        ('unavailable', None) when Redis can't be reached.
+        """
+        lock_key, result_key = self._redis_keys(key)
+        try:
+            value = self._redis.get(result_key)
+            if value is not None:
+                return 'result', json.loads(value)
+            if self._redis.set(lock_key, b'1', nx=True, px=int(self.wait_timeout * 1000)):
+                return 'leader', None
+            return 'wait', None
+        except Exception as e:
+            logger.warning(f"Error coordinating {self.name} singleflight through Redis: {str(e)}")
+            return 'unavailable', None
+    
+    def _redis_publish(self, key: str, result: Any) -> None:
+        lock_key, result_key = self._redis_keys(key)
+        try:
+            pipeline = self._redis.pipeline()
+            pipeline.set(result_key, json.dumps(result), px=int(REDIS_RESULT_TTL * 1000))
+            pipeline.delete(lock_key)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Error publishing {self.name} singleflight result to Redis: {str(e)}")
+            self._redis_release(key)
+    
+    def _redis_release(self, key: str) -> None:
+        lock_key, _ = self._redis_keys(key)
+        try:
+            self._redis.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"Error releasing {self.name} singleflight lock in Redis: {str(e)}")
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,204 @@
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from asgiref.sync import sync_to_async
+
+from .health import get_health_monitor
+from .history import build_history
+from .models import Conversation, Message
+from .rag_service import get_rag_service
+from .serializers import MessageSerializer
+from .services import LLMService
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class ReplyStream:
+    """Bookkeeping for one streamed assistant reply.
+    
+    Shared by the WSGI generator and the ASGI async generator, which only
+    differ in how they iterate the model's deltas. All methods except
+    token() touch the database or retrieval, so async callers offload them.
+    """
+    
+    def __init__(self, conversation: Conversation, user_message: Message):
+        self.conversation = conversation
+        self.user_message = user_message
+        self.mode = conversation.use_company_data
+        self.start_time = time.monotonic()
+        self.rag_service = None
+        self.prepared = None
+        self.meta = {'conversation_id': conversation.id, 'user_message_id': user_message.id, 'mode': self.mode}
+        self.parts = []
+        self.error = None
+        self.first_token_time = None
+        self.generation_start = None
+        self.message = None
+    
+    def prepare(self) -> Optional[List[Dict[str, str]]]:
+        """Run retrieval for RAG modes and fill in the meta event.
+        
+        Returns the messages to send to the LLM, or None when the reply
+        (a cached or fixed answer) is already known.
+        """
+        if self.mode in ('use', 'both'):
+            self.rag_service = get_rag_service()
+            self.prepared = self.rag_service.prepare_response(self.user_message.content, self.conversation.id, self.mode)
+            self.meta.update({
+                'cache_hit': self.prepared.cache_hit,
+                'chunk_ids': self.prepared.chunk_ids,
+                'chunks': [
+                    {
+                        'id': chunk.id,
+                        'data_source_id': chunk.data_source_id,
+                        'source': chunk.source,
+                        'page_number': chunk.page_number,
+                        'score': chunk.score
+                    }
+                    for chunk in self.prepared.chunks
+                ],
+                'retrieval_ms': round(self.prepared.retrieval_time * 1000, 1)
+            })
+            return None if self.prepared.answer is not None else self.prepared.messages
+        
+        return build_history(self.conversation, LLMService().system_prompt)
+    
+    @property
+    def answer(self) -> Optional[str]:
+        """The reply when it needs no LLM call."""
+        return self.prepared.answer if self.prepared is not None else None
+    
+    def start(self) -> str:
+        """Get the meta event and start timing generation."""
+        self.generation_start = time.monotonic()
+        return sse_event('meta', self.meta)
+    
+    def token(self, delta: str) -> str:
+        """Record a text delta and get its event."""
+        if self.first_token_time is None:
+            self.first_token_time = time.monotonic()
+        self.parts.append(delta)
+        return sse_event('token', {'text': delta})
+    
+    def save(self) -> None:
+        """Save the reply so far as the assistant Message."""
+        content = ''.join(self.parts)
+        if content and self.message is None:
+            self.message = Message.objects.create(
+                conversation=self.conversation,
+                role='assistant',
+                content=content
+            )
+    
+    def finish(self) -> List[str]:
+        """Record metrics for the finished reply and get the closing events."""
+        content = ''.join(self.parts)
+        generation_time = time.monotonic() - (self.generation_start or self.start_time)
+        time_to_first_token = (
+            self.first_token_time - self.start_time if self.first_token_time is not None else None
+        )
+        generated = self.prepared is None or self.prepared.answer is None
+        
+        if generated and time_to_first_token is not None:
+            get_health_monitor().record_first_token(time_to_first_token)
+        if self.error is None and self.prepared is not None and self.prepared.answer is None:
+            try:
+                self.rag_service.finish_response(self.conversation.id, self.user_message.content, self.prepared,
+                                                 content, generation_time, time_to_first_token)
+            except Exception as e:
+                logger.error(f"Error recording streamed RAG response: {str(e)}")
+        
+        logger.info(
+            f"Streamed reply for conversation {self.conversation.id} ({self.mode}): {len(content)} chars, "
+            f"first token after {time_to_first_token if time_to_first_token is not None else 'n/a'}s"
+        )
+        
+        events = [sse_event('error', {'error': self.error})] if self.error is not None else []
+        events.append(sse_event('done', {
+            'message': MessageSerializer(self.message).data if self.message else None,
+            'ttft_ms': round(time_to_first_token * 1000, 1) if time_to_first_token is not None else None,
+            'generation_ms': round(generation_time * 1000, 1),
+            'total_ms': round((time.monotonic() - self.start_time) * 1000, 1)
+        }))
+        return events
+
+
+def stream_assistant_reply(conversation: Conversation, user_message: Message) -> Iterator[str]:
+    """Generate the assistant's reply to a message as server-sent events.
+    
+    Sends `meta` first (for RAG modes with the chunks used and retrieval
+    time), then a `token` event per text delta, then `done` with the saved
+    Message and timings; `error` comes before `done` if generation fails.
+    The reply is saved once the stream ends, including a partial reply when
+    the client disconnects.
+    """
+    reply = ReplyStream(conversation, user_message)
+    try:
+        messages = reply.prepare()
+    except Exception as e:
+        logger.error(f"Error preparing streamed response: {str(e)}")
+        yield reply.start()
+        yield sse_event('error', {'error': str(e)})
+        return
+    
+    yield reply.start()
+    
+    deltas = iter([reply.answer]) if messages is None else LLMService().stream_response(messages)
+    try:
+        for delta in deltas:
+            yield reply.token(delta)
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}")
+        reply.error = str(e)
+    finally:
+        # Also runs when the client disconnects: release the upstream stream, keep the partial reply
+        if hasattr(deltas, 'close'):
+            deltas.close()
+        reply.save()
+    
+    yield from reply.finish()
+
+
+async def astream_assistant_reply(conversation: Conversation, user_message: Message) -> AsyncIterator[str]:
+    """Async stream_assistant_reply for ASGI: the event loop only relays tokens.
+    
+    Retrieval runs in a worker thread and database writes in Django's
+    thread-sensitive executor.
+    """
+    reply = ReplyStream(conversation, user_message)
+    try:
+        messages = await sync_to_async(reply.prepare, thread_sensitive=False)()
+    except Exception as e:
+        logger.error(f"Error preparing streamed response: {str(e)}")
+        yield reply.start()
+        yield sse_event('error', {'error': str(e)})
+        return
+    
+    yield reply.start()
+    
+    if messages is None:
+        yield reply.token(reply.answer)
+        deltas = None
+    else:
+        deltas = LLMService().astream_response(messages)
+    try:
+        if deltas is not None:
+            async for delta in deltas:
+                yield reply.token(delta)
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}")
+        reply.error = str(e)
+    finally:
+        if deltas is not None:
+            await deltas.aclose()
+        await sync_to_async(reply.save)()
+    
+    for event in await sync_to_async(reply.finish)():
+        yield event
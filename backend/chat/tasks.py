@@ -1,9 +1,13 @@
-from celery import shared_task
+from celery import chord, shared_task
+from django.conf import settings
 from django.utils import timezone
 import logging
 
-from .models import DataSource
-from .rag_service import RAGService
+from .history import update_summary
+from .ingestion import dispatch_batch, link_batch_dispatch, register_archive
+from .models import Conversation, DataSource, IngestBatch
+from .rag_service import get_rag_service
+from .services import LLMService
 
 logger = logging.getLogger(__name__)
 
@@ -15,8 +19,13 @@ def process_document_task(data_source_id: str):
         # Get the data source
         data_source = DataSource.objects.get(id=data_source_id)
         
-        # Initialize RAG service
-        rag_service = RAGService()
+        # Reuse the worker's preloaded RAG service
+        rag_service = get_rag_service()
+        
+        # Spread large documents over the worker pool
+        min_pages = settings.RAG_FANOUT_MIN_PAGES
+        if min_pages and rag_service.count_pages(data_source) >= min_pages:
+            return fan_out_document(rag_service, data_source)
         
         # Process the document
         success = rag_service.process_document(data_source)
@@ -36,16 +45,162 @@ def process_document_task(data_source_id: str):
         return False
 
 
+def fan_out_document(rag_service, data_source: DataSource) -> bool:
+    """Chunk a document here, then embed its chunk ranges in parallel subtasks.
+
+    A chord runs one embed_chunk_range_task per RAG_FANOUT_CHUNKS_PER_TASK
+    chunks and then finish_fanout_task to complete the document; for a
+    batch document, that then dispatches the batch's next documents.
+    """
+    chunk_count = rag_service.prepare_fanout(data_source)
+    if chunk_count is None:
+        return False
+    if chunk_count == 0:
+        return rag_service.finish_fanout(data_source)
+    
+    range_size = settings.RAG_FANOUT_CHUNKS_PER_TASK
+    ranges = [(start, min(start + range_size, chunk_count)) for start in range(0, chunk_count, range_size)]
+    chord(
+        embed_chunk_range_task.s(str(data_source.id), start, end) for start, end in ranges
+    )(link_batch_dispatch(finish_fanout_task.s(str(data_source.id)), data_source.ingest_batch_id))
+    
+    logger.info(f"Fanned out {data_source.name} into {len(ranges)} chunk ranges")
+    return True
+
+
+@shared_task
+def embed_chunk_range_task(data_source_id: str, start_index: int, end_index: int):
+    """Celery task to embed and index one chunk range of a fanned-out document.
+
+    Returns the range's token count, or None if it failed, so a failure
+    reaches the finishing task instead of breaking the chord.
+    """
+    try:
+        data_source = DataSource.objects.get(id=data_source_id)
+        rag_service = get_rag_service()
+        return rag_service.embed_chunk_range(data_source, start_index, end_index)
+        
+    except Exception as e:
+        logger.error(f"Error embedding chunks {start_index}-{end_index - 1} of {data_source_id}: {str(e)}")
+        return None
+
+
+@shared_task
+def finish_fanout_task(results, data_source_id: str):
+    """Celery task to complete a fanned-out document after all its chunk ranges ran."""
+    try:
+        data_source = DataSource.objects.get(id=data_source_id)
+        rag_service = get_rag_service()
+        
+        success = rag_service.finish_fanout(data_source, failed_ranges=sum(1 for result in results if result is None))
+        
+        if success:
+            logger.info(f"Successfully processed document: {data_source.name}")
+        else:
+            logger.error(f"Failed to process document: {data_source.name}")
+            
+        return success
+        
+    except DataSource.DoesNotExist:
+        logger.error(f"Data source {data_source_id} not found")
+        return False
+    except Exception as e:
+        logger.error(f"Error finishing document {data_source_id}: {str(e)}")
+        return False
+
+
+@shared_task
+def dispatch_batch_task(batch_id: str):
+    """Celery task to queue an ingest batch's next pending documents."""
+    try:
+        return dispatch_batch(batch_id)
+        
+    except Exception as e:
+        logger.error(f"Error dispatching ingest batch {batch_id}: {str(e)}")
+        return 0
+
+
+@shared_task
+def resume_document_task(data_source_id: str):
+    """Celery task to resume processing a document from its last checkpoint."""
+    try:
+        data_source = DataSource.objects.get(id=data_source_id)
+        rag_service = get_rag_service()
+        
+        success = rag_service.process_document(data_source, resume=True)
+        
+        if success:
+            logger.info(f"Successfully resumed document: {data_source.name}")
+        else:
+            logger.error(f"Failed to resume document: {data_source.name}")
+            
+        return success
+        
+    except DataSource.DoesNotExist:
+        logger.error(f"Data source {data_source_id} not found")
+        return False
+    except Exception as e:
+        logger.error(f"Error resuming document {data_source_id}: {str(e)}")
+        return False
+
+
+@shared_task
+def register_archive_task(batch_id: str):
+    """Celery task to extract and register a bulk upload's archive, then start its documents."""
+    try:
+        batch = IngestBatch.objects.get(id=batch_id)
+        if batch.registered_at is not None:
+            return 0
+        data_sources = register_archive(batch)
+        dispatch_batch(batch.id)
+        return len(data_sources)
+        
+    except IngestBatch.DoesNotExist:
+        logger.error(f"Ingest batch {batch_id} not found")
+        return 0
+    except Exception as e:
+        logger.error(f"Error registering ingest batch {batch_id}: {str(e)}")
+        IngestBatch.objects.filter(id=batch_id).update(
+            registered_at=timezone.now(),
+            errors=[{'file': None, 'error': f'Could not read archive: {str(e)}'}]
+        )
+        return 0
+
+
+@shared_task
+def update_document_task(data_source_id: str):
+    """Celery task to re-ingest a new version of a document, reusing unchanged chunks."""
+    try:
+        data_source = DataSource.objects.get(id=data_source_id)
+        rag_service = get_rag_service()
+        
+        success = rag_service.update_document(data_source)
+        
+        if success:
+            logger.info(f"Successfully updated document: {data_source.name}")
+        else:
+            logger.error(f"Failed to update document: {data_source.name}")
+            
+        return success
+        
+    except DataSource.DoesNotExist:
+        logger.error(f"Data source {data_source_id} not found")
+        return False
+    except Exception as e:
+        logger.error(f"Error updating document {data_source_id}: {str(e)}")
+        return False
+
+
 @shared_task
 def delete_document_chunks_task(data_source_id: str):
     """Celery task to delete document chunks asynchronously."""
     try:
+        # Reuse the worker's preloaded RAG service
+        rag_service = get_rag_service()
+        
         # Get the data source
         data_source = DataSource.objects.get(id=data_source_id)
         
-        # Initialize RAG service
-        rag_service = RAGService()
-        
         # Delete chunks
         success = rag_service.delete_document_chunks(data_source)
         
@@ -57,31 +212,106 @@ def delete_document_chunks_task(data_source_id: str):
         return success
         
     except DataSource.DoesNotExist:
-        logger.error(f"Data source {data_source_id} not found")
-        return False
+        # The row (and its chunks) is already gone; drop its vectors by id
+        rag_service.purge_data_source(data_source_id)
+        logger.info(f"Purged index entries for deleted data source {data_source_id}")
+        return True
     except Exception as e:
         logger.error(f"Error deleting chunks for {data_source_id}: {str(e)}")
         return False
 
 
+@shared_task
+def summarize_conversation_task(conversation_id: int):
+    """Celery task to fold a conversation's older messages into its rolling summary."""
+    try:
+        conversation = Conversation.objects.get(id=conversation_id)
+        return update_summary(conversation, LLMService())
+        
+    except Conversation.DoesNotExist:
+        logger.error(f"Conversation {conversation_id} not found")
+        return False
+    except Exception as e:
+        logger.error(f"Error summarizing conversation {conversation_id}: {str(e)}")
+        return False
+
+
 @shared_task
 def cleanup_failed_documents_task():
     """Celery task to cleanup failed document processing."""
     try:
         # Find documents that have been in 'processing' status for too long
+        # without committing a batch (progress updates bump updated_at)
         cutoff_time = timezone.now() - timezone.timedelta(hours=1)
         failed_docs = DataSource.objects.filter(
             status='processing',
-            processing_started_at__lt=cutoff_time
+            processing_started_at__lt=cutoff_time,
+            updated_at__lt=cutoff_time
         )
         
         for doc in failed_docs:
+            if doc.processing_attempts < settings.RAG_INGEST_MAX_ATTEMPTS:
+                # Restart the clock so the document isn't picked up again
+                # before the resumed task gets to it
+                DataSource.objects.filter(id=doc.id).update(
+                    processing_started_at=timezone.now(),
+                    updated_at=timezone.now()
+                )
+                link_batch_dispatch(resume_document_task.si(str(doc.id)), doc.ingest_batch_id).apply_async()
+                logger.info(f"Re-enqueued {doc.name} from chunk {doc.ingest_checkpoint} after timeout")
+                continue
+            
             doc.status = 'failed'
-            doc.error_message = 'Processing timed out'
+            doc.error_message = f'Processing timed out after {doc.processing_attempts} attempts'
             doc.save()
             logger.info(f"Marked {doc.name} as failed due to timeout")
+        
+        # Updates that stopped making progress; the current version is still served
+        stalled_updates = DataSource.objects.filter(
+            pending_file__isnull=False,
+            updated_at__lt=cutoff_time
+        ).exclude(pending_file='')
+        for doc in stalled_updates:
+            if doc.processing_attempts < settings.RAG_INGEST_MAX_ATTEMPTS or doc.status != 'updating':
+                DataSource.objects.filter(id=doc.id).update(updated_at=timezone.now())
+                update_document_task.delay(str(doc.id))
+                logger.info(f"Re-enqueued update of {doc.name} after timeout")
+                continue
+            
+            get_rag_service().abandon_update(
+                doc, f'Update timed out after {doc.processing_attempts} attempts'
+            )
+            logger.info(f"Abandoned update of {doc.name} due to timeout")
+        
+        # Archives whose extraction task was lost
+        stalled_batches = IngestBatch.objects.filter(
+            registered_at__isnull=True,
+            created_at__lt=cutoff_time
+        ).exclude(archive='').exclude(archive__isnull=True)
+        for batch in stalled_batches:
+            register_archive_task.delay(str(batch.id))
+            logger.info(f"Re-enqueued extraction of ingest batch {batch.id} after timeout")
+        
+        # Batch documents queued but never started: their task was lost
+        lost_docs = DataSource.objects.filter(
+            status='pending',
+            ingest_batch__isnull=False,
+            dispatched_at__lt=cutoff_time
+        )
+        lost_count = lost_docs.update(dispatched_at=None)
+        if lost_count:
+            logger.info(f"Returned {lost_count} batch documents queued over an hour ago to their batches")
+        
+        # Refill batches whose documents were lost or failed above
+        batch_ids = DataSource.objects.filter(
+            status='pending',
+            ingest_batch__isnull=False,
+            dispatched_at__isnull=True
+        ).values_list('ingest_batch_id', flat=True).distinct()
+        for batch_id in batch_ids:
+            dispatch_batch(batch_id)
             
-        return len(failed_docs)
+        return len(failed_docs) + len(stalled_updates) + lost_count
         
     except Exception as e:
         logger.error(f"Error in cleanup task: {str(e)}")
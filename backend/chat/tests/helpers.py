@@ -0,0 +1,81 @@
+import hashlib
+import shutil
+import tempfile
+from contextlib import ExitStack
+from typing import List
+from unittest import mock
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from langchain.schema import Document
+
+from chat.models import DataSource
+from chat.rag_service import RAGService
+
+PAGE_BREAK = '\f'
+
+
+class FakeEmbeddings:
+    """Deterministic bag-of-words embeddings standing in for the sentence-transformers model."""
+    
+    dim = 64
+    
+    def __init__(self, **kwargs):
+        pass
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+    
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+
+def iter_text_pages(self, data_source: DataSource):
+    """Read a test document: page texts joined by form feeds."""
+    with default_storage.open(data_source.file_path.name) as f:
+        pages = f.read().decode().split(PAGE_BREAK)
+    data_source.total_pages = len(pages)
+    DataSource.objects.filter(id=data_source.id).update(total_pages=data_source.total_pages)
+    for page_number, text in enumerate(pages):
+        yield Document(page_content=text, metadata={'source': data_source.file_path.name, 'page': page_number})
+
+
+def store_document(name: str, pages: List[str]) -> str:
+    """Store a test document and return its storage path."""
+    return default_storage.save(f"documents/{name}", ContentFile(PAGE_BREAK.join(pages).encode()))
+
+
+class RAGTestMixin:
+    """Give each test its own media root, vector store and a RAG service with fake embeddings."""
+    
+    vector_backend = 'numpy'
+    
+    def setUp(self):
+        super().setUp()
+        self._stack = ExitStack()
+        self.addCleanup(self._stack.close)
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, ignore_errors=True)
+        self._stack.enter_context(override_settings(
+            MEDIA_ROOT=f"{temp_dir}/media",
+            RAG_VECTOR_BACKEND=self.vector_backend,
+            RAG_NUMPY_INDEX_PATH=f"{temp_dir}/vectors",
+            RAG_CHROMA_PATH=f"{temp_dir}/chroma",
+            RAG_INGEST_BATCH_SIZE=4,
+            RAG_PDF_WORKERS=1
+        ))
+        self._stack.enter_context(mock.patch('chat.embeddings.HuggingFaceEmbeddings', FakeEmbeddings))
+        self._stack.enter_context(mock.patch.object(RAGService, '_iter_pages', iter_text_pages))
+        self.rag = RAGService()
+    
+    def ingest(self, name: str, pages: List[str]) -> DataSource:
+        data_source = DataSource.objects.create(name=name, source_type='pdf', file_path=store_document(name, pages))
+        self.assertTrue(self.rag.process_document(data_source))
+        data_source.refresh_from_db()
+        return data_source
@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from chat.history import is_follow_up
+from chat.models import Conversation, Message
+
+from .helpers import RAGTestMixin
+
+
+class FollowUpTests(SimpleTestCase):
+    
+    def test_short_standalone_questions_are_not_follow_ups(self):
+        for query in ['Who is the CEO?', 'Vacation policy?', 'How do I reset my password?']:
+            self.assertFalse(is_follow_up(query), query)
+    
+    def test_references_and_ellipses_are_follow_ups(self):
+        for query in ['What about contractors?', 'Does it apply to interns?', 'And for managers?',
+                      'How about part-time staff?', 'Are those paid?']:
+            self.assertTrue(is_follow_up(query), query)
+
+
+@override_settings(RAG_ANSWER_CACHE_ENABLED=True, RAG_CONDENSE_FOLLOWUPS=True)
+class AnswerCacheFollowUpTests(RAGTestMixin, TestCase):
+    """The answer cache must never serve one conversation's follow-up to another."""
+    
+    def setUp(self):
+        super().setUp()
+        self.ingest('handbook.pdf', [
+            'Employees get 25 vacation days per year. Contractors get no paid vacation days.',
+            'Parking is free for employees. Contractors pay 5 euros per day for parking.',
+        ])
+        self.condense = mock.patch.object(self.rag.llm_service, 'generate_response').start()
+        self.addCleanup(mock.patch.stopall)
+    
+    def conversation(self, *turns):
+        conversation = Conversation.objects.create(use_company_data='use')
+        for role, content in turns:
+            Message.objects.create(conversation=conversation, role=role, content=content)
+        return conversation
+    
+    def ask(self, conversation, query, answer):
+        """Run one RAG turn; returns the prepared response, answering it if it was not cached."""
+        Message.objects.create(conversation=conversation, role='user', content=query)
+        prepared = self.rag.prepare_response(query, conversation.id, 'use')
+        if not prepared.cache_hit:
+            self.rag.finish_response(conversation.id, query, prepared, answer, generation_time=0.1)
+        return prepared
+    
+    def test_repeated_standalone_question_is_served_from_the_cache(self):
+        question = 'How many vacation days do employees get?'
+        self.assertFalse(self.ask(self.conversation(), question, '25 days').cache_hit)
+        
+        prepared = self.ask(self.conversation(), question, 'unused')
+        self.assertTrue(prepared.cache_hit)
+        self.assertEqual(prepared.answer, '25 days')
+        self.condense.assert_not_called()
+    
+    def test_follow_up_is_looked_up_only_as_its_standalone_question(self):
+        # Opening a conversation, the words are cached as asked
+        self.assertFalse(self.ask(self.conversation(), 'What about contractors?', 'Which policy?').cache_hit)
+        
+        vacation = self.conversation(('user', 'How many vacation days do employees get?'),
+                                     ('assistant', '25 days.'))
+        self.condense.return_value = 'How many vacation days do contractors get?'
+        prepared = self.ask(vacation, 'What about contractors?', 'None.')
+        self.assertFalse(prepared.cache_hit)
+        self.condense.assert_called_once()
+        
+        # The same words in another conversation mean something else
+        parking = self.conversation(('user', 'Is parking free for employees?'), ('assistant', 'Yes.'))
+        self.condense.return_value = 'Do contractors pay for parking?'
+        prepared = self.ask(parking, 'What about contractors?', '5 euros per day.')
+        self.assertFalse(prepared.cache_hit)
+        self.assertEqual(prepared.cache_query, 'Do contractors pay for parking?')
+        
+        # Asked as a standalone question, the rewritten follow-up is a cache hit
+        prepared = self.ask(self.conversation(), 'How many vacation days do contractors get?', 'unused')
+        self.assertTrue(prepared.cache_hit)
+        self.assertEqual(prepared.answer, 'None.')
+    
+    def test_follow_up_without_a_rewrite_is_not_cached(self):
+        self.condense.return_value = 'What about contractors?'
+        vacation = self.conversation(('user', 'How many vacation days do employees get?'),
+                                     ('assistant', '25 days.'))
+        prepared = self.ask(vacation, 'What about contractors?', 'None.')
+        self.assertIsNone(prepared.cache_query)
+        
+        prepared = self.ask(self.conversation(), 'What about contractors?', 'Contractors pay for parking.')
+        self.assertFalse(prepared.cache_hit)
@@ -0,0 +1,66 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+
+from chat.models import IngestBatch
+from chat.tasks import register_archive_task
+
+
+def zip_archive(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+class BulkUploadTests(TestCase):
+    """A bulk upload stores the archive and leaves extraction to a Celery task."""
+    
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, ALLOWED_HOSTS=['testserver'])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.register = mock.patch('chat.views.register_archive_task').start()
+        self.dispatch = mock.patch('chat.tasks.dispatch_batch').start()
+        self.addCleanup(mock.patch.stopall)
+    
+    def upload(self, content):
+        return Client().post('/api/data-sources/bulk/', {
+            'file': SimpleUploadedFile('handbooks.zip', content), 'concurrency': '2'
+        })
+    
+    def test_upload_returns_before_extraction(self):
+        response = self.upload(zip_archive({
+            'a.pdf': b'%PDF-1.4 a', 'docs/b.pdf': b'%PDF-1.4 b', 'notes.txt': b'text', '__MACOSX/._a.pdf': b'x'
+        }))
+        
+        self.assertEqual(response.status_code, 202)
+        batch = IngestBatch.objects.get(id=response.json()['id'])
+        self.assertIsNone(batch.registered_at)
+        self.assertTrue(response.json()['progress']['registering'])
+        self.assertFalse(response.json()['progress']['done'])
+        self.assertEqual(batch.data_sources.count(), 0)
+        self.register.delay.assert_called_once_with(str(batch.id))
+        
+        self.assertEqual(register_archive_task(str(batch.id)), 2)
+        batch.refresh_from_db()
+        self.assertIsNotNone(batch.registered_at)
+        self.assertEqual(sorted(batch.data_sources.values_list('name', flat=True)), ['a.pdf', 'b.pdf'])
+        self.assertEqual(batch.failed_files, 1)  # notes.txt
+        self.assertFalse(batch.archive)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'archives')), [])
+        self.dispatch.assert_called_once_with(batch.id)
+    
+    def test_invalid_archive_is_rejected_in_the_request(self):
+        response = self.upload(b'not a zip')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IngestBatch.objects.exists())
@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from chat.models import DataSource, DocumentChunk
+
+from .helpers import RAGTestMixin, store_document
+
+
+def page(number: int) -> str:
+    return f"Page {number} of the travel policy." + f" Expense rule {number} applies." * 10
+
+
+class ResumeFromCheckpointTests(RAGTestMixin, TestCase):
+    """An interrupted ingestion resumes after the last committed batch."""
+    
+    def setUp(self):
+        super().setUp()
+        # One chunk per page and four chunks per batch: three batches
+        self.pages = [page(number) for number in range(10)]
+        self.data_source = DataSource.objects.create(
+            name='travel.pdf', source_type='pdf', file_path=store_document('travel.pdf', self.pages)
+        )
+    
+    def fail_on_call(self, target, attribute, call_number):
+        """Patch a method so its given call raises, delegating every other call."""
+        original = getattr(target, attribute)
+        calls = []
+        
+        def side_effect(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == call_number:
+                raise RuntimeError('worker lost')
+            return original(*args, **kwargs)
+        
+        return mock.patch.object(target, attribute, side_effect=side_effect)
+    
+    def assert_fully_ingested(self):
+        self.data_source.refresh_from_db()
+        self.assertEqual(self.data_source.status, 'completed')
+        self.assertEqual(self.data_source.total_chunks, len(self.pages))
+        chunks = DocumentChunk.objects.filter(data_source=self.data_source).order_by('chunk_index')
+        self.assertEqual([chunk.content for chunk in chunks], self.pages)
+        self.assertEqual([chunk.chunk_index for chunk in chunks], list(range(len(self.pages))))
+        self.assertEqual(self.rag.vector_store.count(), len(self.pages))
+    
+    def test_resume_skips_committed_batches(self):
+        with self.fail_on_call(self.rag.embedding_service, 'embed_documents', 2):
+            self.assertFalse(self.rag.process_document(self.data_source))
+        self.data_source.refresh_from_db()
+        self.assertEqual(self.data_source.status, 'failed')
+        self.assertEqual(self.data_source.ingest_checkpoint, 4)
+        self.assertEqual(DocumentChunk.objects.filter(data_source=self.data_source).count(), 4)
+        
+        with mock.patch.object(self.rag.embedding_service, 'embed_documents',
+                               wraps=self.rag.embedding_service.embed_documents) as embed:
+            self.assertTrue(self.rag.process_document(self.data_source, resume=True))
+        embedded = [text for call in embed.call_args_list for text in call.args[0]]
+        self.assertEqual(embedded, self.pages[4:])
+        self.assert_fully_ingested()
+        self.assertEqual(self.data_source.reused_chunks, 4)
+        self.assertEqual(self.data_source.recomputed_chunks, 6)
+        self.assertEqual(self.data_source.processing_attempts, 2)
+    
+    def test_failed_vector_write_rolls_back_its_batch(self):
+        with self.fail_on_call(self.rag.vector_store, 'add', 2):
+            self.assertFalse(self.rag.process_document(self.data_source))
+        self.data_source.refresh_from_db()
+        self.assertEqual(self.data_source.ingest_checkpoint, 4)
+        self.assertEqual(
+            list(DocumentChunk.objects.filter(data_source=self.data_source).values_list('chunk_index', flat=True)
+                 .order_by('chunk_index')),
+            [0, 1, 2, 3]
+        )
+        
+        self.assertTrue(self.rag.process_document(self.data_source, resume=True))
+        self.assert_fully_ingested()
+    
+    def test_rows_past_the_checkpoint_are_replaced(self):
+        self.assertTrue(self.rag.process_document(self.data_source))
+        # Simulate a crash after a batch was written but before its checkpoint
+        DataSource.objects.filter(id=self.data_source.id).update(ingest_checkpoint=4, status='processing')
+        self.data_source.refresh_from_db()
+        
+        self.assertTrue(self.rag.process_document(self.data_source, resume=True))
+        self.assert_fully_ingested()
+    
+    def test_without_resume_ingestion_starts_over(self):
+        with self.fail_on_call(self.rag.embedding_service, 'embed_documents', 3):
+            self.assertFalse(self.rag.process_document(self.data_source))
+        self.data_source.refresh_from_db()
+        self.assertEqual(self.data_source.ingest_checkpoint, 8)
+        
+        self.assertTrue(self.rag.process_document(self.data_source))
+        self.assert_fully_ingested()
+        self.assertEqual(self.data_source.reused_chunks, 0)
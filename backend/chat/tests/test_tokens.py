@@ -0,0 +1,25 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from chat import tokens
+
+
+class TokenFallbackTests(SimpleTestCase):
+    
+    def setUp(self):
+        tokens.warn_estimating.cache_clear()
+    
+    def test_estimate_is_logged_once(self):
+        with mock.patch('chat.tokens.get_encoding', return_value=None):
+            with self.assertLogs('chat.tokens', level='WARNING') as logs:
+                self.assertEqual(tokens.count_tokens('a' * 40), 10)
+                self.assertEqual(tokens.truncate_to_tokens('a' * 40, 2), 'a' * 8)
+        self.assertEqual(len(logs.records), 1)
+    
+    def test_tokenizer_counts_are_not_logged(self):
+        encoding = mock.Mock()
+        encoding.encode.side_effect = lambda text, disallowed_special: text.split()
+        with mock.patch('chat.tokens.get_encoding', return_value=encoding):
+            with self.assertNoLogs('chat.tokens', level='WARNING'):
+                self.assertEqual(tokens.count_tokens('Employees get 25 vacation days.'), 5)
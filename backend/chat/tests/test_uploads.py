@@ -0,0 +1,107 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.test import Client, TestCase, override_settings
+
+from chat.ingestion import register_files
+from chat.models import DataSource, IngestBatch
+
+PDF = b'%PDF-1.4 handbook ' * 100
+
+
+class UploadDeduplicationTests(TestCase):
+    """Byte-identical uploads map to the existing data source and are not stored again."""
+    
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, ALLOWED_HOSTS=['testserver'])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.documents_dir = os.path.join(media_root, 'documents')
+        self.process = mock.patch('chat.views.process_document_task').start()
+        self.addCleanup(mock.patch.stopall)
+        self.client = Client()
+    
+    def stored_files(self):
+        return sorted(os.listdir(self.documents_dir)) if os.path.isdir(self.documents_dir) else []
+    
+    def upload(self, content=PDF, name='handbook.pdf'):
+        return self.client.post('/api/data-sources/', {'file': SimpleUploadedFile(name, content)})
+    
+    def test_duplicate_upload_returns_the_existing_source_without_storing(self):
+        first = self.upload()
+        self.assertEqual(first.status_code, 201)
+        stored = self.stored_files()
+        
+        second = self.upload(name='copy.pdf')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['id'], first.json()['id'])
+        self.assertEqual(self.stored_files(), stored)
+        self.assertEqual(DataSource.objects.count(), 1)
+        self.process.delay.assert_called_once()
+    
+    def test_failed_source_does_not_block_a_new_upload(self):
+        self.upload()
+        DataSource.objects.update(status='failed')
+        
+        response = self.upload()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(DataSource.objects.count(), 2)
+    
+    def test_upload_losing_the_insert_race_returns_the_winner(self):
+        winner = self.upload().json()
+        stored = self.stored_files()
+        
+        # The duplicate check ran before the concurrent upload's row existed
+        with mock.patch('chat.views.live_source_with_hash',
+                        side_effect=[None, DataSource.objects.get(id=winner['id'])]):
+            response = self.upload(name='copy.pdf')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], winner['id'])
+        self.assertEqual(self.stored_files(), stored)
+        self.assertEqual(DataSource.objects.count(), 1)
+    
+    def test_live_sources_cannot_share_a_file(self):
+        DataSource.objects.create(name='a.pdf', source_type='pdf', file_hash='same', status='completed')
+        DataSource.objects.create(name='b.pdf', source_type='pdf', file_hash='same', status='failed')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DataSource.objects.create(name='c.pdf', source_type='pdf', file_hash='same')
+    
+    def test_bulk_registration_skips_duplicates_without_storing_them(self):
+        self.upload()
+        stored = self.stored_files()
+        batch = IngestBatch.objects.create(name='archive.zip', concurrency=2)
+        
+        created = register_files(batch, [
+            ('handbook.pdf', lambda: io.BytesIO(PDF)),
+            ('other.pdf', lambda: io.BytesIO(b'%PDF-1.4 other')),
+            ('other-copy.pdf', lambda: io.BytesIO(b'%PDF-1.4 other')),
+        ])
+        
+        batch.refresh_from_db()
+        self.assertEqual([data_source.name for data_source in created], ['other.pdf'])
+        self.assertEqual(batch.duplicate_files, 2)
+        self.assertEqual(len(self.stored_files()), len(stored) + 1)
+    
+    def test_bulk_registration_losing_the_insert_race_counts_a_duplicate(self):
+        self.upload()
+        stored = self.stored_files()
+        batch = IngestBatch.objects.create(name='archive.zip', concurrency=2)
+        
+        with mock.patch('chat.ingestion.live_source_with_hash', return_value=None):
+            created = register_files(batch, [
+                ('handbook.pdf', lambda: io.BytesIO(PDF)),
+                ('other.pdf', lambda: io.BytesIO(b'%PDF-1.4 other')),
+            ])
+        
+        batch.refresh_from_db()
+        self.assertEqual([data_source.name for data_source in created], ['other.pdf'])
+        self.assertEqual(batch.duplicate_files, 1)
+        self.assertEqual(len(self.stored_files()), len(stored) + 1)
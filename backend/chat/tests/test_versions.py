@@ -0,0 +1,115 @@
+from django.core.files.storage import default_storage
+from django.test import TestCase
+
+from chat.models import DataSource, DocumentChunk
+from chat.rag_service import staged_source_id
+
+from .helpers import RAGTestMixin, store_document
+
+
+def page(topic: str, number: int) -> str:
+    return f"Page {number} covers {topic} in detail." + f" {topic} policy clause {number}." * 10
+
+
+class DocumentVersionSwapTests(RAGTestMixin, TestCase):
+    """Updating a completed document to a new version, on the NumPy backend."""
+    
+    def setUp(self):
+        super().setUp()
+        self.v1 = [page(topic, number) for number, topic in enumerate(['alpha', 'bravo', 'charlie', 'delta', 'echo'])]
+        self.data_source = self.ingest('handbook.pdf', self.v1)
+        self.old_file = self.data_source.file_path.name
+    
+    def stage_version(self, pages):
+        self.data_source.pending_file = store_document('handbook-next.pdf', pages)
+        self.data_source.pending_file_hash = 'next'
+        self.data_source.save()
+        return self.data_source.pending_file.name
+    
+    def vector_metadata(self):
+        chunks = DocumentChunk.objects.filter(data_source=self.data_source)
+        hits = self.rag.vector_store.query(self.rag.embedding_service.embed_query('policy clause'), 50,
+                                           [str(self.data_source.id)])
+        return chunks, {hit.id: hit for hit in hits}
+    
+    def test_update_reuses_unchanged_chunks_and_moves_their_vectors(self):
+        # Insert a page so every reused chunk moves to a new position
+        v2 = [self.v1[0], page('zulu', 9)] + self.v1[1:4]
+        new_file = self.stage_version(v2)
+        kept_ids = set(DocumentChunk.objects.filter(data_source=self.data_source).exclude(
+            content=self.v1[4]
+        ).values_list('id', flat=True))
+        
+        self.assertTrue(self.rag.update_document(self.data_source))
+        
+        self.data_source.refresh_from_db()
+        self.assertEqual(self.data_source.status, 'completed')
+        self.assertEqual(self.data_source.version, 2)
+        self.assertEqual(self.data_source.file_path.name, new_file)
+        self.assertEqual(self.data_source.reused_chunks, 4)
+        self.assertEqual(self.data_source.recomputed_chunks, 1)
+        self.assertFalse(self.data_source.pending_file)
+        self.assertFalse(default_storage.exists(self.old_file))
+        
+        chunks, hits = self.vector_metadata()
+        self.assertEqual([chunk.content for chunk in chunks.order_by('chunk_index')], v2)
+        self.assertTrue(kept_ids <= {chunk.id for chunk in chunks})
+        self.assertEqual(self.rag.vector_store.count(), len(v2))
+        for chunk in chunks:
+            hit = hits[str(chunk.id)]
+            self.assertEqual(hit.chunk_index, chunk.chunk_index)
+            self.assertEqual(hit.page_number, chunk.page_number)
+            self.assertEqual(hit.token_count, chunk.token_count)
+        self.assertEqual(self.rag.vector_store.query(
+            self.rag.embedding_service.embed_query('zulu'), 5, [staged_source_id(self.data_source.id)]
+        ), [])
+        self.assertEqual(
+            [hit.content for hit in self.rag.lexical_index.search('zulu', 5, [str(self.data_source.id)])],
+            [page('zulu', 9)]
+        )
+    
+    def test_current_version_is_served_until_the_swap(self):
+        self.stage_version([page('zulu', 0)] + self.v1[1:])
+        served = []
+        stage_chunks = self.rag._stage_chunks
+        
+        def stage_and_search(data_source, chunk_objects):
+            stage_chunks(data_source, chunk_objects)
+            served.append(DataSource.objects.get(id=data_source.id).status)
+            served.extend(chunk.content for chunk in self.rag.retrieve_relevant_chunks('alpha zulu', 10))
+        
+        self.rag._stage_chunks = stage_and_search
+        self.assertTrue(self.rag.update_document(self.data_source))
+        
+        self.assertEqual(served[0], 'updating')
+        self.assertIn(self.v1[0], served)
+        self.assertNotIn(page('zulu', 0), served)
+    
+    def test_failed_update_leaves_the_current_version(self):
+        new_file = self.stage_version([page('zulu', 0)] + self.v1[1:])
+        before = list(DocumentChunk.objects.filter(data_source=self.data_source).order_by(
+            'chunk_index').values_list('id', 'chunk_index', 'content'))
+        
+        def fail(*args):
+            raise RuntimeError('vector store unavailable')
+        
+        self.rag.vector_store.update_metadata = fail
+        self.assertFalse(self.rag.update_document(self.data_source))
+        
+        self.data_source.refresh_from_db()
+        self.assertEqual(self.data_source.status, 'completed')
+        self.assertEqual(self.data_source.version, 1)
+        self.assertEqual(self.data_source.file_path.name, self.old_file)
+        self.assertIn('Update to version 2 failed', self.data_source.error_message)
+        self.assertFalse(self.data_source.pending_file)
+        self.assertTrue(default_storage.exists(self.old_file))
+        self.assertFalse(default_storage.exists(new_file))
+        self.assertEqual(list(DocumentChunk.objects.filter(data_source=self.data_source).order_by(
+            'chunk_index').values_list('id', 'chunk_index', 'content')), before)
+        self.assertEqual(self.rag.vector_store.count(), len(self.v1))
+
+
+class ChromaDocumentVersionSwapTests(DocumentVersionSwapTests):
+    """The same version swap on the ChromaDB backend."""
+    
+    vector_backend = 'chroma'
@@ -0,0 +1,65 @@
+import logging
+from functools import lru_cache
+from typing import List
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Fallback estimate when tiktoken is unavailable: English text averages
+# about four characters per BPE token
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str):
+    """Load a tiktoken encoding, or None if tiktoken or the encoding is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"Tokenizer {name} unavailable, estimating token counts: {str(e)}")
+        return None
+
+
+@lru_cache(maxsize=None)
+def warn_estimating(name: str):
+    """Log, once per encoding, that token counts are estimates rather than exact."""
+    logger.warning(f"Token counts are estimated at {CHARS_PER_TOKEN} characters per token because {name} is unavailable")
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of a text with the configured tokenizer."""
+    if not text:
+        return 0
+    encoding = get_encoding(settings.RAG_TOKENIZER_ENCODING)
+    if encoding is None:
+        warn_estimating(settings.RAG_TOKENIZER_ENCODING)
+        return max(1, round(len(text) / CHARS_PER_TOKEN))
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text down to at most max_tokens tokens."""
+    encoding = get_encoding(settings.RAG_TOKENIZER_ENCODING)
+    if encoding is None:
+        warn_estimating(settings.RAG_TOKENIZER_ENCODING)
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def pack_to_budget(token_counts: List[int], budget: int, separator_tokens: int = 1) -> List[int]:
+    """Pick items, in rank order, whose token counts fit within a budget.
+
+    Items that don't fit are skipped so smaller lower-ranked ones can still
+    be used. Returns the indexes of the picked items.
+    """
+    picked = []
+    used = 0
+    for index, tokens in enumerate(token_counts):
+        cost = tokens + (separator_tokens if picked else 0)
+        if used + cost <= budget:
+            picked.append(index)
+            used += cost
+    return picked
@@ -3,21 +3,32 @@ from django.conf import settings
 from django.conf.urls.static import static
 from . import views
 
+# Async conversation views for ASGI deployments
+chat_views = views
+if settings.CHAT_ASYNC_VIEWS:
+    from . import async_views as chat_views
+
 urlpatterns = [
     # LLM Status
     path('llm-status/', views.llm_status, name='llm-status'),
+    path('live/', views.live, name='live'),
     
     # Conversations
-    path('conversations/', views.conversation_list, name='conversation-list'),
-    path('conversations/<int:conversation_id>/', views.conversation_detail, name='conversation-detail'),
+    path('conversations/', chat_views.conversation_list, name='conversation-list'),
+    path('conversations/<int:conversation_id>/', chat_views.conversation_detail, name='conversation-detail'),
+    path('conversations/<int:conversation_id>/stream/', chat_views.conversation_stream, name='conversation-stream'),
     path('conversations/<int:conversation_id>/delete/', views.conversation_delete, name='conversation-delete'),
     path('conversations/<int:conversation_id>/feedback/', views.submit_feedback, name='submit-feedback'),
     path('conversations/<int:conversation_id>/feedback/list/', views.conversation_feedback, name='conversation-feedback'),
     
     # RAG Admin
     path('data-sources/', views.data_sources, name='data-sources'),
+    path('data-sources/bulk/', views.data_sources_bulk, name='data-sources-bulk'),
+    path('ingest-batches/<uuid:batch_id>/', views.ingest_batch_detail, name='ingest-batch-detail'),
     path('data-sources/<uuid:data_source_id>/', views.data_source_detail, name='data-source-detail'),
+    path('data-sources/<uuid:data_source_id>/versions/', views.data_source_version, name='data-source-version'),
     path('rag-stats/', views.rag_stats, name='rag-stats'),
+    path('rag-ready/', views.rag_ready, name='rag-ready'),
     path('conversations/<int:conversation_id>/rag-queries/', views.rag_queries, name='rag-queries'),
 ]
 
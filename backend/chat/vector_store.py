@@ -0,0 +1,489 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .quantization import SCORE_BLOCK_ROWS, get_quantizer, top_k
+from .retrieval import RetrievedChunk
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStore:
+    """Interface for the vector index behind RAGService.
+    
+    Vectors are unit-length embeddings; query results carry the squared L2
+    distance (2 - 2 * cosine), matching ChromaDB's default space.
+    """
+    
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+            metadatas: List[Dict[str, Any]]) -> None:
+        """Add vectors; adding an existing id replaces it."""
+        raise NotImplementedError
+    
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Replace the metadata of existing vectors, keeping the vectors."""
+        raise NotImplementedError
+    
+    def delete(self, ids: List[str]) -> None:
+        """Delete vectors by id."""
+        raise NotImplementedError
+    
+    def delete_by_source(self, data_source_id: str) -> None:
+        """Delete every vector of a data source."""
+        raise NotImplementedError
+    
+    def query(self, embedding: List[float], k: int, source_ids: Optional[List[str]] = None) -> List[RetrievedChunk]:
+        """Get the k nearest vectors, optionally restricted to some data sources."""
+        raise NotImplementedError
+    
+    def count(self) -> int:
+        """Get the number of stored vectors."""
+        raise NotImplementedError
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get backend-specific statistics."""
+        return {}
+    
+    def export_vectors(self) -> np.ndarray:
+        """Get every stored vector as a (rows, dim) float32 matrix."""
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """Vector store backed by a persistent ChromaDB collection."""
+    
+    def __init__(self, path: str, collection_name: str = "company_documents"):
+        import chromadb
+        from chromadb.config import Settings
+        
+        self.client = chromadb.PersistentClient(
+            path=path,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        # Embeddings are always computed by EmbeddingService and passed in
+        # explicitly, never by ChromaDB's default embedding function.
+        self.collection_name = collection_name
+        self.collection = self.client.get_or_create_collection(collection_name)
+    
+    def add(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+    
+    def update_metadata(self, ids, metadatas):
+        if ids:
+            self.collection.update(ids=ids, metadatas=metadatas)
+    
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=ids)
+    
+    def delete_by_source(self, data_source_id):
+        self.collection.delete(where={'data_source_id': str(data_source_id)})
+    
+    def query(self, embedding, k, source_ids=None):
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=k,
+            where={'data_source_id': {'$in': list(source_ids)}} if source_ids is not None else None,
+            include=['documents', 'metadatas', 'distances']
+        )
+        return [
+            RetrievedChunk.from_vector_metadata(embedding_id, document, metadata, distance)
+            for embedding_id, document, metadata, distance in zip(
+                results['ids'][0],
+                results['documents'][0],
+                results['metadatas'][0],
+                results['distances'][0]
+            )
+        ]
+    
+    def count(self):
+        return self.collection.count()
+    
+    def export_vectors(self):
+        embeddings = self.collection.get(include=['embeddings'])['embeddings'] or []
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact vector search over a memory-mapped float32 matrix.
+    
+    Top-k is one matrix-vector product plus argpartition, which for corpora
+    under ~1M chunks is fast and has fully predictable recall.
+    
+    Each generation of the index is a directory holding:
+      vectors.f32   - row-major float32 vectors, append-only
+      records.jsonl - append-only log of operations; 'add' records carry the
+                      row number, id, document and metadata, and 'update'
+                      records replace a row's document and metadata
+    CURRENT names the live generation. Writers serialize on an flock and
+    readers replay new log records whenever the log grows, so web and worker
+    processes see each other's writes. Once deleted rows outnumber live ones,
+    the index is compacted into a new generation and CURRENT is swapped.
+    
+    With quantization ('int8' or 'binary'), compact codes for every row are
+    kept in memory and scanned first; only the best k * rescore_factor
+    candidates are re-scored with their float32 vectors, so the float
+    matrix stays on disk apart from the pages those rows live on.
+    """
+    COMPACT_MIN_DEAD_ROWS = 1024
+    
+    def __init__(self, path: str, quantization: str = 'none', rescore_factor: int = 10):
+        self.path = path
+        self.quantizer = get_quantizer(quantization)
+        self.rescore_factor = rescore_factor
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._generation = None
+        self._reset()
+    
+    # Public interface
+    
+    def add(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._write_lock():
+            if self.dim is None:
+                self._write_meta(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+            
+            # Drop any tail left by a writer that died before logging its rows
+            start_row = len(self._ids)
+            with open(self._file('vectors.f32'), 'r+b' if os.path.exists(self._file('vectors.f32')) else 'wb') as f:
+                f.truncate(start_row * self.dim * 4)
+                f.seek(0, os.SEEK_END)
+                f.write(vectors.tobytes())
+            
+            self._append_log([
+                {'op': 'add', 'row': start_row + offset, 'id': embedding_id,
+                 'document': document, 'metadata': metadata}
+                for offset, (embedding_id, document, metadata) in enumerate(zip(ids, documents, metadatas))
+            ])
+    
+    def update_metadata(self, ids, metadatas):
+        if not ids:
+            return
+        with self._write_lock():
+            records = []
+            for embedding_id, metadata in zip(ids, metadatas):
+                row = self._row_of_id.get(embedding_id)
+                if row is None:
+                    continue
+                self._log_file.seek(self._offsets[row])
+                document = json.loads(self._log_file.readline())['document']
+                records.append({'op': 'update', 'id': embedding_id, 'document': document, 'metadata': metadata})
+            self._append_log(records)
+    
+    def delete(self, ids):
+        if not ids:
+            return
+        with self._write_lock():
+            self._append_log([{'op': 'delete', 'ids': list(ids)}])
+            self._maybe_compact()
+    
+    def delete_by_source(self, data_source_id):
+        with self._write_lock():
+            self._append_log([{'op': 'delete_source', 'data_source_id': str(data_source_id)}])
+            self._maybe_compact()
+    
+    def query(self, embedding, k, source_ids=None):
+        with self._lock:
+            self._refresh()
+            if not self._ids or k <= 0:
+                return []
+            
+            query = np.asarray(embedding, dtype=np.float32)
+            candidates = self._candidate_mask(source_ids)
+            if self.quantizer is None:
+                scores = self._matrix @ query
+            else:
+                # Shortlist with the compact codes, then re-score exactly
+                approx_scores = self.quantizer.score(self._codes, query)
+                approx_scores[~candidates] = -np.inf
+                shortlist = np.sort(top_k(approx_scores, k * self.rescore_factor))
+                scores = np.full(len(self._ids), -np.inf, dtype=np.float32)
+                if len(shortlist):
+                    scores[shortlist] = self._matrix[shortlist] @ query
+            scores[~candidates] = -np.inf
+            
+            return [self._read_hit(int(row), float(scores[row])) for row in top_k(scores, k)]
+    
+    def count(self):
+        with self._lock:
+            self._refresh()
+            return len(self._row_of_id)
+    
+    def get_stats(self):
+        with self._lock:
+            self._refresh()
+            rows = len(self._ids)
+            return {
+                'rows': rows,
+                'live_rows': len(self._row_of_id),
+                'dimensions': self.dim,
+                'quantization': self.quantizer.name if self.quantizer else 'none',
+                'float_bytes': int(self._matrix.nbytes),
+                'code_bytes': int(self._codes.nbytes) if self._codes is not None else 0,
+            }
+    
+    def export_vectors(self):
+        with self._lock:
+            self._refresh()
+            return np.asarray(self._matrix[sorted(self._row_of_id.values())], dtype=np.float32)
+    
+    def compact(self) -> None:
+        """Rewrite the index without deleted rows."""
+        with self._write_lock():
+            self._compact()
+    
+    # Scoring
+    
+    def _candidate_mask(self, source_ids: Optional[List[str]]) -> np.ndarray:
+        mask = self._live_array()
+        if source_ids is not None:
+            codes = [self._source_codes[source_id] for source_id in source_ids if source_id in self._source_codes]
+            mask &= np.isin(self._source_array(), codes)
+        return mask
+    
+    def _read_hit(self, row: int, score: float) -> RetrievedChunk:
+        """Build a result from the row's latest add or update record in the log."""
+        self._log_file.seek(self._offsets[row])
+        record = json.loads(self._log_file.readline())
+        return RetrievedChunk.from_vector_metadata(
+            record['id'], record['document'], record['metadata'], distance=2 - 2 * score
+        )
+    
+    # State
+    
+    def _reset(self) -> None:
+        self.dim = None
+        self._ids = []  # row -> id
+        self._offsets = []  # row -> byte offset of the row's latest add/update record
+        self._sources = []  # row -> data source code
+        self._source_codes = {}  # data_source_id -> code
+        self._rows_by_source = {}  # code -> set of live rows
+        self._row_of_id = {}  # id -> live row
+        self._dead_rows = set()
+        self._log_position = 0
+        self._log_inode = None
+        self._log_file = None
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._codes = None  # quantized rows, when quantization is enabled
+        self._arrays = None  # cached (live mask, source codes)
+    
+    def _live_array(self) -> np.ndarray:
+        return self._get_arrays()[0].copy()
+    
+    def _source_array(self) -> np.ndarray:
+        return self._get_arrays()[1]
+    
+    def _get_arrays(self):
+        if self._arrays is None:
+            live = np.ones(len(self._ids), dtype=bool)
+            if self._dead_rows:
+                live[list(self._dead_rows)] = False
+            self._arrays = (live, np.asarray(self._sources, dtype=np.int32))
+        return self._arrays
+    
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, self._generation or self._current_generation(), name)
+    
+    def _current_generation(self) -> str:
+        try:
+            with open(os.path.join(self.path, 'CURRENT')) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            os.makedirs(os.path.join(self.path, 'gen-0'), exist_ok=True)
+            self._write_current('gen-0')
+            return 'gen-0'
+    
+    def _write_current(self, generation: str) -> None:
+        tmp_path = os.path.join(self.path, 'CURRENT.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(generation)
+        os.replace(tmp_path, os.path.join(self.path, 'CURRENT'))
+    
+    def _write_meta(self, dim: int) -> None:
+        with open(self._file('meta.json'), 'w') as f:
+            json.dump({'dim': dim}, f)
+        self.dim = dim
+    
+    def _refresh(self) -> None:
+        """Catch up with writes made by this or other processes."""
+        generation = self._current_generation()
+        if generation != self._generation:
+            self._close()
+            self._reset()
+            self._generation = generation
+        
+        log_path = self._file('records.jsonl')
+        try:
+            stat = os.stat(log_path)
+        except FileNotFoundError:
+            # Either nothing has been written yet, or a compaction just
+            # replaced this generation; in the latter case start over.
+            if self._current_generation() != generation:
+                return self._refresh()
+            return
+        if self._log_file is None or stat.st_ino != self._log_inode:
+            self._close()
+            self._reset()
+            self._generation = generation
+            self._log_file = open(log_path, 'rb')
+            self._log_inode = stat.st_ino
+        if stat.st_size == self._log_position:
+            return
+        
+        if self.dim is None and os.path.exists(self._file('meta.json')):
+            # Absent until the first add; earlier records can only be deletes
+            with open(self._file('meta.json')) as f:
+                self.dim = json.load(f)['dim']
+        
+        self._log_file.seek(self._log_position)
+        while True:
+            offset = self._log_file.tell()
+            line = self._log_file.readline()
+            if not line.endswith(b'\n'):
+                break  # partially written record; read it next time
+            self._apply(json.loads(line), offset)
+            self._log_position = self._log_file.tell()
+        
+        self._arrays = None
+        if len(self._ids) != self._matrix.shape[0]:
+            self._matrix = np.memmap(
+                self._file('vectors.f32'), dtype=np.float32, mode='r', shape=(len(self._ids), self.dim)
+            ) if self._ids else np.zeros((0, self.dim), dtype=np.float32)
+        
+        if self.quantizer is not None:
+            # Encode only the rows added since the last refresh
+            encoded_rows = 0 if self._codes is None else len(self._codes)
+            if encoded_rows < len(self._ids):
+                new_codes = [
+                    self.quantizer.encode(np.asarray(self._matrix[start:start + SCORE_BLOCK_ROWS]))
+                    for start in range(encoded_rows, len(self._ids), SCORE_BLOCK_ROWS)
+                ]
+                if self._codes is not None:
+                    new_codes.insert(0, self._codes)
+                self._codes = np.concatenate(new_codes)
+    
+    def _apply(self, record: Dict[str, Any], offset: int) -> None:
+        op = record['op']
+        if op == 'add':
+            row = record['row']
+            if row != len(self._ids):
+                raise ValueError(f"Vector index log is out of order at row {row}")
+            code = self._source_code(record)
+            
+            # Adding an existing id replaces the old row
+            self._kill_row(self._row_of_id.get(record['id']))
+            self._ids.append(record['id'])
+            self._offsets.append(offset)
+            self._sources.append(code)
+            self._row_of_id[record['id']] = row
+            self._rows_by_source.setdefault(code, set()).add(row)
+        elif op == 'update':
+            row = self._row_of_id.get(record['id'])
+            if row is not None:
+                self._offsets[row] = offset
+                # New metadata can move the row to another data source
+                code = self._source_code(record)
+                if code != self._sources[row]:
+                    self._rows_by_source[self._sources[row]].discard(row)
+                    self._sources[row] = code
+                    self._rows_by_source.setdefault(code, set()).add(row)
+        elif op == 'delete':
+            for embedding_id in record['ids']:
+                self._kill_row(self._row_of_id.get(embedding_id))
+        elif op == 'delete_source':
+            code = self._source_codes.get(record['data_source_id'])
+            for row in list(self._rows_by_source.get(code, ())):
+                self._kill_row(row)
+    
+    def _source_code(self, record: Dict[str, Any]) -> int:
+        source_id = str((record.get('metadata') or {}).get('data_source_id'))
+        return self._source_codes.setdefault(source_id, len(self._source_codes))
+    
+    def _kill_row(self, row: Optional[int]) -> None:
+        if row is None or row in self._dead_rows:
+            return
+        self._dead_rows.add(row)
+        self._row_of_id.pop(self._ids[row], None)
+        self._rows_by_source[self._sources[row]].discard(row)
+    
+    def _close(self) -> None:
+        if self._log_file is not None:
+            self._log_file.close()
+    
+    # Writes
+    
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            with open(os.path.join(self.path, 'write.lock'), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._refresh()
+                    yield
+                    self._refresh()
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _append_log(self, records: List[Dict[str, Any]]) -> None:
+        with open(self._file('records.jsonl'), 'ab') as f:
+            f.write(b''.join(json.dumps(record).encode() + b'\n' for record in records))
+    
+    def _maybe_compact(self) -> None:
+        self._refresh()
+        dead = len(self._dead_rows)
+        if dead >= self.COMPACT_MIN_DEAD_ROWS and dead > len(self._row_of_id):
+            self._compact()
+    
+    def _compact(self) -> None:
+        """Copy live rows into a new generation and switch CURRENT to it."""
+        self._refresh()
+        old_generation = self._generation
+        new_generation = f"gen-{int(old_generation.split('-')[1]) + 1}"
+        new_dir = os.path.join(self.path, new_generation)
+        os.makedirs(new_dir, exist_ok=True)
+        
+        live_rows = sorted(self._row_of_id.values())
+        if self.dim is not None:
+            with open(os.path.join(new_dir, 'meta.json'), 'w') as f:
+                json.dump({'dim': self.dim}, f)
+            np.ascontiguousarray(self._matrix[live_rows]).tofile(os.path.join(new_dir, 'vectors.f32'))
+        with open(os.path.join(new_dir, 'records.jsonl'), 'wb') as f:
+            for new_row, row in enumerate(live_rows):
+                self._log_file.seek(self._offsets[row])
+                record = json.loads(self._log_file.readline())
+                record['op'] = 'add'
+                record['row'] = new_row
+                f.write(json.dumps(record).encode() + b'\n')
+        
+        self._write_current(new_generation)
+        self._refresh()
+        # Readers with the old files open keep them alive until they refresh
+        shutil.rmtree(os.path.join(self.path, old_generation), ignore_errors=True)
+        logger.info(f"Compacted vector index to {len(live_rows)} rows ({new_generation})")
+
+
+def create_vector_store() -> VectorStore:
+    """Create the vector store selected by RAG_VECTOR_BACKEND."""
+    backend = settings.RAG_VECTOR_BACKEND
+    if backend == 'chroma':
+        return ChromaVectorStore(settings.RAG_CHROMA_PATH)
+    if backend == 'numpy':
+        return NumpyVectorStore(
+            settings.RAG_NUMPY_INDEX_PATH,
+            quantization=settings.RAG_VECTOR_QUANTIZATION,
+            rescore_factor=settings.RAG_QUANTIZED_RESCORE_FACTOR
+        )
+    raise ValueError(f"Unsupported vector backend: {backend}")
@@ -2,35 +2,54 @@ from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.db import IntegrityError, transaction
+import logging
 import os
 import uuid
+import zipfile
 
-from .models import Conversation, Message, UserFeedback, DataSource, DocumentChunk, RAGQuery
+from .models import Conversation, Message, UserFeedback, DataSource, DocumentChunk, RAGQuery, IngestBatch
 from .serializers import (
     ConversationSerializer, ConversationListSerializer, MessageSerializer, 
     UserFeedbackSerializer, DataSourceSerializer, DataSourceListSerializer,
-    RAGQuerySerializer
+    RAGQuerySerializer, IngestBatchSerializer
 )
-from .services import LLMService
-from .rag_service import RAGService
-from .tasks import process_document_task, delete_document_chunks_task
+from .ingestion import archive_members, discard_upload, hash_upload, live_source_with_hash, store_upload
+from .services import LLMService, get_llm_singleflight
+from .health import get_health_monitor
+from .history import build_history
+from .streaming import stream_assistant_reply
+from .rag_service import get_rag_service, get_rag_service_state
+from .tasks import process_document_task, update_document_task, delete_document_chunks_task, register_archive_task
+
+logger = logging.getLogger(__name__)
 
 
 @api_view(['GET'])
 def llm_status(request):
-    """Check LLM service status and model information."""
-    llm_service = LLMService()
-    model_info = llm_service.get_model_info()
+    """Report LLM status from the cached background probe; never calls the model.
+
+    Reports 'unknown' until the first probe has finished.
+    """
+    health = get_health_monitor().get_status()
+    singleflight = get_llm_singleflight()
     
     return Response({
-        'status': 'ok' if 'API working' in model_info else 'error',
-        'model_info': model_info,
-        'github_configured': bool(llm_service.github_token)
+        **health,
+        'coalescing': singleflight.get_stats() if singleflight else None,
+        'github_configured': bool(os.getenv('GITHUB_TOKEN'))
     })
 
 
+@api_view(['GET'])
+def live(request):
+    """Liveness probe: the process is up and serving requests (no network or database access)."""
+    return Response({'status': 'alive'})
+
+
 @api_view(['GET', 'POST'])
 def conversation_list(request):
     """List all conversations or create a new one."""
@@ -60,14 +79,14 @@ def conversation_list(request):
         # Generate assistant response based on company data setting
         if conversation.use_company_data == 'use':
             # Use RAG for company data only
-            rag_service = RAGService()
+            rag_service = get_rag_service()
             assistant_response = rag_service.generate_rag_response(
                 user_message.content, 
                 conversation.id
             )
         elif conversation.use_company_data == 'both':
             # Use intelligent RAG + LLM combination
-            rag_service = RAGService()
+            rag_service = get_rag_service()
             assistant_response = rag_service.generate_intelligent_response(
                 user_message.content, 
                 conversation.id,
@@ -75,10 +94,7 @@ def conversation_list(request):
             )
         else:
             # Use regular LLM only
-            messages_for_llm = [
-                {'role': msg.role, 'content': msg.content}
-                for msg in conversation.messages.all()
-            ]
+            messages_for_llm = build_history(conversation, llm_service.system_prompt)
             assistant_response = llm_service.generate_response(messages_for_llm)
         
         # Save assistant response
@@ -112,14 +128,14 @@ def conversation_detail(request, conversation_id):
         # Generate assistant response based on company data setting
         if conversation.use_company_data == 'use':
             # Use RAG for company data only
-            rag_service = RAGService()
+            rag_service = get_rag_service()
             assistant_response = rag_service.generate_rag_response(
                 user_message.content, 
                 conversation.id
             )
         elif conversation.use_company_data == 'both':
             # Use intelligent RAG + LLM combination
-            rag_service = RAGService()
+            rag_service = get_rag_service()
             llm_service = LLMService()
             assistant_response = rag_service.generate_intelligent_response(
                 user_message.content, 
@@ -129,10 +145,7 @@ def conversation_detail(request, conversation_id):
         else:
             # Use regular LLM only
             llm_service = LLMService()
-            messages_for_llm = [
-                {'role': msg.role, 'content': msg.content}
-                for msg in conversation.messages.all()
-            ]
+            messages_for_llm = build_history(conversation, llm_service.system_prompt)
             assistant_response = llm_service.generate_response(messages_for_llm)
         
         # Save assistant response
@@ -146,6 +159,27 @@ def conversation_detail(request, conversation_id):
         return Response(serializer.data)
 
 
+@api_view(['POST'])
+def conversation_stream(request, conversation_id):
+    """Add a message and stream the assistant's reply as server-sent events."""
+    conversation = get_object_or_404(Conversation, id=conversation_id)
+    
+    user_message = Message.objects.create(
+        conversation=conversation,
+        role='user',
+        content=request.data.get('message', '')
+    )
+    
+    response = StreamingHttpResponse(
+        stream_assistant_reply(conversation, user_message),
+        content_type='text/event-stream'
+    )
+    # Deliver each event as it is written, through proxies too
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @api_view(['DELETE'])
 def conversation_delete(request, conversation_id):
     """Delete a conversation."""
@@ -210,16 +244,29 @@ def data_sources(request):
         if not file.name.lower().endswith('.pdf'):
             return Response({'error': 'Only PDF files are supported'}, status=status.HTTP_400_BAD_REQUEST)
         
+        # A byte-identical upload maps to the existing document, without storing it again
+        file_hash = hash_upload(file)
+        existing = live_source_with_hash(file_hash)
+        if existing:
+            serializer = DataSourceSerializer(existing)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        
         # Save file
-        file_path = f"documents/{uuid.uuid4()}_{file.name}"
-        saved_path = default_storage.save(file_path, ContentFile(file.read()))
+        saved_path = store_upload(file, file.name)
         
-        # Create data source
-        data_source = DataSource.objects.create(
-            name=request.data.get('name', file.name),
-            source_type='pdf',
-            file_path=saved_path
-        )
+        # Create data source; a concurrent identical upload may have won the race
+        try:
+            with transaction.atomic():
+                data_source = DataSource.objects.create(
+                    name=request.data.get('name', file.name),
+                    source_type='pdf',
+                    file_path=saved_path,
+                    file_hash=file_hash
+                )
+        except IntegrityError:
+            discard_upload(saved_path)
+            serializer = DataSourceSerializer(live_source_with_hash(file_hash))
+            return Response(serializer.data, status=status.HTTP_200_OK)
         
         # Trigger async processing
         process_document_task.delay(str(data_source.id))
@@ -228,6 +275,58 @@ def data_sources(request):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@api_view(['POST'])
+def data_sources_bulk(request):
+    """Upload a zip archive of PDFs and queue them all for processing.
+
+    The archive is stored and extracted by a Celery task, so the request
+    returns as soon as the upload is saved. Files are processed
+    RAG_BULK_INGEST_CONCURRENCY at a time (or the `concurrency` form field);
+    poll the returned ingest batch for progress.
+    """
+    file = request.FILES.get('file')
+    if not file:
+        return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Only the archive's directory is read here; members are extracted by the task
+    try:
+        with zipfile.ZipFile(file) as archive:
+            members = archive_members(archive)
+    except zipfile.BadZipFile:
+        return Response({'error': 'Only zip archives are supported'}, status=status.HTTP_400_BAD_REQUEST)
+    file.seek(0)
+    
+    if len(members) > settings.RAG_BULK_MAX_FILES:
+        return Response(
+            {'error': f'Archive has more than {settings.RAG_BULK_MAX_FILES} files'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        concurrency = int(request.data.get('concurrency', settings.RAG_BULK_INGEST_CONCURRENCY))
+    except (TypeError, ValueError):
+        return Response({'error': 'concurrency must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    concurrency = max(1, min(concurrency, settings.RAG_BULK_MAX_CONCURRENCY))
+    
+    batch = IngestBatch.objects.create(
+        name=file.name,
+        concurrency=concurrency,
+        archive=default_storage.save(f"archives/{uuid.uuid4()}_{file.name}", file)
+    )
+    register_archive_task.delay(str(batch.id))
+    
+    serializer = IngestBatchSerializer(batch)
+    return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+def ingest_batch_detail(request, batch_id):
+    """Get a bulk ingestion's aggregate progress and throughput."""
+    batch = get_object_or_404(IngestBatch, id=batch_id)
+    serializer = IngestBatchSerializer(batch)
+    return Response(serializer.data)
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 def data_source_detail(request, data_source_id):
     """Get, update, or delete a data source."""
@@ -251,21 +350,94 @@ def data_source_detail(request, data_source_id):
         # Delete data source and its chunks
         delete_document_chunks_task.delay(str(data_source.id))
         
-        # Delete file
-        if data_source.file_path:
-            try:
-                default_storage.delete(data_source.file_path.name)
-            except:
-                pass
+        # Delete files, including a new version still being ingested
+        for stored_file in (data_source.file_path, data_source.pending_file):
+            if stored_file:
+                try:
+                    default_storage.delete(stored_file.name)
+                except OSError as e:
+                    logger.warning(f"Could not delete file of {data_source.name}: {str(e)}")
         
         data_source.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@api_view(['POST'])
+def data_source_version(request, data_source_id):
+    """Upload a new version of a data source's document.
+
+    Unchanged chunks keep their embeddings; only changed content is re-embedded.
+    The current version stays searchable until the new one is fully ingested.
+    """
+    data_source = get_object_or_404(DataSource, id=data_source_id)
+    
+    file = request.FILES.get('file')
+    if not file:
+        return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Validate file type
+    if not file.name.lower().endswith('.pdf'):
+        return Response({'error': 'Only PDF files are supported'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if data_source.status in ('pending', 'processing', 'updating') or data_source.pending_file:
+        return Response({'error': 'Data source is still being processed'}, status=status.HTTP_409_CONFLICT)
+    
+    # Re-uploading the current file is a no-op
+    file_hash = hash_upload(file)
+    if file_hash == data_source.file_hash and data_source.status != 'failed':
+        serializer = DataSourceSerializer(data_source)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+    
+    # Another document already holds this file
+    existing = live_source_with_hash(file_hash)
+    if existing and existing.id != data_source.id:
+        return Response(
+            {'error': f'This file is already uploaded as data source {existing.id}'},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    # Save file
+    saved_path = store_upload(file, file.name)
+    
+    if data_source.status == 'completed':
+        # Ingest alongside the current version; it is replaced once the new one completes
+        data_source.pending_file = saved_path
+        data_source.pending_file_hash = file_hash
+        data_source.save()
+        update_document_task.delay(str(data_source.id))
+    else:
+        # A failed source has nothing to preserve: ingest the new file from scratch
+        old_file = data_source.file_path.name if data_source.file_path else None
+        data_source.file_path = saved_path
+        data_source.file_hash = file_hash
+        data_source.version += 1
+        data_source.status = 'pending'
+        data_source.save()
+        if old_file:
+            try:
+                default_storage.delete(old_file)
+            except OSError as e:
+                logger.warning(f"Could not delete previous file of {data_source.name}: {str(e)}")
+        process_document_task.delay(str(data_source.id))
+    
+    serializer = DataSourceSerializer(data_source)
+    return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+def rag_ready(request):
+    """Readiness probe: report whether the shared RAG service is loaded."""
+    state = get_rag_service_state()
+    return Response(
+        state,
+        status=status.HTTP_200_OK if state['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
 @api_view(['GET'])
 def rag_stats(request):
     """Get RAG system statistics."""
-    rag_service = RAGService()
+    rag_service = get_rag_service()
     stats = rag_service.get_database_stats()
     return Response(stats)
 
@@ -274,6 +446,6 @@ def rag_stats(request):
 def rag_queries(request, conversation_id):
     """Get RAG queries for a conversation."""
     conversation = get_object_or_404(Conversation, id=conversation_id)
-    queries = conversation.rag_queries.all()
+    queries = conversation.rag_queries.prefetch_related('retrieved_chunks__data_source')
     serializer = RAGQuerySerializer(queries, many=True)
     return Response(serializer.data)
@@ -0,0 +1,28 @@
+"""
+ASGI config for chat_app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, e.g. ``uvicorn chat_app.asgi:application``, and
+set CHAT_ASYNC_VIEWS=True so the conversation endpoints run as async views.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chat_app.settings')
+
+application = get_asgi_application()
+
+# Warm up the shared RAG service so the first request doesn't load the model
+if settings.RAG_PRELOAD:
+    from chat.rag_service import warm_up_rag_service
+    warm_up_rag_service()
+
+# Start probing the LLM now, so status is known by the first status request
+from chat.health import get_health_monitor
+get_health_monitor()
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chat_app.settings')
@@ -14,6 +15,22 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@worker_process_init.connect
+def preload_rag_service(**kwargs):
+    """Load the embedding model and vector store once per worker process.
+
+    Runs in each pool child after the fork, so the Chroma client is never
+    shared across processes. Tasks then reuse it via get_rag_service().
+    Celery kills a child that takes longer than worker_proc_alive_timeout
+    to start, so CELERY_WORKER_PROC_ALIVE_TIMEOUT must cover the load.
+    """
+    from django.conf import settings
+
+    if settings.RAG_PRELOAD:
+        from chat.rag_service import warm_up_rag_service
+        warm_up_rag_service(background=False)
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -59,6 +59,12 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'chat_app.wsgi.application'
+ASGI_APPLICATION = 'chat_app.asgi.application'
+
+# Serve the conversation endpoints with async views (chat/async_views.py).
+# Enable when running under an ASGI server, where a request waiting on the
+# model holds no worker thread.
+CHAT_ASYNC_VIEWS = os.getenv('CHAT_ASYNC_VIEWS', 'False').lower() == 'true'
 
 # Database
 DATABASES = {
@@ -132,8 +138,118 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Recycle worker processes after N tasks or once they exceed the resident
+# memory limit (in KiB), so long-running workers hand back model memory cleanly.
+CELERY_WORKER_MAX_TASKS_PER_CHILD = int(os.getenv('CELERY_WORKER_MAX_TASKS_PER_CHILD', '200'))
+CELERY_WORKER_MAX_MEMORY_PER_CHILD = int(os.getenv('CELERY_WORKER_MAX_MEMORY_PER_CHILD', str(2 * 1024 * 1024)))
+# Seconds a new worker process may take to start. Each process loads the
+# embedding model and vector store on start (RAG_PRELOAD), which can take far
+# longer than Celery's 4s default, e.g. while the model downloads on first run.
+CELERY_WORKER_PROC_ALIVE_TIMEOUT = float(os.getenv('CELERY_WORKER_PROC_ALIVE_TIMEOUT', '300'))
+# Ingestion tasks are long; don't let one process reserve a backlog of them.
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.getenv('CELERY_WORKER_PREFETCH_MULTIPLIER', '1'))
+
+# Model API HTTP client: pooled keep-alive connections per process, separate
+# connect/read timeouts (seconds), and retries of 429/5xx with jittered
+# exponential backoff (a Retry-After longer than LLM_RETRY_MAX_DELAY isn't waited for)
+LLM_HTTP_POOL_SIZE = int(os.getenv('LLM_HTTP_POOL_SIZE', '10'))
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', '30'))
+# Connection limit of the async client shared by all requests of an ASGI process
+LLM_ASYNC_POOL_SIZE = int(os.getenv('LLM_ASYNC_POOL_SIZE', '100'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+LLM_RETRY_BACKOFF = float(os.getenv('LLM_RETRY_BACKOFF', '0.5'))
+LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '10'))
+
+# Coalesce identical in-flight model requests (same model and messages), and
+# identical RAG retrievals, into one call. Waiters give up and make the call
+# themselves after LLM_SINGLEFLIGHT_TIMEOUT seconds. A Redis URL extends model
+# request coalescing across processes.
+LLM_SINGLEFLIGHT_ENABLED = os.getenv('LLM_SINGLEFLIGHT_ENABLED', 'True').lower() == 'true'
+LLM_SINGLEFLIGHT_TIMEOUT = float(os.getenv('LLM_SINGLEFLIGHT_TIMEOUT', '60'))
+LLM_SINGLEFLIGHT_REDIS_URL = os.getenv('LLM_SINGLEFLIGHT_REDIS_URL', '')
+
+# LLM health: seconds between background probes of the model endpoint, and
+# how many recent upstream calls the latency percentiles and error rate cover
+LLM_HEALTH_PROBE_INTERVAL = float(os.getenv('LLM_HEALTH_PROBE_INTERVAL', '60'))
+LLM_HEALTH_WINDOW = int(os.getenv('LLM_HEALTH_WINDOW', '100'))
+
+# RAG Configuration
+# Load the embedding model and vector store when the web process starts,
+# so the first chat request does not pay the cold start.
+RAG_PRELOAD = os.getenv('RAG_PRELOAD', 'True').lower() == 'true'
+RAG_EMBEDDING_MODEL = os.getenv('RAG_EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+# Texts per forward pass of the embedding model
+RAG_EMBEDDING_BATCH_SIZE = int(os.getenv('RAG_EMBEDDING_BATCH_SIZE', '64'))
+# Reuse stored chunk embeddings keyed by (model, SHA-256 of normalized text)
+RAG_EMBEDDING_CACHE = os.getenv('RAG_EMBEDDING_CACHE', 'True').lower() == 'true'
+# LRU cache of query embeddings (entries, seconds); set a Redis URL to share it
+RAG_QUERY_CACHE_SIZE = int(os.getenv('RAG_QUERY_CACHE_SIZE', '1024'))
+RAG_QUERY_CACHE_TTL = float(os.getenv('RAG_QUERY_CACHE_TTL', '3600'))
+RAG_QUERY_CACHE_REDIS_URL = os.getenv('RAG_QUERY_CACHE_REDIS_URL', '')
+# Semantic answer cache for the company-data chat modes: reuse an answer when a
+# new query's embedding is at least this cosine-similar to a cached query and
+# the active sources haven't changed since it was generated.
+RAG_ANSWER_CACHE_ENABLED = os.getenv('RAG_ANSWER_CACHE_ENABLED', 'True').lower() == 'true'
+RAG_ANSWER_CACHE_THRESHOLD = float(os.getenv('RAG_ANSWER_CACHE_THRESHOLD', '0.95'))
+RAG_ANSWER_CACHE_SIZE = int(os.getenv('RAG_ANSWER_CACHE_SIZE', '512'))
+RAG_ANSWER_CACHE_TTL = float(os.getenv('RAG_ANSWER_CACHE_TTL', '3600'))
+# How long a process trusts its cached set of active data sources (seconds)
+RAG_CORPUS_CACHE_TTL = float(os.getenv('RAG_CORPUS_CACHE_TTL', '10'))
+# Vector index backend: 'chroma' (persistent ChromaDB) or 'numpy' (exact search
+# over a memory-mapped float32 matrix, no ChromaDB needed)
+RAG_VECTOR_BACKEND = os.getenv('RAG_VECTOR_BACKEND', 'chroma')
+RAG_CHROMA_PATH = os.getenv('RAG_CHROMA_PATH', './chroma_db')
+RAG_NUMPY_INDEX_PATH = os.getenv('RAG_NUMPY_INDEX_PATH', './vector_index')
+# NumPy backend only: scan 'int8' or 'binary' codes in memory and re-score the
+# best k * RAG_QUANTIZED_RESCORE_FACTOR candidates with float32 vectors
+RAG_VECTOR_QUANTIZATION = os.getenv('RAG_VECTOR_QUANTIZATION', 'none')
+RAG_QUANTIZED_RESCORE_FACTOR = int(os.getenv('RAG_QUANTIZED_RESCORE_FACTOR', '10'))
+# Retrieval: 'hybrid' (vector + BM25 fused with reciprocal rank fusion),
+# 'vector', or 'lexical' (BM25 only, no embedding model needed)
+RAG_RETRIEVAL_MODE = os.getenv('RAG_RETRIEVAL_MODE', 'hybrid')
+# Candidates fetched from each side before fusion in hybrid mode
+RAG_HYBRID_CANDIDATES = int(os.getenv('RAG_HYBRID_CANDIDATES', '20'))
+# Tokenizer (tiktoken encoding) for chunk token counts and context packing;
+# token counts are estimated from text length when tiktoken is unavailable
+RAG_TOKENIZER_ENCODING = os.getenv('RAG_TOKENIZER_ENCODING', 'cl100k_base')
+# Retrieved chunks are packed into the prompt, best first, up to this many tokens
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv('RAG_CONTEXT_TOKEN_BUDGET', '3000'))
+
+# Conversation history sent to the model: the last CHAT_HISTORY_MAX_MESSAGES
+# messages within CHAT_HISTORY_TOKEN_BUDGET tokens, verbatim; older messages
+# are folded into a rolling summary by a Celery task
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv('CHAT_HISTORY_MAX_MESSAGES', '12'))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '2000'))
+# Rewrite RAG follow-up questions (referring back, or "what about ...") as
+# standalone questions for the answer cache and retrieval; when off,
+# follow-ups are retrieved as asked and their answers are not cached
+RAG_CONDENSE_FOLLOWUPS = os.getenv('RAG_CONDENSE_FOLLOWUPS', 'True').lower() == 'true'
+# PDF text extraction: documents with at least RAG_PDF_PARALLEL_MIN_PAGES pages
+# are extracted in ranges of RAG_PDF_PAGES_PER_TASK pages across a pool of
+# RAG_PDF_WORKERS processes; a range taking over RAG_PDF_RANGE_TIMEOUT seconds is skipped
+RAG_PDF_WORKERS = int(os.getenv('RAG_PDF_WORKERS', str(min(4, os.cpu_count() or 1))))
+RAG_PDF_PAGES_PER_TASK = int(os.getenv('RAG_PDF_PAGES_PER_TASK', '16'))
+RAG_PDF_RANGE_TIMEOUT = float(os.getenv('RAG_PDF_RANGE_TIMEOUT', '120'))
+RAG_PDF_PARALLEL_MIN_PAGES = int(os.getenv('RAG_PDF_PARALLEL_MIN_PAGES', '64'))
+# Number of chunks embedded and written per vector-store add / bulk insert
+RAG_INGEST_BATCH_SIZE = int(os.getenv('RAG_INGEST_BATCH_SIZE', '128'))
+# Documents with at least RAG_FANOUT_MIN_PAGES pages (0 disables) are chunked once
+# and embedded in parallel subtasks of RAG_FANOUT_CHUNKS_PER_TASK chunks each
+RAG_FANOUT_MIN_PAGES = int(os.getenv('RAG_FANOUT_MIN_PAGES', '200'))
+RAG_FANOUT_CHUNKS_PER_TASK = int(os.getenv('RAG_FANOUT_CHUNKS_PER_TASK', '512'))
+# Bulk ingestion (zip endpoint and `manage.py ingest`): documents processed at
+# once per batch, and limits on archive contents
+RAG_BULK_INGEST_CONCURRENCY = int(os.getenv('RAG_BULK_INGEST_CONCURRENCY', '4'))
+RAG_BULK_MAX_CONCURRENCY = int(os.getenv('RAG_BULK_MAX_CONCURRENCY', '16'))
+RAG_BULK_MAX_FILES = int(os.getenv('RAG_BULK_MAX_FILES', '1000'))
+RAG_BULK_MAX_FILE_SIZE = int(os.getenv('RAG_BULK_MAX_FILE_SIZE', str(200 * 1024 * 1024)))
+# Times a stalled ingestion is resumed from its checkpoint before it is marked failed
+RAG_INGEST_MAX_ATTEMPTS = int(os.getenv('RAG_INGEST_MAX_ATTEMPTS', '3'))
+
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# Uploads above this size are streamed to a temporary file instead of memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(2.5 * 1024 * 1024)  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
 # Allowed file types for upload
@@ -164,5 +280,9 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        # The async LLM client logs every request; LLMService already logs each call
+        'httpx': {
+            'level': 'WARNING',
+        },
     },
 }
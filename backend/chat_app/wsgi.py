@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chat_app.settings')
 
 application = get_wsgi_application()
+
+# Warm up the shared RAG service so the first request doesn't load the model
+if settings.RAG_PRELOAD:
+    from chat.rag_service import warm_up_rag_service
+    warm_up_rag_service()
+
+# Start probing the LLM now, so status is known by the first status request
+from chat.health import get_health_monitor
+get_health_monitor()